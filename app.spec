@@ -8,6 +8,8 @@ a = Analysis(
     binaries=[],
     datas=[],
     hiddenimports=[
+        # importado en diferido (_Diferido), sin import estatico
+        "reportlab.pdfgen.canvas",
         # winsdk (Py 3.12+)
         "winsdk.windows.media.ocr",
         "winsdk.windows.globalization",
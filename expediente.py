@@ -9,30 +9,69 @@ Descarga un expediente del SAC (vÃƒÂ­a Teletrabajo -> Portal de Aplicaciones
 adjuntos incluidos, y arma un ÃƒÂºnico PDF.
 """
 
-import os, sys, tempfile, shutil, datetime, threading, re, logging, contextlib
+import os, sys, tempfile, shutil, datetime, threading, re, logging, contextlib, itertools, time
+_T0_ARRANQUE = time.perf_counter()
+import importlib
 from pathlib import Path
-from tkinter import Tk, StringVar, BooleanVar, filedialog, messagebox, Canvas, Frame, Label, Menu
 from dotenv import load_dotenv
-from playwright.sync_api import sync_playwright
-from PyPDF2 import PdfReader, PdfWriter, PdfMerger
-from reportlab.pdfgen import canvas
-from PIL import Image, ImageTk
-import requests, mimetypes
+import mimetypes
+from html.parser import HTMLParser
 from urllib.parse import quote, urljoin, urlparse
 from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 import queue
-from tkinter import Toplevel, ttk
-from tkinter.scrolledtext import ScrolledText
 from tempfile import TemporaryDirectory
 import subprocess
 import asyncio
 
-try:
-    import ttkbootstrap as tb
-    _TTKBOOTSTRAP_OK = True
-except Exception:
-    tb = None
-    _TTKBOOTSTRAP_OK = False
+_PERFIL_ARRANQUE = "--profile-startup" in sys.argv[1:]
+_TIEMPOS_IMPORT: dict[str, tuple[float, str]] = {}
+
+
+class _Diferido:
+    """
+    Modulo (o atributo de un modulo) que se importa recien en el primer uso.
+    Asi la ventana aparece sin cargar Playwright, PyPDF2, reportlab, PIL ni
+    requests; despues de mostrarla se precalientan en segundo plano.
+    """
+
+    def __init__(self, modulo: str, attr: str | None = None):
+        self._modulo = modulo
+        self._attr = attr
+        self._obj = None
+
+    def _cargar(self, origen: str = "uso"):
+        obj = self._obj
+        if obj is None:
+            t0 = time.perf_counter()
+            mod = importlib.import_module(self._modulo)
+            obj = getattr(mod, self._attr) if self._attr else mod
+            _TIEMPOS_IMPORT.setdefault(self._modulo, (time.perf_counter() - t0, origen))
+            self._obj = obj
+        return obj
+
+    def __getattr__(self, name):
+        return getattr(self._cargar(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._cargar()(*args, **kwargs)
+
+    def __repr__(self):
+        return f"<diferido {self._modulo}{'.' + self._attr if self._attr else ''}>"
+
+
+sync_playwright = _Diferido("playwright.sync_api", "sync_playwright")
+PdfReader = _Diferido("PyPDF2", "PdfReader")
+PdfWriter = _Diferido("PyPDF2", "PdfWriter")
+PdfMerger = _Diferido("PyPDF2", "PdfMerger")
+canvas = _Diferido("reportlab.pdfgen.canvas")
+Image = _Diferido("PIL.Image")
+ImageTk = _Diferido("PIL.ImageTk")
+requests = _Diferido("requests")
+fitz = _Diferido("fitz")
+
+# Se resuelve al crear la ventana (ver _create_root): ttkbootstrap arrastra PIL.
+tb = None
+_TTKBOOTSTRAP_OK = False
 
 UI_THEME = (os.getenv("SAC_UI_THEME") or "flatly").strip() or "flatly"
 
@@ -62,6 +101,14 @@ def _convert_office_with_word(path: Path) -> Path | None:
     pdf = path.with_suffix(".pdf")
     word = None
     doc = None
+    com_init = False
+    try:
+        # Desde el pool de ingesta corremos fuera del hilo principal: COM necesita init por hilo.
+        import pythoncom  # type: ignore
+        pythoncom.CoInitialize()
+        com_init = True
+    except Exception:
+        pass
     try:
         logging.info(f"[CNV:WORD] {path.name} -> {pdf.name}")
         word = win32com.client.DispatchEx("Word.Application")
@@ -85,6 +132,11 @@ def _convert_office_with_word(path: Path) -> Path | None:
                 word.Quit()
         except Exception:
             pass
+        if com_init:
+            try:
+                pythoncom.CoUninitialize()
+            except Exception:
+                pass
     return None
 
 
@@ -170,14 +222,23 @@ def _convert_docx_text_to_pdf(path: Path) -> Path | None:
 
 # --- OCR WinRT: compatibilidad winsdk (Py 3.12+) y winrt (Py 3.8Ã¯Â¿Â½?"3.11)
 # --- OCR WinRT (Windows) -----------------------------------------------
-try:
-    from winsdk.windows.media import ocr as winocr
-    from winsdk.windows.globalization import Language as WinLanguage
-    from winsdk.windows.storage.streams import InMemoryRandomAccessStream, DataWriter
-    from winsdk.windows.graphics.imaging import BitmapDecoder
-    _WINOCR_OK = True
-except Exception:
-    _WINOCR_OK = False
+# Se importa en el primer OCR (ver _winocr_disponible), no al arrancar.
+_WINOCR_OK = None
+
+
+def _winocr_disponible() -> bool:
+    global _WINOCR_OK, winocr, WinLanguage, InMemoryRandomAccessStream, DataWriter, BitmapDecoder
+    if _WINOCR_OK is None:
+        try:
+            from winsdk.windows.media import ocr as winocr
+            from winsdk.windows.globalization import Language as WinLanguage
+            from winsdk.windows.storage.streams import InMemoryRandomAccessStream, DataWriter
+            from winsdk.windows.graphics.imaging import BitmapDecoder
+            _WINOCR_OK = True
+        except Exception:
+            _WINOCR_OK = False
+    return bool(_WINOCR_OK)
+
 import threading
 import logging
 
@@ -195,18 +256,89 @@ def _repair_mojibake_text(text) -> str:
         s = fixed
     return s
 
+class _BufferLogUI:
+    """
+    Buffer circular acotado entre los hilos de trabajo y la bitacora de Tk.
+    Si la UI no llega a drenar, se pierden los mensajes mas viejos (el archivo
+    de log los conserva) y se informa cuantos se salteo.
+    """
+
+    def __init__(self, maxlen: int | None = None):
+        from collections import deque
+
+        if maxlen is None:
+            try:
+                maxlen = int(os.getenv("UI_LOG_BUFFER", "2000"))
+            except Exception:
+                maxlen = 2000
+        self._buf = deque(maxlen=max(100, int(maxlen)))
+        self._lock = threading.Lock()
+        self._descartados = 0
+
+    def put_nowait(self, msg: str):
+        with self._lock:
+            if len(self._buf) == self._buf.maxlen:
+                self._descartados += 1
+            self._buf.append(msg)
+
+    def drenar(self, max_items: int | None = None) -> tuple[list[str], int]:
+        with self._lock:
+            n = len(self._buf) if max_items is None else min(len(self._buf), int(max_items))
+            out = [self._buf.popleft() for _ in range(n)]
+            descartados, self._descartados = self._descartados, 0
+        return out, descartados
+
+
+def _drenar_mensajes_log(q, max_items: int | None = 400) -> list[str]:
+    """Saca un lote de mensajes (buffer circular o queue.Queue) y repara el mojibake sólo de lo que se muestra."""
+    if q is None:
+        return []
+    if isinstance(q, _BufferLogUI):
+        msgs, descartados = q.drenar(max_items)
+        if descartados:
+            msgs.insert(0, f"[LOG] ... {descartados} mensaje(s) omitidos en la bitácora (ver debug.log)")
+    else:
+        msgs = []
+        try:
+            while max_items is None or len(msgs) < max_items:
+                msgs.append(q.get_nowait())
+        except queue.Empty:
+            pass
+    return [_repair_mojibake_text(m) for m in msgs]
+
+
+def _agregar_lineas_log(widget, msgs: list[str], max_lines: int | None = None):
+    """Inserta un lote de lineas en un ScrolledText de una sola vez y recorta las mas viejas."""
+    if not msgs:
+        return
+    if max_lines is None:
+        try:
+            max_lines = int(os.getenv("UI_LOG_MAX_LINES", "5000"))
+        except Exception:
+            max_lines = 5000
+    widget.insert("end", "\n".join(msgs) + "\n")
+    try:
+        total = int(widget.index("end-1c").split(".")[0])
+        if max_lines > 0 and total > max_lines:
+            widget.delete("1.0", f"{total - max_lines + 1}.0")
+    except Exception:
+        pass
+    widget.see("end")
+
+
 class TkQueueHandler(logging.Handler):
     """Handler de logging que empuja los mensajes a una queue para la UI."""
     def __init__(self, q):
         super().__init__()
         self.q = q
+        # solo la bitacora se limita; el archivo de log conserva todo
+        self.addFilter(_LimiteLogsRepetitivos())
 
     def emit(self, record):
         try:
             msg = self.format(record)
         except Exception:
             msg = record.getMessage()
-        msg = _repair_mojibake_text(msg)
         try:
             self.q.put_nowait(msg)
         except Exception:
@@ -239,8 +371,6 @@ else:  # .py suelto
 # Playwright buscarÃƒÂ¡ el navegador empaquetado aquÃƒÂ­ (portabiliza el .exe)
 os.environ["PLAYWRIGHT_BROWSERS_PATH"] = str(BASE_PATH / "ms-playwright")
 
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 
 
 
@@ -363,44 +493,216 @@ def _is_real_pdf(path: Path) -> bool:
         return False
 
 
-def _pdf_es_login_portal(path: Path) -> bool:
-    txt = ""
+# --------- Analisis de documento (una pasada por PDF) ---------
+_ANALISIS_PAGINAS_TEXTO = 3  # paginas cuyo texto completo se conserva (permiso/login/fecha)
+_ANALISIS_CACHE: dict = {}
+_ANALISIS_LOCK = threading.Lock()
+
+
+def _clave_analisis(path: Path):
     try:
-        import fitz
+        p = Path(path).resolve()
+        st = p.stat()
+        return (str(p), st.st_mtime_ns, st.st_size)
+    except Exception:
+        return None
+
+
+def _texto_es_login_portal(texto: str) -> bool:
+    t = (texto or "").lower()
+    return ("ingrese nombre de usuario y contraseÃƒÂ±a" in t) or ("portal" in t and "intranet" in t)
+
+
+def _fecha_desde_texto(txt: str) -> str | None:
+    """
+    Primera fecha del texto como "dd/mm/aaaa": literal dd/mm/aaaa o
+    "20 de septiembre de 2023" (mes en castellano, sin importar acentos).
+    """
+    import unicodedata
+
+    t = _norm_ws(txt or "")
+    if not t:
+        return None
+    # 1) dd/mm/aaaa
+    m = re.search(r"\b(\d{2})/(\d{2})/(\d{4})\b", t)
+    if m:
+        d, m_, a = m.groups()
+        try:
+            return f"{int(d):02d}/{int(m_):02d}/{int(a):04d}"
+        except Exception:
+            return f"{d}/{m_}/{a}"
+
+    # 2) "20 de septiembre de 2023" (case/acento-insensible)
+    t2 = "".join(c for c in unicodedata.normalize("NFD", t) if unicodedata.category(c) != "Mn").lower()
+    meses = {
+        "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6,
+        "julio": 7, "agosto": 8, "septiembre": 9, "setiembre": 9, "octubre": 10,
+        "noviembre": 11, "diciembre": 12,
+    }
+    m2 = re.search(r"\b(\d{1,2})\s+de\s+([a-z\u00f1]+)\s+de\s+(\d{4})\b", t2)
+    if m2:
+        mm = meses.get(m2.group(2))
+        if mm:
+            return f"{int(m2.group(1)):02d}/{mm:02d}/{int(m2.group(3)):04d}"
+    return None
+
+
+def _analizar_pagina(pg, con_texto: bool) -> dict:
+    """
+    Registro de una pagina. Una sola extraccion de texto (textpage) alimenta
+    los dos recortes de cuerpo que usan las heuristicas:
+      - cuerpo:      bloques entre 12% y 88% del alto (_has_enough_text)
+      - cuerpo_util: bloques de 8+ caracteres dentro de 15-85% alto / 6-94% ancho
+                     (_page_has_text); None si no se pudieron leer los bloques
+    ratio_blanco solo se calcula (pixmap a 36 dpi) cuando la pagina no tiene
+    texto, imagenes ni dibujos: es el unico caso en que decide algo.
+    """
+    reg = {"chars": 0, "cuerpo": 0, "cuerpo_util": None, "imagenes": 0,
+           "cobertura": 0.0, "ratio_blanco": None, "texto": None}
+    r = pg.rect
+    try:
+        tp = pg.get_textpage()
+    except Exception:
+        tp = None
+    try:
+        texto = pg.get_text("text", textpage=tp) if tp is not None else pg.get_text("text")
+    except Exception:
+        texto = ""
+    texto = texto or ""
+    reg["chars"] = len(texto.strip())
+    if con_texto:
+        reg["texto"] = texto
+    try:
+        bloques = (pg.get_text("blocks", textpage=tp) if tp is not None else pg.get_text("blocks")) or []
+        h, w = r.height, r.width
+        cuerpo = util = 0
+        for x0, y0, x1, y1, txt, *_ in bloques:
+            t = (txt or "").strip()
+            if not (y1 <= 0.12 * h or y0 >= 0.88 * h):
+                cuerpo += len(t)
+            if (y1 <= 0.15 * h) or (y0 >= 0.85 * h) or (x1 <= 0.06 * w) or (x0 >= 0.94 * w):
+                continue
+            if len(t) >= 8:
+                util += len(t)
+        reg["cuerpo"], reg["cuerpo_util"] = cuerpo, util
+    except Exception:
+        pass
+    try:
+        reg["imagenes"] = len(pg.get_images(full=True))
+    except Exception:
+        pass
+    if reg["imagenes"]:
+        try:
+            area = float(r.width * r.height)
+            cubierta = 0.0
+            for info in pg.get_image_info() or []:
+                bb = info.get("bbox")
+                if bb:
+                    q = type(r)(bb) & r
+                    cubierta += float(q.width * q.height)
+            reg["cobertura"] = min(1.0, cubierta / area) if area > 0 else 0.0
+        except Exception:
+            pass
+    elif not reg["chars"]:
+        try:
+            dibujos = len(pg.get_drawings())
+        except Exception:
+            dibujos = 1
+        if not dibujos:
+            try:
+                pm = pg.get_pixmap(dpi=36)
+                sample = memoryview(pm.samples)[::8]
+                reg["ratio_blanco"] = (sum(1 for b in sample if b == 255) / len(sample)) if len(sample) else 0.0
+            except Exception:
+                reg["ratio_blanco"] = 0.0
+    return reg
+
+
+def _analizar_pdf(path: Path) -> dict | None:
+    """
+    Analisis de un PDF en una sola pasada con PyMuPDF, cacheado por
+    ruta + mtime + tamano. Devuelve {"paginas": [registro, ...], "permiso",
+    "login", "fecha"} o None si PyMuPDF no esta o el archivo no abre (los
+    llamadores conservan su fallback con PyPDF2).
+    """
+    clave = _clave_analisis(path)
+    if clave is None:
+        return None
+    with _ANALISIS_LOCK:
+        hit = _ANALISIS_CACHE.pop(clave, None)
+        if hit is not None:
+            _ANALISIS_CACHE[clave] = hit  # LRU: al final
+            _METRICAS.inc("cache_hits_total", cache="analisis_pdf")
+            return hit
+    try:
+        import fitz  # PyMuPDF
 
         doc = fitz.open(str(path))
-        for i in range(min(doc.page_count, 2)):
-            txt += doc[i].get_text("text") or ""
-        doc.close()
     except Exception:
+        return None
+    try:
+        paginas = [_analizar_pagina(doc[i], i < _ANALISIS_PAGINAS_TEXTO) for i in range(doc.page_count)]
+    except Exception as e:
+        logging.info(f"[ANALISIS] {Path(path).name}: {e}")
+        return None
+    finally:
         try:
-            for p in PdfReader(str(path)).pages[:2]:
-                txt += p.extract_text() or ""
+            doc.close()
         except Exception:
-            return False
+            pass
+    textos = [p.pop("texto") or "" for p in paginas[:_ANALISIS_PAGINAS_TEXTO]]
+    for p in paginas[_ANALISIS_PAGINAS_TEXTO:]:
+        p.pop("texto", None)
+    res = {
+        "paginas": paginas,
+        "permiso": _tiene_mensaje_permiso("".join(textos[:3])),
+        "login": _texto_es_login_portal("".join(textos[:2])),
+        "fecha": _fecha_desde_texto("".join(textos[:2])),
+    }
+    with _ANALISIS_LOCK:
+        _ANALISIS_CACHE[clave] = res
+        limite = max(1, int(os.getenv("PDF_ANALISIS_CACHE", "256") or 256))
+        while len(_ANALISIS_CACHE) > limite:
+            _ANALISIS_CACHE.pop(next(iter(_ANALISIS_CACHE)))
+    return res
 
-    t = (txt or "").lower()
-    return ("ingrese nombre de usuario y contraseÃƒÂ±a" in t) or ("portal" in t and "intranet" in t)
+
+def _pagina_es_blanca(reg: dict, thresh: float = 0.995) -> bool:
+    ratio = reg.get("ratio_blanco")
+    return ratio is not None and ratio >= thresh
+
+
+def _pagina_tiene_cuerpo(reg: dict, min_chars: int = 50) -> bool:
+    if reg.get("cuerpo_util") is None:
+        return reg.get("chars", 0) >= (min_chars * 2)
+    return reg["cuerpo_util"] >= min_chars
+
+
+def _pdf_es_login_portal(path: Path) -> bool:
+    analisis = _analizar_pdf(path)
+    if analisis is not None:
+        return analisis["login"]
+    txt = ""
+    try:
+        for p in PdfReader(str(path)).pages[:2]:
+            txt += p.extract_text() or ""
+    except Exception:
+        return False
+    return _texto_es_login_portal(txt)
 
 
 def _pdf_contiene_mensaje_permiso(path: Path) -> bool:
     """HeurÃƒÂ­stica: si el PDF trae el cartel de 'no tiene permisos', lo descartamos."""
+    analisis = _analizar_pdf(path)
+    if analisis is not None:
+        return analisis["permiso"]
     txt = ""
     try:
-        # PyMuPDF rÃƒÂ¡pido si estÃƒÂ¡
-        import fitz
-
-        doc = fitz.open(str(path))
-        for i in range(min(doc.page_count, 3)):
-            txt += doc[i].get_text("text") or ""
-        doc.close()
+        # Fallback PyPDF2
+        for p in PdfReader(str(path)).pages[:3]:
+            txt += p.extract_text() or ""
     except Exception:
-        try:
-            # Fallback PyPDF2
-            for p in PdfReader(str(path)).pages[:3]:
-                txt += p.extract_text() or ""
-        except Exception:
-            return False
+        return False
     return _tiene_mensaje_permiso(txt)
 
 
@@ -529,65 +831,442 @@ def _asegurar_seccion_operaciones_visible(page):
         pass
 
 
-def etapa(msg: str):
-    """Marca una etapa visible en la ventana de progreso y en el debug.log."""
-    logging.info(f"[ETAPA] {_repair_mojibake_text(msg)}")
+# --------- Metricas operativas ---------
+_BUCKETS_SEGUNDOS = (0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600, 1800)
 
 
-def _esperar_radiografia_listo(page, timeout=120):
+class _Metricas:
     """
-    Espera a que RadiografÃƒÂ­a termine de cargar luego de la bÃƒÂºsqueda.
-    Considera AJAX: esperamos a ver carÃƒÂ¡tula/fojas y que 'Operaciones' o 'Adjuntos' estÃƒÂ©n
-    renderizados (o, al menos, que el encabezado del expediente cambie).
+    Registro de contadores e histogramas de la corrida. Al final de cada
+    descarga se suman a los acumulados en disco y se exportan como textfile
+    de Prometheus (expe.prom, para node_exporter) y como JSON (metricas.json).
+    Las series se identifican por nombre + etiquetas.
     """
-    import time, re
 
-    t0 = time.time()
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._contadores: dict[tuple, float] = {}
+        self._histogramas: dict[tuple, dict] = {}
+
+    @staticmethod
+    def _clave(nombre: str, etiquetas: dict) -> tuple:
+        return (nombre, tuple(sorted((k, str(v)) for k, v in etiquetas.items())))
+
+    def inc(self, nombre: str, valor: float = 1, **etiquetas):
+        k = self._clave(nombre, etiquetas)
+        with self._lock:
+            self._contadores[k] = self._contadores.get(k, 0) + valor
+
+    def observar(self, nombre: str, valor: float, **etiquetas):
+        k = self._clave(nombre, etiquetas)
+        with self._lock:
+            h = self._histogramas.get(k)
+            if h is None:
+                h = self._histogramas[k] = {"buckets": [0] * len(_BUCKETS_SEGUNDOS), "sum": 0.0, "count": 0}
+            for i, le in enumerate(_BUCKETS_SEGUNDOS):
+                if valor <= le:
+                    h["buckets"][i] += 1
+            h["sum"] += valor
+            h["count"] += 1
+
+    def nueva_corrida(self):
+        with self._lock:
+            self._contadores.clear()
+            self._histogramas.clear()
+
+    def instantanea(self) -> dict:
+        with self._lock:
+            return {
+                "contadores": [{"nombre": n, "etiquetas": dict(e), "valor": v} for (n, e), v in self._contadores.items()],
+                "histogramas": [
+                    {"nombre": n, "etiquetas": dict(e), "buckets": list(h["buckets"]), "sum": h["sum"], "count": h["count"]}
+                    for (n, e), h in self._histogramas.items()
+                ],
+            }
+
+    @staticmethod
+    def _sumar(acum: dict, corrida: dict) -> dict:
+        cont = {(c["nombre"], tuple(sorted(c["etiquetas"].items()))): c for c in acum.get("contadores", [])}
+        for c in corrida["contadores"]:
+            k = (c["nombre"], tuple(sorted(c["etiquetas"].items())))
+            if k in cont:
+                cont[k]["valor"] += c["valor"]
+            else:
+                cont[k] = dict(c)
+        hist = {(h["nombre"], tuple(sorted(h["etiquetas"].items()))): h for h in acum.get("histogramas", [])}
+        for h in corrida["histogramas"]:
+            k = (h["nombre"], tuple(sorted(h["etiquetas"].items())))
+            if k in hist and len(hist[k]["buckets"]) == len(h["buckets"]):
+                prev = hist[k]
+                prev["buckets"] = [a + b for a, b in zip(prev["buckets"], h["buckets"])]
+                prev["sum"] += h["sum"]
+                prev["count"] += h["count"]
+            else:
+                hist[k] = dict(h)
+        return {"contadores": list(cont.values()), "histogramas": list(hist.values())}
+
+    @staticmethod
+    def _prometheus(acum: dict) -> str:
+        def _lbl(et: dict, extra: str = "") -> str:
+            partes = []
+            for k, v in sorted(et.items()):
+                v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+                partes.append(f'{k}="{v}"')
+            if extra:
+                partes.append(extra)
+            return "{" + ",".join(partes) + "}" if partes else ""
+
+        lineas, tipos = [], set()
+        for c in sorted(acum["contadores"], key=lambda c: c["nombre"]):
+            n = f"expe_{c['nombre']}"
+            if n not in tipos:
+                tipos.add(n)
+                lineas.append(f"# TYPE {n} counter")
+            lineas.append(f"{n}{_lbl(c['etiquetas'])} {c['valor']:g}")
+        for h in sorted(acum["histogramas"], key=lambda h: h["nombre"]):
+            n = f"expe_{h['nombre']}"
+            if n not in tipos:
+                tipos.add(n)
+                lineas.append(f"# TYPE {n} histogram")
+            for le, cnt in zip(_BUCKETS_SEGUNDOS, h["buckets"]):
+                cota = 'le="%g"' % le
+                lineas.append(f"{n}_bucket{_lbl(h['etiquetas'], cota)} {cnt}")
+            cota = 'le="+Inf"'
+            lineas.append(f"{n}_bucket{_lbl(h['etiquetas'], cota)} {h['count']}")
+            lineas.append(f"{n}_sum{_lbl(h['etiquetas'])} {h['sum']:.3f}")
+            lineas.append(f"{n}_count{_lbl(h['etiquetas'])} {h['count']}")
+        return "\n".join(lineas) + "\n"
+
+    def exportar(self, carpeta: Path | None = None) -> Path | None:
+        """
+        Suma la corrida a <carpeta>/metricas.json y reescribe expe.prom.
+        Un lock por archivo evita que dos procesos de un lote se pisen.
+        """
+        import json
+
+        if not _env_true("METRICS", "1"):
+            return None
+        carpeta = Path(carpeta or os.getenv("METRICS_DIR") or (Path(os.getenv("LOCALAPPDATA") or Path.home()) / "expe"))
+        carpeta.mkdir(parents=True, exist_ok=True)
+        lock = carpeta / "metricas.lock"
+        fd = None
+        for _ in range(100):
+            try:
+                fd = os.open(str(lock), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - lock.stat().st_mtime > 60:
+                        lock.unlink()  # lock abandonado
+                        continue
+                except OSError:
+                    pass
+                time.sleep(0.1)
+        if fd is None:
+            # Sin lock no se escribe: pisar el acumulado de otro proceso es peor que perder una corrida.
+            logging.info(f"[METRICAS] {lock} ocupado; no exporto las metricas de esta corrida")
+            return None
+        try:
+            ruta_json = carpeta / "metricas.json"
+            try:
+                previo = json.loads(ruta_json.read_text(encoding="utf-8"))
+            except Exception:
+                previo = {}
+            corrida = self.instantanea()
+            acum = self._sumar(previo.get("acumulado") or {}, corrida)
+            datos = {
+                "actualizado": datetime.datetime.now().isoformat(timespec="seconds"),
+                "corridas": int(previo.get("corridas") or 0) + 1,
+                "buckets_segundos": list(_BUCKETS_SEGUNDOS),
+                "ultima_corrida": corrida,
+                "acumulado": acum,
+            }
+            for ruta, texto in ((ruta_json, json.dumps(datos, ensure_ascii=False, indent=1)),
+                                (carpeta / "expe.prom", self._prometheus(acum))):
+                tmp = ruta.with_suffix(ruta.suffix + ".tmp")
+                tmp.write_text(texto, encoding="utf-8")
+                os.replace(tmp, ruta)
+            return ruta_json
+        finally:
+            os.close(fd)
+            try:
+                lock.unlink()
+            except OSError:
+                pass
+
+
+_METRICAS = _Metricas()
 
-    # algo de vida en la carÃƒÂ¡tula
-    pistas_ok = [
-        "text=/\\bEXPEDIENTE NÃ‚Â°\\b/i",
-        "text=/\\bCarÃƒÂ¡tula\\b/i",
-        "text=/\\bTotal de Fojas\\b/i",
-        "#cphDetalle_lblNroExpediente",
-    ]
 
-    # timeout viene en ms ? convertimos a segundos
-    deadline = t0 + (max(0, int(timeout)) / 1000.0)
+# --------- Perfilado por etapa (opt-in) ---------
+class _PerfilEtapas:
+    """
+    cProfile opcional alrededor de las etapas pesadas del pipeline (fusion,
+    OCR, conversion, limpieza de blancos, cosecha del Libro). Se activa con
+    PROFILE_STAGES=1 o --profile-stages; desactivado, `medir` solo consulta
+    un booleano. Las mediciones de una misma etapa (de cualquier hilo) se
+    suman y al final se vuelcan en <carpeta>/<etapa>.prof y resumen.txt.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.activo = False
+        self.carpeta: Path | None = None
+        self._stats: dict = {}
+        self._tiempos: dict[str, list] = {}  # etapa -> [llamadas, segundos]
+
+    def nueva_corrida(self, carpeta: Path):
+        with self._lock:
+            self.activo = _env_true("PROFILE_STAGES", "0")
+            self.carpeta = Path(carpeta)
+            self._stats.clear()
+            self._tiempos.clear()
+
+    @contextlib.contextmanager
+    def medir(self, etapa: str):
+        # Un solo perfil por hilo: lo anidado queda dentro de la etapa exterior.
+        if not self.activo or getattr(self._local, "en_curso", False):
+            yield
+            return
+        import cProfile
 
-    while time.time() < deadline:
+        prof = cProfile.Profile()
+        self._local.en_curso = True
+        t0 = time.perf_counter()
         try:
-            hay_carat = any(page.locator(s).first.count() for s in pistas_ok)
-        except Exception:
-            hay_carat = False
+            prof.enable()
+        except ValueError:  # otro profiler activo en este hilo
+            prof = None
+        try:
+            yield
+        finally:
+            if prof is not None:
+                prof.disable()
+            self._local.en_curso = False
+            dur = time.perf_counter() - t0
+            with self._lock:
+                t = self._tiempos.setdefault(etapa, [0, 0.0])
+                t[0] += 1
+                t[1] += dur
+                if prof is not None:
+                    try:
+                        if etapa in self._stats:
+                            self._stats[etapa].add(prof)
+                        else:
+                            import pstats
+
+                            self._stats[etapa] = pstats.Stats(prof)
+                    except Exception as e:
+                        logging.info(f"[PERFIL] No pude acumular {etapa}: {e}")
+
+    def volcar(self) -> Path | None:
+        """Escribe un .prof por etapa (abrible con snakeviz/pstats) y el resumen de funciones calientes."""
+        if not self.activo or not self.carpeta:
+            return None
+        import io
+
+        top = int(os.getenv("PROFILE_TOP", "25") or 25)
+        self.carpeta.mkdir(parents=True, exist_ok=True)
+        buf = io.StringIO()
+        with self._lock:
+            for etapa, (n, seg) in sorted(self._tiempos.items(), key=lambda kv: -kv[1][1]):
+                buf.write(f"=== {etapa}: {n} llamada(s), {seg:.2f}s de reloj ===\n")
+                st = self._stats.get(etapa)
+                if st is None:
+                    buf.write("(sin perfil)\n\n")
+                    continue
+                try:
+                    st.dump_stats(str(self.carpeta / f"{etapa}.prof"))
+                    st.stream = buf
+                    st.sort_stats("cumulative").print_stats(top)
+                    st.sort_stats("tottime").print_stats(top)
+                except Exception as e:
+                    buf.write(f"(error al resumir: {e})\n")
+                buf.write("\n")
+        resumen = self.carpeta / "resumen.txt"
+        resumen.write_text(buf.getvalue(), encoding="utf-8")
+        return resumen
+
+
+_PERFILES = _PerfilEtapas()
+_ETAPA_ACTUAL: list = []  # [nombre, t0] de la etapa en curso
+
+
+def _cerrar_etapa():
+    """Registra la duracion de la etapa en curso (si hay) en el histograma de etapas."""
+    if _ETAPA_ACTUAL:
+        nombre, t0 = _ETAPA_ACTUAL
+        _METRICAS.observar("etapa_segundos", time.perf_counter() - t0, etapa=nombre)
+        _ETAPA_ACTUAL.clear()
 
-        # secciones que suelen llegar por AJAX
+
+def etapa(msg: str):
+    """Marca una etapa visible en la ventana de progreso y en el debug.log."""
+    msg = _repair_mojibake_text(msg)
+    logging.info(f"[ETAPA] {msg}")
+    _cerrar_etapa()
+    _ETAPA_ACTUAL.extend([re.sub(r"\d+", "N", msg)[:80], time.perf_counter()])
+
+
+_UI_ACTIVA = False
+
+
+def _avisar_usuario(nivel: str, titulo: str, msg: str):
+    """Messagebox si la app corre con ventana; en corridas sin UI sólo queda en el log."""
+    if _UI_ACTIVA:
         try:
-            _asegurar_seccion_operaciones_visible(page)
+            from tkinter import messagebox
+
+            getattr(messagebox, f"show{nivel}")(titulo, msg)
+            return
         except Exception:
             pass
+    logging.info(f"[AVISO:{nivel.upper()}] {titulo}: {msg}")
+
+
+# --------- Readiness event-driven (MutationObserver + AJAX en vuelo) ---------
+# En lugar de sondear cada 120-200 ms con varios locator.count() por vuelta,
+# instalamos en la pagina un contador de XHR/fetch en vuelo y esperamos con un
+# MutationObserver: una sola llamada IPC que vuelve apenas el DOM cumple la
+# condicion. Cuando termina un AJAX se marca un atributo en <html>, asi el
+# observer se despierta tambien por eventos de red.
+_READY_INSTALL_JS = r"""
+() => {
+    if (window.__expeReady) return true;
+    const st = window.__expeReady = { pending: 0 };
+    const mark = () => {
+        try { document.documentElement.setAttribute('data-expe-net', String(st.pending)); } catch (e) {}
+    };
+    try {
+        const send = XMLHttpRequest.prototype.send;
+        XMLHttpRequest.prototype.send = function (...args) {
+            st.pending++; mark();
+            this.addEventListener('loadend', () => { st.pending = Math.max(0, st.pending - 1); mark(); });
+            return send.apply(this, args);
+        };
+    } catch (e) {}
+    try {
+        const f = window.fetch;
+        if (f) {
+            window.fetch = function (...args) {
+                st.pending++; mark();
+                return f.apply(this, args).finally(() => { st.pending = Math.max(0, st.pending - 1); mark(); });
+            };
+        }
+    } catch (e) {}
+    return true;
+}
+"""
+
+_READY_WAIT_JS = r"""
+async ({ grupos, sinAjax, timeoutMs }) => {
+    const alt = (a) => {
+        if (a.css) {
+            let n = 0;
+            try { n = document.querySelectorAll(a.css).length; } catch (e) { n = 0; }
+            return n >= (a.min || 1);
+        }
+        if (a.text) {
+            const t = (document.body && document.body.textContent) || '';
+            try { return new RegExp(a.text, 'i').test(t); } catch (e) { return false; }
+        }
+        return false;
+    };
+    const ok = () => {
+        for (const g of grupos) { if (!g.some(alt)) return false; }
+        if (sinAjax && window.__expeReady && window.__expeReady.pending > 0) return false;
+        return true;
+    };
+    if (ok()) return true;
+    return await new Promise((resolve) => {
+        let done = false, obs = null, tm = null;
+        const fin = (v) => {
+            if (done) return;
+            done = true;
+            try { obs && obs.disconnect(); } catch (e) {}
+            clearTimeout(tm);
+            resolve(v);
+        };
+        obs = new MutationObserver(() => { if (ok()) fin(true); });
+        obs.observe(document.documentElement || document, { childList: true, subtree: true, attributes: true });
+        tm = setTimeout(() => fin(ok()), Math.max(0, timeoutMs));
+    });
+}
+"""
+
+
+def _instalar_readiness(scope) -> bool:
+    try:
+        scope.evaluate(_READY_INSTALL_JS)
+        return True
+    except Exception:
+        return False
 
-        try:
-            hay_ops_grid = (
-                page.locator(
-                    "[onclick*=\"VerDecretoHtml(\"], [href*=\"VerDecretoHtml(\"], "
-                    "#cphDetalle_gvOperaciones tr"
-                ).count()
-                > 0
-            )
-        except Exception:
-            hay_ops_grid = False
 
+def _esperar_dom(scope, grupos: list[list[dict]], timeout_ms: int = 4000, sin_ajax: bool = False) -> bool:
+    """
+    Espera (sin sondeo desde Python) a que se cumplan todos los `grupos`.
+    Cada grupo es una lista de alternativas {"css": sel, "min": n} o {"text": regex};
+    alcanza con que una alternativa de cada grupo se cumpla.
+    Si la pagina navega mientras esperamos, reintenta con el tiempo restante.
+    """
+    import time as _time
+
+    end_at = _time.time() + max(0, int(timeout_ms)) / 1000.0
+    while True:
+        restante = int((end_at - _time.time()) * 1000)
+        _instalar_readiness(scope)
         try:
-            hay_adj = page.locator("#cphDetalle_gvAdjuntos tr").count() > 0
+            return bool(scope.evaluate(
+                _READY_WAIT_JS,
+                {"grupos": grupos, "sinAjax": bool(sin_ajax), "timeoutMs": max(0, restante)},
+            ))
         except Exception:
-            hay_adj = False
+            # contexto destruido por postback/navegacion: esperamos el DOM nuevo
+            if _time.time() >= end_at:
+                return False
+            try:
+                scope.wait_for_load_state("domcontentloaded", timeout=max(1, restante))
+            except Exception:
+                return False
+
 
-        if hay_carat and (hay_ops_grid or hay_adj):
-            # Ã¯Â¿Â½?~or TrueÃ¯Â¿Â½?T ? si carÃƒÂ¡tula ya cargÃƒÂ³, damos unos ms extra y seguimos
-            page.wait_for_timeout(300)
-            return page.wait_for_timeout(120)
+def _esperar_radiografia_listo(page, timeout=120):
+    """
+    Espera a que Radiografía termine de cargar luego de la búsqueda.
+    Considera AJAX: esperamos a ver carátula/fojas y que 'Operaciones' o 'Adjuntos' estén
+    renderizados, sin requests AJAX en vuelo.
+    """
+    # timeout viene en ms
+    timeout_ms = max(0, int(timeout))
+    grupos = [
+        [
+            {"css": "#cphDetalle_lblNroExpediente"},
+            {"text": r"\bEXPEDIENTE N"},
+            {"text": r"\bCar.tula\b"},
+            {"text": r"\bTotal de Fojas\b"},
+        ],
+        [
+            {"css": "[onclick*=\"VerDecretoHtml(\"], [href*=\"VerDecretoHtml(\"]"},
+            {"css": "#cphDetalle_gvOperaciones tr"},
+            {"css": "#cphDetalle_gvAdjuntos tr"},
+        ],
+    ]
 
+    # secciones que suelen llegar por AJAX
+    try:
+        _asegurar_seccion_operaciones_visible(page)
+    except Exception:
+        pass
+    if _esperar_dom(page, grupos, timeout_ms=timeout_ms, sin_ajax=True):
+        return
+    # la seccion pudo colapsarse con el postback: reabrir y un ultimo intento corto
+    try:
+        _asegurar_seccion_operaciones_visible(page)
+    except Exception:
+        pass
+    _esperar_dom(page, grupos, timeout_ms=min(timeout_ms, 1500), sin_ajax=True)
     # timeout: igual seguimos, pero ya dimos tiempo razonable
     return
 
@@ -615,29 +1294,46 @@ def _buscar_contenedor_operacion(root, op_id: str):
 def _esperar_contenedor_operacion(libro, op_id: str, timeout_ms: int = 4000):
     """
     Después de disparar `onItemClick`, el contenedor puede aparecer con un pequeño delay
-    o en otro scope/frame del Libro. Buscamos siempre sobre `libro` completo, no sobre
-    un scope reducido.
+    o en otro scope/frame del Libro. Esperamos por evento en el scope del Libro
+    (la mitad del tiempo) y, si no aparece ahi, repartimos el resto entre los
+    demas frames de `libro`. Buscamos siempre sobre `libro` completo.
     """
-    import time as _time
-
-    end_at = _time.time() + max(0.5, timeout_ms / 1000.0)
-    last = None
-    while _time.time() < end_at:
-        try:
-            last = _buscar_contenedor_operacion(libro, op_id)
-        except Exception:
-            last = None
-        if last:
-            try:
-                if last.count():
-                    return last
-            except Exception:
-                return last
-        try:
-            libro.wait_for_timeout(200)
-        except Exception:
-            pass
-    return last
+    try:
+        last = _buscar_contenedor_operacion(libro, op_id)
+    except Exception:
+        last = None
+    if last:
+        return last
+
+    grupos = [[
+        {"css": f"[id='{op_id}']"},
+        {"css": f"[data-codigo='{op_id}']"},
+        {"css": f"[aria-labelledby*='{op_id}']"},
+        {"css": f"[aria-controls*='{op_id}']"},
+        {"css": f"[id*='{op_id}']"},
+    ]]
+    try:
+        scope = _libro_scope(libro)
+    except Exception:
+        scope = libro
+    total_ms = max(500, int(timeout_ms))
+    end_at = time.time() + total_ms / 1000.0
+    if not _esperar_dom(scope, grupos, timeout_ms=total_ms // 2):
+        try:
+            ya = {id(scope), id(getattr(scope, "main_frame", None))}
+            otros = [fr for fr in (getattr(libro, "frames", None) or []) if id(fr) not in ya]
+        except Exception:
+            otros = []
+        for n, fr in enumerate(otros):
+            restante = int((end_at - time.time()) * 1000)
+            if restante <= 0:
+                break
+            if _esperar_dom(fr, grupos, timeout_ms=restante // (len(otros) - n)):
+                break
+    try:
+        return _buscar_contenedor_operacion(libro, op_id)
+    except Exception:
+        return None
 
 
 def _descargar_ops_en_paralelo(
@@ -655,7 +1351,8 @@ def _descargar_ops_en_paralelo(
             except Exception:
                 pass
             return (op_id, None)
-        return (op_id, _pdf_sin_blancos(p))
+        with _PERFILES.medir("blancos"):
+            return (op_id, _pdf_sin_blancos(p))
 
     with ThreadPoolExecutor(max_workers=max_workers) as ex:
         for k, v in ex.map(_one, op_ids):
@@ -718,124 +1415,223 @@ def _ensure_pdf(path: Path) -> Path:
 
 
 # --- MERGE TURBO con fitz y fallback agrupado con PyPDF2 ---
-try:
-    import fitz  # PyMuPDF
-
-    def fusionar_bloques_inline(bloques, destino: Path):
-        """
-        Fast path con PyMuPDF:
-        - insert_pdf para cada bloque (ultra rÃƒÂ¡pido).
-        - Si header_text, dibuja marco+cabecera en las pÃƒÂ¡ginas reciÃƒÂ©n insertadas.
-        """
-        dst = fitz.open()
-        margin = 18
-        for pdf_path, header_text in bloques:
-            try:
-                src = fitz.open(str(pdf_path))
-            except Exception as e:
-                logging.info(f"[MERGE:SKIP] {Path(pdf_path).name} Ã‚Â· {e}")
-                continue
+def _fusionar_bloques_fitz(bloques, destino: Path):
+    """
+    Fast path con PyMuPDF:
+    - insert_pdf para cada bloque (ultra rÃƒÂ¡pido).
+    - Si header_text, dibuja marco+cabecera en las pÃƒÂ¡ginas reciÃƒÂ©n insertadas.
+    """
+    import fitz
 
-            start = dst.page_count
-            dst.insert_pdf(src)
-            end = dst.page_count
-            src.close()
+    dst = fitz.open()
+    margin = 18
+    for pdf_path, header_text in bloques:
+        try:
+            src = fitz.open(str(pdf_path))
+        except Exception as e:
+            logging.info(f"[MERGE:SKIP] {Path(pdf_path).name} Ã‚Â· {e}")
+            continue
 
-            if header_text:
-                title = str(header_text)[:180]
-                for i in range(start, end):
-                    page = dst[i]
-                    rect = page.rect
-                    page.draw_rect(
-                        fitz.Rect(margin, margin, rect.width - margin, rect.height - margin),
-                        width=1,
-                    )
-                    try:
-                        page.insert_text((margin + 10, rect.height - margin + 2), title, fontname="helv", fontsize=12)
-                    except Exception:
-                        page.insert_text((margin + 10, rect.height - margin + 2), title, fontsize=12)
+        start = dst.page_count
+        dst.insert_pdf(src)
+        end = dst.page_count
+        src.close()
 
-            logging.info(
-                f"[MERGE:+FITZ] {Path(pdf_path).name} Ã‚Â· pÃƒÂ¡ginas={end-start} Ã‚Â· header={'sÃƒÂ­' if header_text else 'no'}"
-            )
+        if header_text:
+            title = str(header_text)[:180]
+            for i in range(start, end):
+                page = dst[i]
+                rect = page.rect
+                page.draw_rect(
+                    fitz.Rect(margin, margin, rect.width - margin, rect.height - margin),
+                    width=1,
+                )
+                try:
+                    page.insert_text((margin + 10, rect.height - margin + 2), title, fontname="helv", fontsize=12)
+                except Exception:
+                    page.insert_text((margin + 10, rect.height - margin + 2), title, fontsize=12)
 
-        dst.save(str(destino), deflate=True, garbage=3)
-        dst.close()
-        logging.info(f"[MERGE:DONE/FITZ] {destino.name}")
+        logging.info(
+            f"[MERGE:+FITZ] {Path(pdf_path).name} Ã‚Â· pÃƒÂ¡ginas={end-start} Ã‚Â· header={'sÃƒÂ­' if header_text else 'no'}"
+        )
 
-except Exception:
+    dst.save(str(destino), deflate=True, garbage=3)
+    dst.close()
+    logging.info(f"[MERGE:DONE/FITZ] {destino.name}")
 
-    from PyPDF2 import PdfMerger
 
-    def fusionar_bloques_inline(bloques, destino: Path):
-        """
-        Fallback PyPDF2 AGRUPADO:
-        - Junta runs seguidos SIN header y los concatena directo con PdfMerger (sin paginar).
-        - Para los que requieren header, estampa una COPIA temporal con _estampar_header y la agrega.
-        - Al final, una sola escritura con PdfMerger.
-        """
-        final_parts: list[Path] = []
-        temps: list[Path] = []
-        i = 0
-        N = len(bloques)
-
-        while i < N:
-            pdf_path, hdr = bloques[i]
-            if hdr is None:
-                # run de PDFs sin header
-                j = i
-                run = []
-                while j < N and bloques[j][1] is None:
-                    run.append(Path(bloques[j][0]))
-                    j += 1
-
-                # agregamos los paths tal cual (concatena rapidÃƒÂ­simo)
-                final_parts.extend(run)
-                i = j
-                continue
+def _fusionar_bloques_pypdf2(bloques, destino: Path):
+    """
+    Fallback PyPDF2 AGRUPADO:
+    - Junta runs seguidos SIN header y los concatena directo con PdfMerger (sin paginar).
+    - Para los que requieren header, estampa una COPIA temporal con _estampar_header y la agrega.
+    - Al final, una sola escritura con PdfMerger.
+    """
+    final_parts: list[Path] = []
+    temps: list[Path] = []
+    i = 0
+    N = len(bloques)
+
+    while i < N:
+        pdf_path, hdr = bloques[i]
+        if hdr is None:
+            # run de PDFs sin header
+            j = i
+            run = []
+            while j < N and bloques[j][1] is None:
+                run.append(Path(bloques[j][0]))
+                j += 1
+
+            # agregamos los paths tal cual (concatena rapidÃƒÂ­simo)
+            final_parts.extend(run)
+            i = j
+            continue
 
-            # bloque con header ? estampar a archivo temporal
-            stamped = Path(tempfile.mkstemp(suffix=".stamped.pdf")[1])
-            try:
-                _estampar_header(Path(pdf_path), stamped, texto=str(hdr))
-                final_parts.append(stamped)
-                temps.append(stamped)
-            except Exception as e:
-                logging.info(f"[MERGE:HDR-ERR] {Path(pdf_path).name} Ã‚Â· {e}")
-            i += 1
+        # bloque con header ? estampar a archivo temporal
+        stamped = Path(tempfile.mkstemp(suffix=".stamped.pdf")[1])
+        try:
+            _estampar_header(Path(pdf_path), stamped, texto=str(hdr))
+            final_parts.append(stamped)
+            temps.append(stamped)
+        except Exception as e:
+            logging.info(f"[MERGE:HDR-ERR] {Path(pdf_path).name} Ã‚Â· {e}")
+        i += 1
 
-        # Concat ÃƒÂºnico
-        merger = PdfMerger()
-        for part in final_parts:
-            merger.append(str(part))
-            logging.info(f"[MERGE:+FAST] {part.name}")
+    # Concat ÃƒÂºnico
+    merger = PdfMerger()
+    for part in final_parts:
+        merger.append(str(part))
+        logging.info(f"[MERGE:+FAST] {part.name}")
 
-        with open(destino, "wb") as f:
-            merger.write(f)
-        merger.close()
-        logging.info(f"[MERGE:DONE/FAST] {destino.name}")
+    with open(destino, "wb") as f:
+        merger.write(f)
+    merger.close()
+    logging.info(f"[MERGE:DONE/FAST] {destino.name}")
 
-        for t in temps:
-            try:
-                t.unlink()
-            except Exception:
-                pass
+    for t in temps:
+        try:
+            t.unlink()
+        except Exception:
+            pass
 
-def _contar_paginas_pdf(path: Path) -> int:
+
+def fusionar_bloques_inline(bloques, destino: Path):
+    """Fusiona con PyMuPDF si esta disponible; si no, con el fallback agrupado de PyPDF2."""
     try:
-        return len(PdfReader(str(path)).pages)
+        import fitz  # PyMuPDF
     except Exception:
-        pass
+        return _fusionar_bloques_pypdf2(bloques, destino)
+    return _fusionar_bloques_fitz(bloques, destino)
+
+
+def _contar_paginas_pdf(path: Path) -> int:
+    # PyMuPDF solo lee el arbol de paginas; PyPDF2 parsea el archivo entero y queda de respaldo.
     try:
         import fitz
         doc = fitz.open(str(path))
         n = int(doc.page_count)
         doc.close()
         return n
+    except Exception:
+        pass
+    try:
+        return len(PdfReader(str(path)).pages)
     except Exception:
         return 1
 
 
+def _tipo_de_titulo(titulo: str) -> tuple[str, str]:
+    """'OPERACION - Decreto' -> ('OPERACION', 'Decreto'). Sin prefijo en mayusculas el titulo es su propio tipo."""
+    pre, sep, resto = (titulo or "").partition(" - ")
+    pre = pre.strip()
+    if sep and pre and pre.upper() == pre:
+        return pre, resto.strip()
+    return (titulo or "").strip(), ""
+
+
+def _fecha_real(fecha: str | None) -> str | None:
+    """Descarta las fechas sinteticas de orden (anio 1900, ver _push_ordenado)."""
+    m = re.match(r"(\d{2})/(\d{2})/(\d{4})$", fecha or "")
+    return fecha if m and int(m.group(3)) >= 1950 else None
+
+
+def _esquema_marcadores(bloques: list[tuple[str, int, str | None]]) -> list[list]:
+    """
+    Arbol de marcadores para set_toc a partir de [(titulo, pagina_1b, fecha)]
+    en orden: los bloques consecutivos de una misma fecha cuelgan de ella y,
+    dentro de la fecha, se agrupan por tipo (OPERACION, ADJUNTO, ...).
+    """
+    nada = object()
+    toc = []
+    fecha_act, tipo_act = nada, nada
+    for titulo, pagina, fecha in bloques:
+        fecha = _fecha_real(fecha)
+        tipo, nombre = _tipo_de_titulo(titulo)
+        if fecha != fecha_act:
+            fecha_act, tipo_act = fecha, nada
+            if fecha:
+                toc.append([1, fecha, pagina])
+        nivel = 2 if fecha else 1
+        if not nombre:  # p.ej. "LIBRO": hoja directa, sin grupo
+            toc.append([nivel, tipo, pagina])
+            tipo_act = nada
+            continue
+        if tipo != tipo_act:
+            toc.append([nivel, tipo, pagina])
+            tipo_act = tipo
+        toc.append([nivel + 1, nombre, pagina])
+    return toc
+
+
+def _escribir_destinos_nombrados(doc, destinos: dict[str, int]) -> int:
+    """
+    Registra destinos con nombre (/Names /Dests) a pagina completa, p.ej.
+    Exp_N.pdf#nameddest=bloque_0007. Un solo nodo hoja con las claves ordenadas.
+    """
+    pares = []
+    for nombre in sorted(destinos):
+        pno = destinos[nombre]
+        if 0 <= pno < doc.page_count:
+            pares.append(f"({nombre}) [{doc.page_xref(pno)} 0 R /Fit]")
+    if not pares:
+        return 0
+    xref = doc.get_new_xref()
+    doc.update_object(xref, "<< /Names [ " + " ".join(pares) + " ] >>")
+    cat = doc.pdf_catalog()
+    if doc.xref_get_key(cat, "Names")[0] == "null":
+        doc.xref_set_key(cat, "Names", f"<< /Dests {xref} 0 R >>")
+    else:
+        doc.xref_set_key(cat, "Names/Dests", f"{xref} 0 R")
+    return len(pares)
+
+
+def _paginas_escaneadas_bloque(pdf_path: Path, origen: str | None, n_paginas: int) -> list[int]:
+    """
+    Paginas del bloque (0-based, relativas) que son escaneo, por procedencia:
+    lo impreso por Chromium y lo convertido desde oficina tiene texto nativo,
+    una imagen convertida es toda escaneo y un PDF descargado se mira con
+    _analizar_pdf (imagen que cubre la pagina o sin texto de cuerpo).
+    """
+    if origen in ("chromium", "oficina"):
+        return []
+    if origen == "imagen":
+        return list(range(n_paginas))
+    analisis = _analizar_pdf(Path(pdf_path))
+    if analisis is None:
+        return []
+    min_chars = int(os.getenv("PAGE_BODY_MIN_CHARS", "80"))
+    return [
+        i for i, reg in enumerate(analisis["paginas"][:n_paginas])
+        if reg["cobertura"] > 0.35 or not _pagina_tiene_cuerpo(reg, min_chars=min_chars)
+    ]
+
+
+def _rango_mapa(mapa: dict | None, rol: str) -> range:
+    """Paginas (0-based) de la caratula o el indice segun el mapa de la fusion."""
+    r = (mapa or {}).get(rol)
+    return range(r[0], r[1]) if r else range(0)
+
+
 def fusionar_bloques_con_indice(
     bloques,
     destino: Path,
@@ -846,9 +1642,18 @@ def fusionar_bloques_con_indice(
 ):
     """
     Fusiona bloques PDF, inserta un ÃƒÂ­ndice clickable detrÃƒÂ¡s de la carÃƒÂ¡tula y devuelve
-    (idx_page_count, relink_items) donde:
+    (idx_page_count, relink_items, mapa) donde:
       - idx_page_count: cantidad de pÃƒÂ¡ginas del ÃƒÂ­ndice insertadas
-      - relink_items  : [{'title', 'start', 'target', 'y'}] para re-inyectar links post-OCR
+      - relink_items  : [{'title', 'start', 'target', 'y', 'dest'}] (sidecar e indice FTS)
+      - mapa          : roles de pagina del PDF final (0-based, rangos [desde, hasta)):
+                        {"paginas", "caratula", "indice", "bloques": [{"uid", "tipo",
+                        "titulo", "fecha", "desde", "hasta", "origen", "texto_nativo",
+                        "escaneadas"}]}; fojas, numeracion, OCR final y FTS lo usan en
+                        vez de volver a leer el texto del documento
+    Los bloques son (pdf, header[, toc_title[, fecha[, origen]]]). En el mismo guardado
+    escribe los marcadores (fecha > tipo > documento) y un destino con nombre
+    por bloque (caratula, indice, bloque_0001, ...); los pasos posteriores
+    guardan con PyMuPDF y los conservan, sin reinyectar links.
     TambiÃƒÂ©n escribe <destino>.toc.json con ese mapeo.
     El archivo auxiliar se elimina automÃƒÂ¡ticamente salvo que keep_sidecar sea True.
     """
@@ -856,12 +1661,12 @@ def fusionar_bloques_con_indice(
         import fitz  # PyMuPDF
     except Exception:
         # Sin PyMuPDF: fusiÃƒÂ³n simple sin ÃƒÂ­ndice
-        fusionar_bloques_inline(bloques, destino)
+        fusionar_bloques_inline([(b[0], b[1]) for b in bloques], destino)
         try:
             logging.info(f"[MERGE:DONE/NO_FITZ] {destino.name}")
         except Exception:
             pass
-        return 0, []
+        return 0, [], None
 
     def _add_goto_link(pg, rect, target_page_zero_based) -> bool:
         """Crea un link interno robusto, compatible con varias versiones de PyMuPDF."""
@@ -883,7 +1688,7 @@ def fusionar_bloques_con_indice(
 
     dst = fitz.open()
     margin = 18
-    items_info = []  # (title_for_toc, start_page_zero_based)
+    items_info = []  # (title_for_toc, start_page_zero_based, fecha, end, origen, escaneadas)
 
     # --- InserciÃƒÂ³n de bloques ---
     for item in bloques:
@@ -892,6 +1697,8 @@ def fusionar_bloques_con_indice(
         else:
             pdf_path, header_text = item[0], item[1]
             toc_title = None
+        fecha = item[3] if isinstance(item, (list, tuple)) and len(item) >= 4 else None
+        origen = item[4] if isinstance(item, (list, tuple)) and len(item) >= 5 else None
 
         try:
             src = fitz.open(str(pdf_path))
@@ -907,7 +1714,11 @@ def fusionar_bloques_con_indice(
 
         title_for_toc = (str(toc_title).strip() if toc_title
                          else (str(header_text).strip() if header_text else Path(pdf_path).name))
-        items_info.append((title_for_toc, start))
+        try:
+            escaneadas = _paginas_escaneadas_bloque(pdf_path, origen, end - start)
+        except Exception:
+            escaneadas = []
+        items_info.append((title_for_toc, start, fecha, end, origen, escaneadas))
 
         # Header opcional
         if header_text:
@@ -928,7 +1739,8 @@ def fusionar_bloques_con_indice(
     idx_page_count = 0
     relink_items = []
     insert_at_page = max(0, min(int(front_matter_pages or 0), dst.page_count))
-    entries = list(items_info[1:] if skip_first_block_in_index else items_info)
+    entries = sorted(items_info[1:] if skip_first_block_in_index else items_info, key=lambda x: x[1])
+    destino_de = {e[1]: f"bloque_{n:04d}" for n, e in enumerate(entries, 1)}
 
     if dst.page_count > 0 and entries:
         try:
@@ -1162,9 +1974,8 @@ def fusionar_bloques_con_indice(
                     if idx_page is not None:
                         idx_page = _paint_index_page(idx_page, continued=False)
                     y = y_start
-                    toc_outline = []
 
-                    for title, start_page in entries:
+                    for title, start_page, *_ in entries:
                         if y + row_h > ph - margin - 20:
                             page_idx += 1
                             if page_idx >= len(index_pages):
@@ -1209,7 +2020,6 @@ def fusionar_bloques_con_indice(
                             continue
 
                         target_page = start_page + idx_page_count  # 0-based
-                        toc_outline.append([1, t, target_page + 1])
 
                         try:
                             logging.info(f"[INDICE] item title={t[:50]} start={start_page} target={target_page} y={y}")
@@ -1271,15 +2081,11 @@ def fusionar_bloques_con_indice(
                             "title": t,
                             "start": (index_pages[page_idx] + 1),   # 1-based
                             "target": (target_page + 1),      # 1-based
-                            "y": float(y + row_h - 4)
+                            "y": float(y + row_h - 4),
+                            "dest": destino_de.get(start_page),
                         })
                         y += row_h + row_gap
 
-                    try:
-                        if toc_outline:
-                            dst.set_toc(toc_outline)
-                    except Exception:
-                        pass
 
                     try:
                         import io
@@ -1374,19 +2180,6 @@ def fusionar_bloques_con_indice(
                         try: logging.info(f"[INDICE] overlay reportlab error: {e_overlay_all}")
                         except Exception: pass
 
-                    # Sidecar
-                    try:
-                        sidecar = destino.with_suffix(".toc.json")
-                        import json
-                        with open(sidecar, "w", encoding="utf-8") as f:
-                            json.dump({"items": relink_items, "idx_pages": idx_page_count},
-                                      f, ensure_ascii=False, indent=2)
-                        logging.info(f"[INDICE] sidecar guardado: {sidecar.name} (items={len(relink_items)})")
-                        if not keep_sidecar:
-                            sidecar.unlink(missing_ok=True)
-                    except Exception as e:
-                        logging.info(f"[INDICE] sidecar error: {e}")
-
                     # DiagnÃƒÂ³stico: contar links por pÃƒÂ¡gina del ÃƒÂ­ndice
                     try:
                         for pno in index_pages:
@@ -1410,108 +2203,68 @@ def fusionar_bloques_con_indice(
             try: logging.info(f"[INDICE] error: {e}")
             except Exception: pass
 
+    def _pagina_final(start: int) -> int:
+        # las pÃƒÂ¡ginas del ÃƒÂ­ndice quedan delante de los bloques posteriores a la carÃƒÂ¡tula
+        return start + (idx_page_count if start >= insert_at_page else 0)
+
+    # --- Marcadores y destinos con nombre ---
+    try:
+        toc, destinos = [], {}
+        if skip_first_block_in_index and items_info and insert_at_page > 0:
+            toc.append([1, "Carátula", 1])
+            destinos["caratula"] = 0
+        if idx_page_count:
+            toc.append([1, "Índice", insert_at_page + 1])
+            destinos["indice"] = insert_at_page
+        toc.extend(_esquema_marcadores([(t, _pagina_final(st) + 1, f) for t, st, f, *_ in entries]))
+        for _t, st, *_ in entries:
+            destinos[destino_de[st]] = _pagina_final(st)
+        if toc:
+            dst.set_toc(toc, collapse=1)
+        n_dest = _escribir_destinos_nombrados(dst, destinos)
+        logging.info(f"[INDICE] marcadores={len(toc)} destinos={n_dest}")
+    except Exception as e:
+        logging.info(f"[INDICE] marcadores/destinos error: {e}")
+
+    # --- Mapa de roles de pagina ---
+    mapa = {
+        "paginas": dst.page_count,
+        "caratula": [0, insert_at_page] if (skip_first_block_in_index and insert_at_page > 0) else None,
+        "indice": [insert_at_page, insert_at_page + idx_page_count] if idx_page_count else None,
+        "bloques": [
+            {
+                "uid": destino_de[st],
+                "tipo": _tipo_de_titulo(t)[0],
+                "titulo": t,
+                "fecha": _fecha_real(f),
+                "desde": _pagina_final(st),
+                "hasta": _pagina_final(fin),
+                "origen": o or "descarga",
+                "texto_nativo": not esc,
+                "escaneadas": esc,
+            }
+            for t, st, f, fin, o, esc in entries
+        ],
+    }
+
+    # Sidecar
+    if keep_sidecar:
+        try:
+            sidecar = destino.with_suffix(".toc.json")
+            import json
+            with open(sidecar, "w", encoding="utf-8") as f:
+                json.dump({"items": relink_items, "idx_pages": idx_page_count, "mapa": mapa},
+                          f, ensure_ascii=False, indent=2)
+            logging.info(f"[INDICE] sidecar guardado: {sidecar.name} (items={len(relink_items)})")
+        except Exception as e:
+            logging.info(f"[INDICE] sidecar error: {e}")
+
     # --- Guardado ---
-    dst.save(str(destino), deflate=True, garbage=3)  # preserva anotaciones
+    dst.save(str(destino), deflate=True, garbage=3)  # preserva anotaciones, marcadores y /Dests
     dst.close()
     try: logging.info(f"[MERGE:DONE/INDICE] {destino.name}")
     except Exception: pass
-    return idx_page_count, relink_items
-
-
-def _relink_indice_con_fitz(pdf_path: Path, items: list[dict],
-                            left=36, right=36, line_h=20, pad_top=3, pad_bottom=3) -> tuple[bool, Path]:
-    """
-    Reinyecta anotaciones clickeables en las pÃƒÂ¡ginas de ÃƒÂ­ndice tras OCR/fojas.
-    items: [{'start':1,'target':7,'y':70,'title':'...'}, ...]
-    Devuelve (ok, path_final) donde path_final puede diferir si el archivo de
-    destino estaba en uso.
-    """
-    import fitz, math, os, time, shutil
-    if not items:
-        return True, pdf_path
-    try:
-        doc = fitz.open(str(pdf_path))
-
-        # 1) limpiar links existentes en pÃƒÂ¡ginas de ÃƒÂ­ndice
-        for it in items:
-            p = int(it.get("start", 1)) - 1
-            if 0 <= p < doc.page_count:
-                pg = doc[p]
-                ln = pg.first_link
-                while ln:
-                    nxt = ln.next
-                    pg.delete_link(ln)
-                    ln = nxt
-
-        # 2) reinsertar
-        for it in items:
-            p_from = int(it.get("start", 1)) - 1
-            p_to   = int(it.get("target", 1)) - 1
-            y      = float(it.get("y", 0.0))
-            if not (0 <= p_from < doc.page_count and 0 <= p_to < doc.page_count):
-                continue
-            pg = doc[p_from]
-            W, H = pg.rect.width, pg.rect.height
-            rect = fitz.Rect(left, max(0, y - line_h + pad_top),
-                             max(left + 50, W - right),
-                             min(H, y + pad_bottom))
-            pg.insert_link({"kind": fitz.LINK_GOTO, "from": rect, "page": p_to, "zoom": 0})
-        try:
-            doc.save(str(pdf_path), incremental=True, deflate=True)
-        except Exception as err:
-            if "code=4" in str(err):
-                tmp = pdf_path.with_suffix(".tmp.pdf")
-                doc.save(str(tmp), deflate=True)
-                doc.close()
-                try:
-                    os.replace(str(tmp), str(pdf_path))
-                except PermissionError:
-                    # El archivo destino estÃƒÂ¡ abierto; guardar con un nombre alternativo
-                    alt = pdf_path
-                    orig = pdf_path
-                    i = 1
-                    while alt.exists():
-                        alt = pdf_path.with_name(f"{pdf_path.stem} ({i}){pdf_path.suffix}")
-                        i += 1
-                    shutil.move(str(tmp), str(alt))
-                    logging.info(f"[INDICE/LINK] destino en uso, guardado como {alt.name}")
-                    for _ in range(5):
-                        try:
-                            orig.unlink(missing_ok=True)
-                            break
-                        except PermissionError:
-                            time.sleep(0.2)
-                        except Exception:
-                            break
-                    pdf_path = alt
-                finally:
-                    tmp.unlink(missing_ok=True)
-            else:
-                doc.close()
-                raise
-        else:
-            doc.close()
-        return True, pdf_path
-    except Exception as e:
-        logging.info(f"[INDICE/LINK:ERR] {e}")
-        return False, pdf_path
-
-
-def _log_links_en_pagina(pdf_path: Path, pagina_1b: int, etiqueta: str):
-    import fitz
-    try:
-        doc = fitz.open(str(pdf_path))
-        p = pagina_1b - 1
-        if 0 <= p < doc.page_count:
-            ln = doc[p].first_link
-            n = 0
-            while ln:
-                n += 1
-                ln = ln.next
-            logging.info(f"[{etiqueta}] links en pÃƒÂ¡gina {pagina_1b}: {n}")
-        doc.close()
-    except Exception as e:
-        logging.info(f"[{etiqueta}] no se pudo contar links: {e}")
+    return idx_page_count, relink_items, mapa
 
 
 def _listar_ops_ids_radiografia(sac, wait_ms: int | None = None, scan_frames: bool = True) -> list[str]:
@@ -1528,14 +2281,15 @@ def _listar_ops_ids_radiografia(sac, wait_ms: int | None = None, scan_frames: bo
     wait_ms = int(os.getenv("RADIO_OPS_WAIT_MS", "300")) if wait_ms is None else int(wait_ms)
 
     def _cosechar(sc):
+        # una sola llamada por scope en lugar de count + 2 get_attribute por elemento
         try:
-            n = sc.locator(sels_js).count()
+            attrs = sc.eval_on_selector_all(
+                sels_js,
+                "els => els.map(el => [el.getAttribute('href') || '', el.getAttribute('onclick') || ''])",
+            ) or []
         except Exception:
-            n = 0
-        for i in range(n):
-            el = sc.locator(sels_js).nth(i)
-            href = el.get_attribute("href") or ""
-            oc = el.get_attribute("onclick") or ""
+            attrs = []
+        for href, oc in attrs:
             m = re.search(r"VerDecretoHtml\('([^']+)'", href or oc)  # acepta GUID o numÃƒÂ©rico
             if m:
                 ids.add(m.group(1))
@@ -1553,29 +2307,16 @@ def _listar_ops_ids_radiografia(sac, wait_ms: int | None = None, scan_frames: bo
     except Exception:
         pass
 
-    # Espera corta en la page principal
-    deadline = time.time() + max(0, wait_ms) / 1000.0
-    while time.time() < deadline:
+    # Espera corta (por evento) en la page principal
+    grupos = [[{"css": sels_js}]]
+    if _esperar_dom(sac, grupos, timeout_ms=wait_ms):
         _cosechar(sac)
-        if ids:
-            break
-        try:
-            sac.wait_for_timeout(120)
-        except Exception:
-            break
 
     # Si aÃƒÂºn no hay ids y estÃƒÂ¡ permitido, frames express (300 ms c/u, corta al primer hallazgo)
     if not ids and scan_frames:
         for fr in list(sac.frames):
-            end = time.time() + 0.3
-            while time.time() < end:
+            if _esperar_dom(fr, grupos, timeout_ms=300):
                 _cosechar(fr)
-                if ids:
-                    break
-                try:
-                    fr.wait_for_timeout(120)
-                except Exception:
-                    break
             if ids:
                 break
 
@@ -2149,32 +2890,20 @@ def _pdf_char_count(path: Path, paginas: int = 3) -> int:
 def _has_enough_text(path: Path, paginas: int = 3) -> bool:
     # Umbral por defecto mÃƒÂ¡s alto para ser estrictos al considerar que ya hay texto
     min_chars = int(os.getenv("OCR_MIN_CHARS", "1200"))
-    try:
-        import fitz  # PyMuPDF
-        doc = fitz.open(str(path))
+    analisis = _analizar_pdf(path)
+    if analisis is not None:
+        # "cuerpo" ignora ~12% superior e inferior (cabecera/pie)
+        return sum(p["cuerpo"] for p in analisis["paginas"][:max(1, int(paginas))]) >= min_chars
+    # Fallback PyPDF2
+    try:
+        from PyPDF2 import PdfReader
+        r = PdfReader(str(path))
         total = 0
-        n = min(doc.page_count, max(1, int(paginas)))
-        for i in range(n):
-            pg = doc[i]
-            h = pg.rect.height
-            top, bottom = 0.12*h, 0.88*h  # ignora ~12% superior e inferior (cabecera/pie)
-            for x0,y0,x1,y1,txt,*_ in (pg.get_text("blocks") or []):
-                if y1 <= top or y0 >= bottom:
-                    continue
-                total += len((txt or "").strip())
-        doc.close()
+        for p in r.pages[:paginas]:
+            total += len((p.extract_text() or "").strip())
         return total >= min_chars
     except Exception:
-        # Fallback PyPDF2
-        try:
-            from PyPDF2 import PdfReader
-            r = PdfReader(str(path))
-            total = 0
-            for p in r.pages[:paginas]:
-                total += len((p.extract_text() or "").strip())
-            return total >= min_chars
-        except Exception:
-            return False
+        return False
 
 
 def _page_has_text(pg, min_chars: int = 50) -> bool:
@@ -2319,20 +3048,151 @@ def convertir_pdf_a_imagenes(
         imagenes.append(str(dst))
     return imagenes
 
-def _apply_winocr_to_pdf(pdf_in: Path, dst: Path, lang_tags: list[str] | None = None, dpi: int = 300) -> bool:
+def _capa_texto_ocr(doc, page, lineas: list, fontname: str = "helv", visible: bool = False) -> int:
+    """
+    Agrega a `page` una capa de texto OCR compacta: un objeto de texto por
+    linea (BT/ET), modo de render invisible (3 Tr) y escalado horizontal (Tz)
+    para que la linea ocupe el ancho de sus cajas de palabras. Se mide una
+    sola vez por linea y el contenido original de la pagina no se toca: el
+    stream nuevo se agrega al final de /Contents.
+    `lineas`: [(texto, fitz.Rect en coordenadas de la pagina visible), ...].
+    Devuelve la cantidad de lineas escritas.
+    """
+    import fitz
+
+    def _pdf_str(t: str) -> str:
+        b = t.encode("cp1252", "replace")
+        return b.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)").decode("latin-1")
+
+    # pagina visible (origen arriba-izquierda, con rotacion) -> espacio PDF
+    a_pdf = page.derotation_matrix * ~page.transformation_matrix
+    ops = []
+    for texto, rect in lineas:
+        texto = (texto or "").strip()
+        if not texto or rect.is_empty or rect.height <= 0:
+            continue
+        h = rect.height
+        fs = max(3.5, h * 0.86)
+        try:
+            natural = fitz.get_text_length(texto, fontname=fontname, fontsize=fs)
+        except Exception:
+            natural = fs * 0.5 * len(texto)
+        tz = 100.0 * rect.width / natural if natural > 0 else 100.0
+        tz = max(10.0, min(1000.0, tz))
+        m = fitz.Matrix(1, 0, 0, -1, rect.x0, rect.y1 - max(0.6, h * 0.08)) * a_pdf
+        ops.append(
+            f"BT /{fontname} {fs:.2f} Tf {tz:.2f} Tz "
+            f"{m.a:.4f} {m.b:.4f} {m.c:.4f} {m.d:.4f} {m.e:.2f} {m.f:.2f} Tm ({_pdf_str(texto)}) Tj ET"
+        )
+    if not ops:
+        return 0
+    page.insert_font(fontname=fontname)  # registra la fuente base-14 en los recursos
+    page.wrap_contents()  # aisla el estado grafico del contenido original (q ... Q)
+    modo = "0" if visible else "3"
+    stream = ("q 0 g %s Tr\n" % modo + "\n".join(ops) + "\nQ\n").encode("latin-1")
+    xref = doc.get_new_xref()
+    doc.update_object(xref, "<<>>")
+    doc.update_stream(xref, stream)
+    contenidos = list(page.get_contents()) + [xref]
+    doc.xref_set_key(page.xref, "Contents", "[" + " ".join(f"{x} 0 R" for x in contenidos) + "]")
+    return len(ops)
+
+
+def _confianza_ocr(res) -> tuple[int, float]:
+    """
+    (cantidad de palabras, confianza estimada 0..1) de un resultado WinOCR.
+    WinRT no expone confianza por palabra: se estima como la fraccion de
+    palabras "plausibles" (mayormente alfanumericas, y con alguna vocal si
+    son solo letras y largas). El ruido de un escaneo malo baja esa fraccion.
+    """
+    try:
+        palabras = [w.text or "" for ln in (res.lines or []) for w in ln.words]
+    except Exception:
+        return 0, 0.0
+    if not palabras:
+        return 0, 0.0
+    buenas = 0
+    for p in palabras:
+        alnum = sum(1 for c in p if c.isalnum())
+        if not p or alnum / len(p) < 0.6:
+            continue
+        if len(p) >= 4 and p.isalpha() and not re.search(r"[aeiouáéíóúüAEIOUÁÉÍÓÚÜyY]", p):
+            continue
+        buenas += 1
+    return len(palabras), buenas / len(palabras)
+
+
+def _imagen_nativa_pagina(doc, page):
+    """
+    Si la pagina es una sola imagen embebida que WinOCR decodifica tal cual
+    (JPEG/PNG/TIFF/BMP), devuelve (bytes del stream, matriz unidad -> pagina
+    visible) para reconocerla a su resolucion nativa, sin rasterizar ni
+    recodificar. La matriz sale de la ubicacion de la imagen en la pagina.
+    Si no aplica, None.
+    """
+    import fitz
+
+    try:
+        infos = page.get_image_info(xrefs=True)
+    except Exception:
+        return None
+    if len(infos) != 1 or not infos[0].get("xref"):
+        return None  # varias imagenes, o inline (sin xref)
+    info = infos[0]
+    area = float(page.rect.width * page.rect.height)
+    bbox = fitz.Rect(info["bbox"])
+    if area <= 0 or (bbox.width * bbox.height) / area < 0.5:
+        return None
+    try:
+        img = doc.extract_image(info["xref"])
+    except Exception:
+        return None
+    if not img or (img.get("ext") or "").lower() not in ("jpeg", "jpg", "png", "tiff", "tif", "bmp"):
+        return None
+    # WinRT OcrEngine.MaxImageDimension = 10000
+    if max(int(img.get("width") or 0), int(img.get("height") or 0)) > 10000:
+        return None
+    return img["image"], fitz.Matrix(info["transform"]) * page.rotation_matrix
+
+
+def _caja_ocr_a_unidad(x: float, y: float, w: float, h: float, img_w: int, img_h: int, deg: int = 0) -> tuple:
+    """
+    Caja de una palabra en la imagen que se mando al OCR (quizas escalada y
+    rotada `deg` grados antihorario, como Image.rotate) -> rect en el
+    cuadrado unidad de la imagen original.
+    """
+    if img_w <= 0 or img_h <= 0:
+        return (0.0, 0.0, 0.0, 0.0)
+    u0, v0, u1, v1 = x / img_w, y / img_h, (x + w) / img_w, (y + h) / img_h
+    deg = int(deg) % 360
+    if deg == 90:
+        u0, v0, u1, v1 = 1 - v1, u0, 1 - v0, u1
+    elif deg == 180:
+        u0, v0, u1, v1 = 1 - u1, 1 - v1, 1 - u0, 1 - v0
+    elif deg == 270:
+        u0, v0, u1, v1 = v0, 1 - u1, v1, 1 - u0
+    return (u0, v0, u1, v1)
+
+
+def _apply_winocr_to_pdf(pdf_in: Path, dst: Path, lang_tags: list[str] | None = None, dpi: int = 300,
+                         paginas: set[int] | None = None) -> bool:
     """
     Aplica OCR WinRT/Windows a un PDF y agrega texto seleccionable.
+    La capa de texto es invisible y se agrega sobre el contenido original
+    (ver _capa_texto_ocr): no se copia ni se vuelve a pegar ninguna imagen.
     Solo realiza OCR sobre Ã¯Â¿Â½?oadjuntosÃ¯Â¿Â½?Ã¯Â¿Â½ (pÃƒÂ¡ginas escaneadas / sin texto ÃƒÂºtil en el cuerpo).
+    Si el llamador ya sabe cuales son (`paginas`, 0-based) no se detectan.
     Probado con PyMuPDF 1.26.4 (MuPDF 1.26.7) en Windows / Python 3.12.
 
     ENV opcionales:
       OCR_DEBUG=1                -> logs extra
-      OCR_INVISIBLE=0/1          -> si 1, texto invisible (no recomendado para selecciÃƒÂ³n)
-      OCR_VISIBLE_TEXT=1         -> fuerza texto visible
+      OCR_VISIBLE_TEXT=1         -> capa de texto visible (solo para depurar la ubicacion)
       OCR_ROTATIONS="0,90,270"   -> rotaciones a probar
-      OCR_SCALE=2.0              -> escalado previo para OCR
+      OCR_SCALE=2.0              -> escalado previo para OCR (solo nivel 2)
+      OCR_DPI_BAJO=200           -> resolucion del primer intento (nivel 1)
+      OCR_MIN_WORDS=30           -> por debajo, la pagina escala a `dpi` + preproceso (nivel 2)
+      OCR_MIN_CONF=0.8           -> idem con la confianza estimada (ver _confianza_ocr)
       PAGE_BODY_MIN_CHARS=50     -> umbral para Ã¯Â¿Â½?opÃƒÂ¡gina ya tiene textoÃ¯Â¿Â½?Ã¯Â¿Â½
-      OCR_USE_OCG=0/1            -> si 1, intenta capa OCG
       OCR_FONT="helv"            -> fuente PDF estÃƒÂ¡ndar a usar
       WINOCR_LANGS="es-AR+es-ES+en-US"
     """
@@ -2344,7 +3204,7 @@ def _apply_winocr_to_pdf(pdf_in: Path, dst: Path, lang_tags: list[str] | None =
         return False
 
     # requisito externo
-    if not _WINOCR_OK:
+    if not _winocr_disponible():
         logging.info("[WINOCR] Paquete winsdk/winrt no disponible.")
         return False
 
@@ -2354,44 +3214,21 @@ def _apply_winocr_to_pdf(pdf_in: Path, dst: Path, lang_tags: list[str] | None =
 
     # flags
     dbg            = os.getenv("OCR_DEBUG", "1").lower() in ("1", "true", "yes", "on")
-    force_visible  = os.getenv("OCR_VISIBLE_TEXT", "1").lower() in ("1", "true", "yes", "on")
-    make_invisible = os.getenv("OCR_INVISIBLE", "0").lower() in ("1", "true", "yes", "on") and not force_visible
+    visible        = os.getenv("OCR_VISIBLE_TEXT", "0").lower() in ("1", "true", "yes", "on")
     min_chars      = int(os.getenv("PAGE_BODY_MIN_CHARS", "50"))
-    use_ocg        = os.getenv("OCR_USE_OCG", "0").lower() in ("1", "true", "yes", "on")
     font_name      = os.getenv("OCR_FONT", "helv")  # fuente base PDF, no requiere incrustar
 
     # --- helpers -----------------------------------------------------------------
-    def _shrink_font_to_fit(text: str, rect: "fitz.Rect", base_size: float) -> float:
-        """Baja font-size si el ancho del texto supera el rect. Mantiene altura."""
-        try:
-            w = fitz.get_text_length(text, fontname=font_name, fontsize=base_size)
-            if w > 0 and rect.width > 0 and w > rect.width:
-                base_size *= (rect.width / w)
-        except Exception:
-            pass
-        return max(3.5, base_size)
-
-    def _draw_word(page: "fitz.Page", rect: "fitz.Rect", text: str):
-        """Dibuja una palabra visible y seleccionable (insert_text, no textbox)."""
-        if not text:
-            return
-        h = rect.height
-        size = _shrink_font_to_fit(text, rect, base_size=max(4.0, h * 0.86))
-        baseline_y = rect.y1 - max(0.6, h * 0.08)
-        if make_invisible:
-            # Nota: algunos visores no permiten selecciÃƒÂ³n con render_mode=3
-            page.insert_text(
-                fitz.Point(rect.x0, baseline_y),
-                text, fontsize=size, fontname=font_name, render_mode=3, color=(0, 0, 0)
-            )
-        else:
-            page.insert_text(
-                fitz.Point(rect.x0, baseline_y),
-                text, fontsize=size, fontname=font_name, render_mode=0, color=(0, 0, 0)
-            )
+    analisis = _analizar_pdf(pdf_in) if paginas is None else None
 
     def _is_attachment_page(pg: "fitz.Page") -> bool:
         """HeurÃƒÂ­stica: sin texto de cuerpo + presencia/ÃƒÂ¡rea de imagen relevante."""
+        if analisis is not None and pg.number < len(analisis["paginas"]):
+            reg = analisis["paginas"][pg.number]
+            if _pagina_tiene_cuerpo(reg, min_chars=min_chars):
+                return False
+            # adjunto si la/s imagen/es cubren una parte importante de la pagina, o al menos hay una
+            return reg["cobertura"] > 0.35 or reg["imagenes"] > 0
         try:
             if _page_has_text(pg, min_chars=min_chars):
                 return False
@@ -2424,10 +3261,9 @@ def _apply_winocr_to_pdf(pdf_in: Path, dst: Path, lang_tags: list[str] | None =
         logging.info(f"[WINOCR] No pude abrir PDF origen: {e}")
         return False
 
-    out = fitz.open()
     try:
         # metadatos
-        out.set_metadata({
+        src.set_metadata({
             "keywords": "OCR,Searchable",
             "creator": "SACDownloader",
             "producer": "SACDownloader",
@@ -2435,151 +3271,163 @@ def _apply_winocr_to_pdf(pdf_in: Path, dst: Path, lang_tags: list[str] | None =
             "creationDate": datetime.datetime.now().strftime("D:%Y%m%d%H%M%S"),
         })
 
-        # OCG opcional (no recomendado para compatibilidad de selecciÃƒÂ³n)
-        ocr_layer = None
-        if use_ocg:
+        def _render(pg, dpi_):
             try:
-                ocr_layer = out.add_ocg("OCR Layer", on=True, intent="View")
+                zoom = dpi_ / 72.0
+                return pg.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False).tobytes("png")
             except Exception as e:
-                logging.info(f"[WINOCR] add_ocg fallÃƒÂ³, sigo sin OCG: {e}")
-                ocr_layer = None
+                logging.info(f"[WINOCR] No pude rasterizar pÃƒÂ¡gina {pg.number + 1}: {e}")
+                return None
+
+        try:
+            from PIL import Image, ImageOps, ImageFilter
+            import io as _io
+            def _prep(b, deg):
+                im = Image.open(_io.BytesIO(b)).convert("RGB")  # sin alfa
+                scale = float(os.getenv("OCR_SCALE", "2.0"))
+                w, h = im.size
+                im = im.resize((int(w * scale), int(h * scale)))
+                mw, mh = 5000, 5000
+                w2, h2 = im.size
+                if w2 > mw or h2 > mh:
+                    r = min(mw / float(w2), mh / float(h2))
+                    im = im.resize((int(w2 * r), int(h2 * r)))
+                im = ImageOps.autocontrast(im)
+                im = im.filter(ImageFilter.UnsharpMask(radius=1.0, percent=120, threshold=3))
+                if deg:
+                    im = im.rotate(deg, expand=True)
+                outb = _io.BytesIO()
+                im.save(outb, format="PNG")
+                return outb.getvalue()
+        except Exception:
+            _prep = None
+
+        dpi_bajo = int(os.getenv("OCR_DPI_BAJO", "200"))
+        min_words = int(os.getenv("OCR_MIN_WORDS", "30"))
+        min_conf = float(os.getenv("OCR_MIN_CONF", "0.8"))
+        early_stop_wc = int(os.getenv("OCR_EARLY_STOP_WC", "140"))
+        paginas_nivel = {1: 0, 2: 0}
 
         # Recorrer pÃƒÂ¡ginas y hacer OCR SOLO en adjuntos
         for i in range(src.page_count):
             pg = src[i]
 
-            # Si NO es adjunto -> copiar tal cual, sin OCR
-            if not _is_attachment_page(pg):
-                out.insert_pdf(src, from_page=i, to_page=i)
+            # Si NO es adjunto -> queda tal cual, sin OCR
+            if not (i in paginas if paginas is not None else _is_attachment_page(pg)):
                 if dbg:
                     logging.info(f"[WINOCR:DBG] page={i+1} sin OCR (no es adjunto)")
                 continue
 
-            # Renderizar imagen de esa pÃƒÂ¡gina (solo para este adjunto)
-            try:
-                zoom = dpi / 72.0
-                mat = fitz.Matrix(zoom, zoom)
-                pix = pg.get_pixmap(matrix=mat, alpha=False)
-                png_bytes = pix.tobytes("png")
-                img_w, img_h = pix.width, pix.height
-            except Exception as e:
-                logging.info(f"[WINOCR] No pude rasterizar pÃƒÂ¡gina {i+1}: {e}")
-                out.insert_pdf(src, from_page=i, to_page=i)
-                continue
-
-            page_w, page_h = float(pg.rect.width), float(pg.rect.height)
-
-            # OCR (rotaciones + preproc)
-            rots = [int(x) for x in os.getenv("OCR_ROTATIONS", "0,90,270").split(",") if x.strip().isdigit()]
-            ocr_result, best_bytes, best_wc, best_deg = None, png_bytes, -1, 0
+            t_pag = time.perf_counter()
+            # Nivel 1: una sola pasada barata (primer idioma, sin rotar ni preprocesar).
+            # Pagina = una sola imagen embebida -> stream original a resolucion nativa;
+            # si no, la pagina renderizada a OCR_DPI_BAJO.
+            a_pagina = fitz.Matrix(float(pg.rect.width), 0, 0, float(pg.rect.height), 0, 0)  # unidad -> pagina
+            nativa = _imagen_nativa_pagina(src, pg)
+            if nativa is not None:
+                base, a_pagina = nativa
+                nivel1 = "nativa"
+            else:
+                base = _render(pg, dpi_bajo)
+                nivel1 = f"{dpi_bajo}dpi"
+                if base is None:
+                    continue
 
+            # Puntaje = palabras * confianza (~ palabras plausibles): una pasada con
+            # mas ruido no desplaza a una mas limpia solo por tener mas "palabras".
+            ocr_result, best_bytes, best_wc, best_conf, best_deg = None, base, -1, 0.0, 0
+            best_score = -1.0
             try:
-                from PIL import Image, ImageOps, ImageFilter
-                import io as _io
-                def _prep(b, deg):
-                    im = Image.open(_io.BytesIO(b)).convert("RGB")  # sin alfa
-                    scale = float(os.getenv("OCR_SCALE", "2.0"))
-                    w, h = im.size
-                    im = im.resize((int(w * scale), int(h * scale)))
-                    mw, mh = 5000, 5000
-                    w2, h2 = im.size
-                    if w2 > mw or h2 > mh:
-                        r = min(mw / float(w2), mh / float(h2))
-                        im = im.resize((int(w2 * r), int(h2 * r)))
-                    im = ImageOps.autocontrast(im)
-                    im = im.filter(ImageFilter.UnsharpMask(radius=1.0, percent=120, threshold=3))
-                    if deg:
-                        im = im.rotate(deg, expand=True)
-                    outb = _io.BytesIO()
-                    im.save(outb, format="PNG")
-                    return outb.getvalue()
-            except Exception:
-                _prep = None
-
-            early_stop_wc = int(os.getenv("OCR_EARLY_STOP_WC", "140"))
-            stop_all = False
-            for deg in rots:
-                for j, tag in enumerate(lang_tags):
-                    try:
-                        # Primera pasada (deg=0, primer idioma) sin pre-proceso para acelerar
-                        if _prep and not (deg == 0 and j == 0):
-                            data = _prep(png_bytes, deg)
-                        else:
-                            data = png_bytes
-                        res  = _run_ocr_sync(data, tag.strip())
-                        wc   = 0
-                        if res and getattr(res, "lines", None):
-                            try:
-                                wc = sum(len(ln.words) for ln in res.lines)
-                            except Exception:
-                                wc = 0
-                        if res and getattr(res, "text", None) and wc > best_wc:
-                            ocr_result, best_wc, best_deg, best_bytes = res, wc, deg, data
-                        # Corta temprano si ya hay suficiente texto
-                        if best_wc >= early_stop_wc:
-                            stop_all = True
-                            break
-                    except Exception as e:
-                        if dbg:
-                            logging.info(f"[WINOCR] OCR fallo {tag} deg={deg}: {e}")
-                        continue
-                if stop_all:
-                    break
+                res = _run_ocr_sync(base, lang_tags[0].strip())
+                wc, conf = _confianza_ocr(res)
+                if res and getattr(res, "text", None):
+                    ocr_result, best_wc, best_conf, best_score = res, wc, conf, wc * conf
+            except Exception as e:
+                if dbg:
+                    logging.info(f"[WINOCR] OCR fallo {lang_tags[0]} ({nivel1}): {e}")
 
-            if dbg:
-                logging.info(f"[WINOCR:DBG] page={i+1} (adjunto) best_deg={best_deg} best_wc={best_wc}")
+            if best_wc >= min_words and best_conf >= min_conf:
+                nivel = 1
+                paginas_nivel[1] += 1
+                logging.info(f"[WINOCR] pag {i+1}: {nivel1} wc={best_wc} conf={best_conf:.2f} -> ok")
+            else:
+                # Nivel 2: alta resolucion + preproceso, rotaciones e idiomas.
+                nivel = 2
+                paginas_nivel[2] += 1
+                if nativa is not None:
+                    alta, crudo = base, False  # la nativa ya se probo cruda
+                else:
+                    alta, crudo = _render(pg, dpi), True
+                    if alta is None:
+                        alta, crudo = base, False
+                logging.info(
+                    f"[WINOCR] pag {i+1}: {nivel1} wc={max(best_wc, 0)} conf={best_conf:.2f} "
+                    f"-> escalo ({'nativa' if nativa is not None else f'{dpi}dpi'} + preproceso)"
+                )
+                rots = [int(x) for x in os.getenv("OCR_ROTATIONS", "0,90,270").split(",") if x.strip().isdigit()]
+                stop_all = False
+                for deg in rots:
+                    for j, tag in enumerate(lang_tags):
+                        try:
+                            if deg == 0 and j == 0 and crudo:
+                                data = alta
+                            elif _prep:
+                                data = _prep(alta, deg)
+                            else:
+                                continue
+                            res = _run_ocr_sync(data, tag.strip())
+                            wc, conf = _confianza_ocr(res)
+                            if res and getattr(res, "text", None) and wc * conf > best_score:
+                                ocr_result, best_wc, best_conf, best_deg, best_bytes = res, wc, conf, deg, data
+                                best_score = wc * conf
+                            # Corta temprano si ya hay suficiente texto
+                            if best_wc >= early_stop_wc:
+                                stop_all = True
+                                break
+                        except Exception as e:
+                            if dbg:
+                                logging.info(f"[WINOCR] OCR fallo {tag} deg={deg}: {e}")
+                            continue
+                    if stop_all:
+                        break
+                logging.info(f"[WINOCR] pag {i+1}: nivel 2 wc={max(best_wc, 0)} conf={best_conf:.2f} deg={best_deg}")
 
-            # tamaÃƒÂ±o de la imagen Ã¯Â¿Â½?oganadoraÃ¯Â¿Â½?Ã¯Â¿Â½ (por si rotÃƒÂ³)
+            # tamaÃƒÂ±o de la imagen Ã¯Â¿Â½?oganadoraÃ¯Â¿Â½?Ã¯Â¿Â½ (por si rotÃƒÂ³ o se escalÃƒÂ³)
             try:
                 from PIL import Image as _Image
                 import io as _io
-                _imtmp = _Image.open(_io.BytesIO(best_bytes))
-                img_w, img_h = _imtmp.size
+                img_w, img_h = _Image.open(_io.BytesIO(best_bytes)).size
             except Exception:
-                pass
-
-            # factores de escala imagen->PDF (Ã‚Â¡sin invertir Y!)
-            sx = page_w / float(img_w)
-            sy = page_h / float(img_h)
+                img_w = img_h = 0
 
-            # copiar pÃƒÂ¡gina original
-            out.insert_pdf(src, from_page=i, to_page=i)
-            newp = out[-1]
-
-            # texto OCR seleccionable (debajo)
+            # texto OCR invisible, una linea = un objeto de texto
+            lineas = []
             if ocr_result and getattr(ocr_result, "lines", None):
                 for line in ocr_result.lines:
-                    for word in line.words:
-                        try:
+                    try:
+                        cajas = []
+                        for word in line.words:
                             r = word.bounding_rect  # x,y,width,height (coords de la imagen)
-                            x0 = r.x * sx
-                            x1 = (r.x + r.width) * sx
-                            y0 = r.y * sy
-                            y1 = (r.y + r.height) * sy
-                            rect = fitz.Rect(x0, y0, x1, y1)
-                            _draw_word(newp, rect, word.text)
-                        except Exception:
-                            continue
-
-            # Pegar la imagen de la pÃƒÂ¡gina *encima* (sin cuadros rojos)
-            # Usamos el render original (png_bytes) para que calce 1:1 con la pÃƒÂ¡gina.
-            newp.insert_image(fitz.Rect(0, 0, page_w, page_h), stream=png_bytes, overlay=True)
-
-            # normalizar recursos/XObjects
+                            unidad = _caja_ocr_a_unidad(r.x, r.y, r.width, r.height, img_w, img_h, best_deg)
+                            cajas.append((word.text, fitz.Rect(unidad) * a_pagina))
+                    except Exception:
+                        continue
+                    if cajas:
+                        rect = fitz.Rect(cajas[0][1])
+                        for _t, rc in cajas[1:]:
+                            rect |= rc
+                        lineas.append((" ".join(t for t, _rc in cajas if t), rect))
             try:
-                newp.wrap_contents()
-            except Exception:
-                pass
+                _capa_texto_ocr(src, pg, lineas, fontname=font_name, visible=visible)
+            except Exception as e:
+                logging.info(f"[WINOCR] No pude escribir la capa de texto en pÃƒÂ¡gina {i+1}: {e}")
+            _METRICAS.inc("ocr_paginas_total", nivel=nivel)
+            _METRICAS.observar("ocr_pagina_segundos", time.perf_counter() - t_pag, nivel=nivel)
 
-        out.save(str(dst), deflate=True, garbage=3)
-        ok = dst.exists() and dst.stat().st_size > 1024
-        if ok and dbg:
-            try:
-                logging.info(f"[WINOCR:DBG] OCGS: {out.get_ocgs()}")
-                logging.info(f"[WINOCR:DBG] UI:   {out.layer_ui_configs()}")
-            except Exception:
-                pass
-        return ok
+        if paginas_nivel[1] or paginas_nivel[2]:
+            logging.info(f"[WINOCR] {pdf_in.name}: nivel 1={paginas_nivel[1]} pag. · nivel 2={paginas_nivel[2]} pag.")
+        src.save(str(dst), deflate=True, garbage=3)
+        return dst.exists() and dst.stat().st_size > 1024
 
     except Exception as e:
         logging.info(f"[WINOCR] Error procesando PDF: {e}")
@@ -2589,45 +3437,128 @@ def _apply_winocr_to_pdf(pdf_in: Path, dst: Path, lang_tags: list[str] | None =
             src.close()
         except Exception:
             pass
-        try:
-            out.close()
-        except Exception:
-            pass
 
-def _maybe_ocr(pdf_in: Path, force: bool = False) -> Path:
+def _paginas_para_ocr_final(pdf: Path, saltear: int = 0, mapa: dict | None = None) -> list[int]:
     """
-    OCR con Windows WinRT.
-    - OCR_MODE=off   -> nunca
-    - OCR_MODE=force -> siempre
-    - OCR_MODE=auto  -> solo si detecta poco texto (_has_enough_text)
-    - WINOCR_LANGS="es-AR+es-ES+en-US"
-    - OCR_DPI=300 (por default)
+    Paginas (0-based) del PDF final que vale la pena pasar por ocrmypdf:
+    las escaneadas (imagen que cubre buena parte de la pagina) o sin texto
+    de cuerpo. Las impresas por Chromium tienen texto nativo y quedan
+    afuera, igual que las `saltear` primeras (caratula + indice).
+    Con el mapa de la fusion salen directo de los bloques, sin releer el PDF.
     """
-    mode = (os.getenv("OCR_MODE", "auto") or "").lower() or "auto"
-    if mode == "off":
-        return pdf_in
+    if mapa:
+        return sorted(b["desde"] + k for b in mapa["bloques"] for k in b["escaneadas"])
+    analisis = _analizar_pdf(pdf)
+    if analisis is None:
+        return []
+    min_chars = int(os.getenv("PAGE_BODY_MIN_CHARS", "80"))
+    return [
+        i for i, reg in enumerate(analisis["paginas"])
+        if i >= saltear and (reg["cobertura"] > 0.35 or not _pagina_tiene_cuerpo(reg, min_chars=min_chars))
+    ]
 
-    # Solo forzar si se pide. En modo 'auto' se decide por contenido.
+
+def _rangos_paginas(paginas: list[int]) -> str:
+    """[0, 1, 2, 6] -> "1-3,7" (formato de --pages de ocrmypdf, 1-based)."""
+    rangos = []
+    for p in sorted(set(paginas)):
+        if rangos and p == rangos[-1][1] + 1:
+            rangos[-1][1] = p
+        else:
+            rangos.append([p, p])
+    return ",".join(f"{a + 1}" if a == b else f"{a + 1}-{b + 1}" for a, b in rangos)
+
+
+def _ocrmypdf_paginas(pdf: Path, paginas: list[int]) -> bool:
+    """
+    OCR_FINAL_FORCE: pasa por ocrmypdf solo `paginas` (0-based), con
+    --jobs = nucleos, y las injerta en `pdf` reemplazando contenido y
+    recursos de cada pagina original. El objeto pagina se conserva, asi que
+    los links del indice, el outline y las paginas con texto nativo quedan
+    intactos.
+    --skip-text no sirve aca: los escaneos ya traen la capa de WinOCR y los
+    saltearia; la seleccion de paginas cumple ese papel y sobre ellas se
+    fuerza el OCR.
+    """
+    import fitz
+
+    if not paginas:
+        logging.info("[OCR:FINAL] Ninguna pagina escaneada; no hace falta ocrmypdf")
+        return False
+    jobs = max(1, os.cpu_count() or 1)
+    with TemporaryDirectory(prefix="ocrfinal_") as td:
+        sub, sub_ocr = Path(td) / "paginas.pdf", Path(td) / "paginas_ocr.pdf"
+        doc = fitz.open(str(pdf))
+        try:
+            parcial = fitz.open()
+            for i in paginas:
+                parcial.insert_pdf(doc, from_page=i, to_page=i)
+            parcial.save(str(sub))
+            parcial.close()
+            logging.info(f"[OCR:FINAL] ocrmypdf sobre {len(paginas)} de {doc.page_count} paginas ({_rangos_paginas(paginas)}) · jobs={jobs}")
+            subprocess.run(
+                [
+                    "ocrmypdf",
+                    "--force-ocr",
+                    "--language", "spa",
+                    "--image-dpi", "300",
+                    "--deskew",
+                    "--rotate-pages",
+                    "--optimize", "3",
+                    "--jobs", str(jobs),
+                    str(sub),
+                    str(sub_ocr),
+                ],
+                check=True,
+                **_subprocess_hidden_kwargs(),
+            )
+            ocr = fitz.open(str(sub_ocr))
+            if ocr.page_count != len(paginas):
+                ocr.close()
+                raise RuntimeError(f"ocrmypdf devolvio {ocr.page_count} paginas (esperaba {len(paginas)})")
+            base = doc.page_count
+            doc.insert_pdf(ocr)
+            ocr.close()
+            for k, i in enumerate(paginas):
+                nuevo, orig = doc[base + k].xref, doc[i].xref
+                for clave in ("Contents", "Resources", "MediaBox", "CropBox", "Rotate"):
+                    tipo, valor = doc.xref_get_key(nuevo, clave)
+                    doc.xref_set_key(orig, clave, valor if tipo != "null" else "null")
+            # las copias del final no tienen links entrantes; su contenido ya lo usan las originales
+            doc.delete_pages(base, doc.page_count - 1)
+            tmp = pdf.with_suffix(".ocrfinal.pdf")
+            doc.save(str(tmp), garbage=3, deflate=True)
+        finally:
+            doc.close()
+    shutil.move(tmp, pdf)
+    return True
+
+
+def _maybe_ocr(pdf_in: Path, force: bool = False, paginas: set[int] | None = None) -> Path:
+    """
+    OCR con Windows WinRT.
+    - OCR_MODE=off   -> nunca
+    - OCR_MODE=force -> siempre
+    - OCR_MODE=auto  -> solo si detecta poco texto (_has_enough_text)
+    - WINOCR_LANGS="es-AR+es-ES+en-US"
+    - OCR_DPI=300 (por default)
+    """
+    mode = (os.getenv("OCR_MODE", "auto") or "").lower() or "auto"
+    if mode == "off":
+        return pdf_in
+
+    # Solo forzar si se pide. En modo 'auto' se decide por contenido.
     need_ocr = bool(force)
-    if mode == "auto":
+    if mode == "auto" and not need_ocr:
         # Page-level scan ignoring headers; trigger OCR if any page lacks body text
         try:
-            import fitz  # PyMuPDF
-            doc = fitz.open(str(pdf_in))
-            need_ocr = False
-            limit = min(doc.page_count, max(1, int(os.getenv("OCR_SCAN_MAX_PAGES", "200"))))
+            analisis = _analizar_pdf(pdf_in)
+            if analisis is None:
+                raise RuntimeError("sin analisis")
+            limit = max(1, int(os.getenv("OCR_SCAN_MAX_PAGES", "200")))
             # MÃƒÂ¡s estricto: requiere mÃƒÂ¡s texto en el cuerpo para saltar OCR
             min_chars = int(os.getenv("PAGE_BODY_MIN_CHARS", "80"))
-            for i in range(limit):
-                try:
-                    if not _page_has_text(doc[i], min_chars=min_chars):
-                        need_ocr = True
-                        break
-                except Exception:
-                    # Be conservative if analysis fails
-                    need_ocr = True
-                    break
-            doc.close()
+            need_ocr = any(not _pagina_tiene_cuerpo(p, min_chars=min_chars) for p in analisis["paginas"][:limit])
         except Exception:
             # Fallback coarse check (sample more pages)
             try:
@@ -2642,7 +3573,7 @@ def _maybe_ocr(pdf_in: Path, force: bool = False) -> Path:
 
     out = pdf_in.with_suffix(".ocr.pdf")
     langs = (os.getenv("WINOCR_LANGS", "es-AR+es-ES+en-US").split("+"))
-    ok = _apply_winocr_to_pdf(pdf_in, out, langs, dpi=int(os.getenv("OCR_DPI", "450")))
+    ok = _apply_winocr_to_pdf(pdf_in, out, langs, dpi=int(os.getenv("OCR_DPI", "450")), paginas=paginas)
     if ok:
         logging.info(f"[WINOCR] OK -> {out.name}")
         return out
@@ -2877,7 +3808,7 @@ def _handle_loginconfirm(page):
 
 def _goto_portal_grid(page):
     # Aseguramos la grilla del portal
-    page.goto("https://teletrabajo.justiciacordoba.gob.ar/static/sslvpn/portal/", wait_until="domcontentloaded")
+    _navegar(page, "https://teletrabajo.justiciacordoba.gob.ar/static/sslvpn/portal/", wait_until="domcontentloaded")
     page.wait_for_load_state("networkidle")
 
 
@@ -2899,6 +3830,345 @@ def _debug_dump(page, name="debug"):
         logging.error(f"[DEBUG] dump fail: {e}")
 
 
+# --------- Cortesia por host (token bucket compartido) ---------
+class _PlanificadorHosts:
+    """
+    Token bucket por host que comparten todas las descargas HTTP
+    (_descargar_archivo) y las navegaciones del navegador (_navegar).
+    Arranca en HOST_RPS pedidos/s con rafagas de HOST_BURST; ante un
+    "SSL VPN Proxy Error", un 5xx o un error de conexion reduce la tasa a
+    la mitad y pausa el host con back-off exponencial, y la recupera de a
+    poco con cada respuesta buena (AIMD), hasta HOST_RPS_MAX.
+    Lleva por host latencia, esperas y rechazos para el resumen de la corrida.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts: dict[str, dict] = {}
+        self._sin_limite = False
+
+    @staticmethod
+    def _host(url: str) -> str:
+        try:
+            return (urlparse(url).hostname or "").lower()
+        except Exception:
+            return ""
+
+    def _estado(self, host: str) -> dict:
+        st = self._hosts.get(host)
+        if st is None:
+            # Sin limite (reproduccion HAR) salvo que HOST_RPS se fije a mano.
+            rps = float(os.getenv("HOST_RPS", "0" if self._sin_limite else "4") or 0)
+            burst = max(1.0, float(os.getenv("HOST_BURST", "4") or 1))
+            st = self._hosts[host] = {
+                "rps": rps, "rps_max": max(rps, float(os.getenv("HOST_RPS_MAX", "8") or 8)),
+                "burst": burst, "tokens": burst, "t": time.monotonic(),
+                "pausa_hasta": 0.0, "fallos_seguidos": 0,
+                "n": 0, "rechazos": 0, "lat": 0.0, "lat_max": 0.0, "espera": 0.0,
+            }
+        return st
+
+    def adquirir(self, url: str) -> float:
+        """Bloquea hasta que el host tenga un turno libre; devuelve los segundos esperados."""
+        host = self._host(url)
+        if not host:
+            return 0.0
+        esperado = 0.0
+        while True:
+            with self._lock:
+                st = self._estado(host)
+                if st["rps"] <= 0:
+                    return 0.0
+                ahora = time.monotonic()
+                st["tokens"] = min(st["burst"], st["tokens"] + (ahora - st["t"]) * st["rps"])
+                st["t"] = ahora
+                falta = max(st["pausa_hasta"] - ahora, (1.0 - st["tokens"]) / st["rps"])
+                if falta <= 0:
+                    st["tokens"] -= 1.0
+                    st["espera"] += esperado
+                    return esperado
+            dormir = min(falta, 0.5)
+            time.sleep(dormir)
+            esperado += dormir
+
+    def registrar(self, url: str, segundos: float, ok: bool, motivo: str = ""):
+        host = self._host(url)
+        if not host:
+            return
+        with self._lock:
+            st = self._estado(host)
+            if st["rps"] <= 0:
+                return
+            st["n"] += 1
+            st["lat"] += segundos
+            st["lat_max"] = max(st["lat_max"], segundos)
+            if ok:
+                st["fallos_seguidos"] = 0
+                st["rps"] = min(st["rps_max"], st["rps"] + 0.05)
+                return
+            st["rechazos"] += 1
+            st["fallos_seguidos"] += 1
+            _METRICAS.inc("rechazos_host_total", host=host, motivo=motivo or "rechazo")
+            st["rps"] = max(float(os.getenv("HOST_RPS_MIN", "0.5") or 0.5), st["rps"] / 2.0)
+            pausa = min(30.0, 2.0 ** (st["fallos_seguidos"] - 1))
+            st["pausa_hasta"] = time.monotonic() + pausa
+            st["tokens"] = 0.0
+            rps = st["rps"]
+        logging.info(f"[RATE] {host}: {motivo or 'rechazo'} -> {rps:.2f} req/s, pausa {pausa:.0f}s")
+
+    @contextlib.contextmanager
+    def turno(self, url: str):
+        """
+        with _PLANIFICADOR.turno(url) as t: ...; t["ok"] = False; t["motivo"] = "5xx"
+        Una excepcion dentro del bloque cuenta como rechazo (error de conexion).
+        """
+        self.adquirir(url)
+        t = {"ok": True, "motivo": ""}
+        t0 = time.perf_counter()
+        try:
+            yield t
+        except Exception as e:
+            t["ok"], t["motivo"] = False, t["motivo"] or type(e).__name__
+            raise
+        finally:
+            self.registrar(url, time.perf_counter() - t0, t["ok"], t["motivo"])
+
+    def nueva_corrida(self, sin_limite: bool = False):
+        """
+        Olvida las estadisticas; la tasa aprendida por host se conserva entre
+        corridas del mismo tipo. `sin_limite` (reproduccion HAR) arranca los
+        hosts sin limite; al cambiar de tipo se descarta el estado por host.
+        """
+        with self._lock:
+            if sin_limite != self._sin_limite:
+                self._sin_limite = sin_limite
+                self._hosts.clear()
+                return
+            for st in self._hosts.values():
+                st.update(n=0, rechazos=0, lat=0.0, lat_max=0.0, espera=0.0)
+
+    def reportar(self):
+        with self._lock:
+            filas = [(h, dict(st)) for h, st in self._hosts.items() if st["n"]]
+        for host, st in sorted(filas, key=lambda kv: -kv[1]["n"]):
+            logging.info(
+                f"[RATE] {host}: {st['n']} pedidos · rechazos={st['rechazos']} · "
+                f"lat media={st['lat'] / st['n']:.2f}s max={st['lat_max']:.2f}s · "
+                f"espera total={st['espera']:.1f}s · tasa final={st['rps']:.2f} req/s"
+            )
+
+
+_PLANIFICADOR = _PlanificadorHosts()
+
+
+class _ArchivoHar:
+    """
+    Grabacion y reproduccion del trafico de una corrida, para medir el
+    pipeline sin depender del SAC. HAR_MODE=grabar guarda un HAR (cuerpos
+    adjuntos) por contexto de Playwright y las respuestas que baja
+    `_descargar_archivo` con requests; al cerrar reemplaza las credenciales
+    por marcadores. HAR_MODE=reproducir sirve todo desde esa carpeta (lo no
+    grabado se aborta) y usa los mismos marcadores como credenciales, asi los
+    POST de login coinciden con lo grabado.
+    """
+
+    MODOS = ("grabar", "reproducir")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.modo = ""
+        self.carpeta: Path | None = None
+        self._n = 0
+        self._http: dict[str, list] = {}
+        self._pos: dict[str, int] = {}
+        self._secretos: dict[str, str] = {}  # valor real -> marcador
+        self.servidas = 0
+        self.faltantes = 0
+
+    def nueva_corrida(self, nro_exp, carpeta_salida, credenciales: dict) -> dict:
+        """Prepara la carpeta del expediente; en reproduccion devuelve las credenciales a usar."""
+        import json
+
+        modo = (os.getenv("HAR_MODE") or "").strip().lower()
+        with self._lock:
+            self.modo = modo if modo in self.MODOS else ""
+            self._n = 0
+            self._http, self._pos, self._secretos = {}, {}, {}
+            self.servidas = self.faltantes = 0
+            if not self.modo:
+                self.carpeta = None
+                return credenciales
+            base = Path(os.getenv("HAR_DIR") or (Path(carpeta_salida) / "_har"))
+            self.carpeta = base / f"Exp_{nro_exp}"
+        meta = self.carpeta / "credenciales.json"
+        if self.modo == "grabar":
+            (self.carpeta / "http").mkdir(parents=True, exist_ok=True)
+            for viejo in self.carpeta.glob("contexto_*.har.zip"):
+                viejo.unlink(missing_ok=True)
+            marcadores = {}
+            for campo, valor in credenciales.items():
+                if valor and valor not in self._secretos:
+                    self._secretos[valor] = f"har_{campo}"
+                marcadores[campo] = self._secretos.get(valor, "") if valor else ""
+            meta.write_text(json.dumps(marcadores, indent=1), encoding="utf-8")
+            logging.info(f"[HAR] Grabando trafico en {self.carpeta}")
+            return credenciales
+        try:
+            marcadores = json.loads(meta.read_text(encoding="utf-8"))
+            self._http = json.loads((self.carpeta / "http" / "indice.json").read_text(encoding="utf-8"))
+        except Exception as e:
+            raise RuntimeError(f"No hay una grabacion HAR utilizable en {self.carpeta}: {e}")
+        logging.info(f"[HAR] Reproduciendo desde {self.carpeta} ({len(self._archivos())} HAR, {len(self._http)} URL de descarga)")
+        return {k: marcadores.get(k, "") for k in credenciales}
+
+    def _archivos(self) -> list[Path]:
+        return sorted(self.carpeta.glob("contexto_*.har.zip")) if self.carpeta else []
+
+    def opciones_contexto(self) -> dict:
+        """kwargs extra para `browser.new_context` (solo al grabar)."""
+        if self.modo != "grabar":
+            return {}
+        with self._lock:
+            self._n += 1
+            n = self._n
+        return {"record_har_path": str(self.carpeta / f"contexto_{n:02d}.har.zip"), "record_har_content": "attach"}
+
+    def instalar(self, ctx):
+        if self.modo != "reproducir":
+            return
+        try:
+            # Las rutas se evaluan de la ultima a la primera: lo que ningun HAR tiene cae en el abort.
+            ctx.route("**/*", lambda route: route.abort("internetdisconnected"))
+            for har in self._archivos():
+                ctx.route_from_har(str(har), not_found="fallback")
+        except Exception as e:
+            logging.info(f"[HAR] No pude instalar la reproduccion en el contexto: {e}")
+
+    async def instalar_async(self, ctx):
+        if self.modo != "reproducir":
+            return
+
+        async def _abortar(route):
+            await route.abort("internetdisconnected")
+
+        try:
+            await ctx.route("**/*", _abortar)
+            for har in self._archivos():
+                await ctx.route_from_har(str(har), not_found="fallback")
+        except Exception as e:
+            logging.info(f"[HAR] No pude instalar la reproduccion en el contexto: {e}")
+
+    def guardar_http(self, url: str, r):
+        """Guarda el cuerpo de una respuesta de requests (modo grabar)."""
+        if self.modo != "grabar":
+            return
+        import hashlib
+
+        body = r.content or b""
+        nombre = hashlib.sha1(body).hexdigest() + ".bin"
+        dst = self.carpeta / "http" / nombre
+        if not dst.exists():
+            tmp = dst.with_suffix(f".{threading.get_ident()}.tmp")
+            tmp.write_bytes(body)
+            os.replace(tmp, dst)
+        headers = {
+            k: v for k, v in r.headers.items()
+            if k.lower() in ("content-type", "content-disposition", "content-length", "etag", "last-modified")
+        }
+        with self._lock:
+            self._http.setdefault(url, []).append(
+                {"status": r.status_code, "reason": r.reason, "url": r.url, "headers": headers, "archivo": nombre}
+            )
+
+    def respuesta_http(self, url: str):
+        """Arma la respuesta grabada para `url`; las repeticiones se sirven en el orden en que se grabaron."""
+        import requests
+
+        with self._lock:
+            lista = self._http.get(url) or []
+            pos = self._pos.get(url, 0)
+            self._pos[url] = pos + 1
+            if lista:
+                self.servidas += 1
+            else:
+                self.faltantes += 1
+        if not lista:
+            raise requests.ConnectionError(f"[HAR] {url} no esta en la grabacion")
+        ent = lista[min(pos, len(lista) - 1)]
+        r = requests.Response()
+        r.status_code = int(ent.get("status") or 200)
+        r.reason = ent.get("reason") or ""
+        r.url = ent.get("url") or url
+        r.headers.update(ent.get("headers") or {})
+        r._content = (self.carpeta / "http" / ent["archivo"]).read_bytes()
+        return r
+
+    def _limpiar(self, data: bytes) -> bytes:
+        import json
+        from urllib.parse import quote_plus
+
+        for valor, marcador in sorted(self._secretos.items(), key=lambda kv: -len(kv[0])):
+            formas = {valor, quote(valor, safe=""), quote_plus(valor), quote_plus(valor, safe="*"), json.dumps(valor)[1:-1]}
+            for forma in sorted(formas, key=len, reverse=True):
+                data = data.replace(forma.encode("utf-8"), marcador.encode("utf-8"))
+        return data
+
+    def cerrar(self):
+        """Al grabar: escribe el indice de descargas y limpia credenciales de los HAR (ya cerrados los contextos)."""
+        import json
+        import zipfile
+
+        if self.modo == "reproducir":
+            logging.info(f"[HAR] Descargas servidas desde la grabacion={self.servidas} faltantes={self.faltantes}")
+            return
+        if self.modo != "grabar":
+            return
+        with self._lock:
+            indice = json.dumps(self._http, ensure_ascii=False, indent=1).encode("utf-8")
+        (self.carpeta / "http" / "indice.json").write_bytes(self._limpiar(indice))
+        for har in self._archivos():
+            tmp = har.with_suffix(".tmp")
+            try:
+                with zipfile.ZipFile(har) as zin, zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as zout:
+                    for info in zin.infolist():
+                        zout.writestr(info.filename, self._limpiar(zin.read(info)))
+                os.replace(tmp, har)
+            except Exception as e:
+                logging.info(f"[HAR] No pude limpiar {har.name}: {e}")
+                tmp.unlink(missing_ok=True)
+        logging.info(f"[HAR] Grabacion lista: {len(self._archivos())} HAR, {len(self._http)} URL de descarga en {self.carpeta}")
+
+
+_HAR = _ArchivoHar()
+
+
+def _navegar(page, url: str, **kwargs):
+    """page.goto pasando por el planificador del host (rechazo: 5xx o pagina de error del proxy)."""
+    if not str(url).lower().startswith(("http://", "https://")):
+        return page.goto(url, **kwargs)
+    descarga = None
+    with _PLANIFICADOR.turno(url) as t:
+        try:
+            resp = page.goto(url, **kwargs)
+        except Exception as e:
+            # Una navegacion que dispara una descarga es una respuesta buena del
+            # host: no cuenta como rechazo (si no, cada informe RNR frena al proxy).
+            if "Download is starting" not in str(e):
+                raise
+            descarga = e
+            resp = None
+        try:
+            if resp is not None and resp.status >= 500:
+                t["ok"], t["motivo"] = False, f"HTTP {resp.status}"
+            elif descarga is None and "SSL VPN Proxy Error" in (page.title() or ""):
+                t["ok"], t["motivo"] = False, "proxy error"
+        except Exception:
+            pass
+    if descarga is not None:
+        raise descarga
+    return resp
+
+
 def _is_proxy_error(page) -> bool:
     try:
         t = page.title()
@@ -3016,7 +4286,7 @@ def _fill_radiografia_y_buscar(page, nro_exp):
                 logging.info("[RADIO] La pagina se cerro antes de reintentar URLs de Radiografia.")
                 raise RuntimeError("RADIO_PAGE_CLOSED")
             try:
-                page.goto(u, wait_until="domcontentloaded")
+                _navegar(page, u, wait_until="domcontentloaded")
             except Exception as e:
                 if _is_page_closed_exc(e):
                     logging.info("[RADIO] La pagina se cerro durante goto a Radiografia.")
@@ -3181,7 +4451,7 @@ def _abrir_libro_intranet(sac, intra_user, intra_pass, nro_exp):
 
     if STRICT and not hay_ops:
         logging.info("[SEC] Radiografia: no pude detectar operaciones -> sin acceso. Abortando.")
-        messagebox.showwarning("Sin acceso", "No tenes acceso a este expediente (no aparecen operaciones).")
+        _avisar_usuario("warning", "Sin acceso", "No tenes acceso a este expediente (no aparecen operaciones).")
         return
 
     # Si tengo ids, verifico UNA (o todas, segÃƒÂºn CHECK_ALL); si no, ya validÃƒÂ© con el fallback
@@ -3191,7 +4461,7 @@ def _abrir_libro_intranet(sac, intra_user, intra_pass, nro_exp):
         # 1) Si ALGUNA operaciÃƒÂ³n probada muestra el cartel ? abortamos TODO
         if any(_op_denegada_en_radiografia(sac, _id) for _id in ids_a_probar):
             logging.info("[SEC] RadiografÃƒÂ­a mostrÃƒÂ³ 'sin permisos' en al menos una operaciÃƒÂ³n. Abortando.")
-            messagebox.showwarning(
+            _avisar_usuario("warning", 
                 "Sin acceso",
                 "No tenÃƒÂ©s permisos para visualizar el contenido de este expediente "
                 "(al menos una operaciÃƒÂ³n estÃƒÂ¡ bloqueada). No se descargarÃƒÂ¡ nada.",
@@ -3205,7 +4475,7 @@ def _abrir_libro_intranet(sac, intra_user, intra_pass, nro_exp):
 
     if STRICT and not perm_ok:
         logging.info("[SEC] RadiografÃƒÂ­a: aparece grilla pero el contenido estÃƒÂ¡ bloqueado.")
-        messagebox.showwarning(
+        _avisar_usuario("warning", 
             "Sin acceso", "No tenÃƒÂ©s permisos para visualizar el contenido de las operaciones. No se descargÃƒÂ³ nada."
         )
         return
@@ -3321,7 +4591,7 @@ def _abrir_libro_intranet(sac, intra_user, intra_pass, nro_exp):
         return libro
     except Exception:
         # Fallback: navegar en la pestaÃƒÂ±a actual (menos robusto)
-        sac.goto(url, wait_until="domcontentloaded")
+        _navegar(sac, url, wait_until="domcontentloaded")
         try:
             libro = sac.wait_for_event("popup", timeout=1500)
             libro.wait_for_load_state("domcontentloaded")
@@ -3379,7 +4649,8 @@ def _descargar_adjuntos_de_operacion(libro, op_id: str, carpeta: Path) -> list[P
 
             # NormalizaciÃƒÂ³n a PDF
             if not _is_real_pdf(destino):
-                pdf = _ensure_pdf_fast(destino) if '_ensure_pdf_fast' in globals() else _ensure_pdf(destino)
+                with _PERFILES.medir("conversion"):
+                    pdf = _ensure_pdf_fast(destino) if '_ensure_pdf_fast' in globals() else _ensure_pdf(destino)
             else:
                 pdf = destino
 
@@ -3409,6 +4680,195 @@ def _descargar_adjuntos_de_operacion(libro, op_id: str, carpeta: Path) -> list[P
     return pdfs
 
 
+# --------- Captura de respuestas AJAX de Radiografia ---------
+# Las grillas de Radiografia llegan por postback/UpdatePanel (o page-methods).
+# Guardamos las respuestas y, al listar, parseamos la tabla en Python: una
+# sola lectura del body en lugar de N locator round-trips por fila. Si la
+# captura no tiene la grilla (o no coincide con el DOM) se scrapea como antes.
+_CAPTURA_GRILLAS = {
+    "operaciones": "gvOperaciones",
+    "adjuntos": "gvAdjuntos",
+    "informes_mpf": "gvInformesTecnicos",
+}
+
+
+class _FilasGrillaParser(HTMLParser):
+    """Filas de una tabla (incluye anidadas, igual que `table tr`) con textos de celda y links."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.filas: list[dict] = []
+        self._fila_stack: list[dict] = []
+        self._celda: list[str] | None = None
+        self._celda_depth = 0
+        self._link: dict | None = None
+
+    def handle_starttag(self, tag, attrs):
+        a = {k.lower(): (v or "") for k, v in attrs}
+        if self._celda is not None and tag in {"br", "p", "div", "li", "td", "tr", "table"}:
+            self._celda.append(" ")
+        if tag == "tr":
+            fila = {"celdas": [], "links": []}
+            self.filas.append(fila)
+            self._fila_stack.append(fila)
+        elif tag == "td" and self._fila_stack:
+            if self._celda is None:
+                self._celda = []
+                self._celda_depth = 0
+            self._celda_depth += 1
+        elif tag == "a" and self._fila_stack:
+            self._link = {
+                "href": a.get("href", ""),
+                "onclick": a.get("onclick", ""),
+                "title": a.get("title", ""),
+                "text": "",
+                "imgs": [],
+            }
+            for fila in self._fila_stack:
+                fila["links"].append(self._link)
+        elif tag == "img" and self._link is not None:
+            self._link["imgs"].append(a.get("src", ""))
+
+    def handle_endtag(self, tag):
+        if tag == "a":
+            self._link = None
+        elif tag == "td" and self._celda is not None:
+            self._celda_depth -= 1
+            if self._celda_depth <= 0:
+                txt = _norm_ws("".join(self._celda))
+                if txt and self._fila_stack:
+                    self._fila_stack[-1]["celdas"].append(txt)
+                self._celda = None
+        elif tag == "tr" and self._fila_stack:
+            self._fila_stack.pop()
+
+    def handle_data(self, data):
+        if self._celda is not None:
+            self._celda.append(data)
+        if self._link is not None:
+            self._link["text"] += data
+
+
+def _extraer_tabla_html(texto: str, id_parcial: str) -> str | None:
+    """Recorta `<table id="...id_parcial...">...</table>` (con tablas anidadas) de un payload."""
+    m = re.search(r"<table\b[^>]*\bid\s*=\s*[\"'][^\"']*" + re.escape(id_parcial) + r"[^\"']*[\"'][^>]*>", texto, re.I)
+    if not m:
+        return None
+    depth = 0
+    for t in re.finditer(r"<(/?)table\b[^>]*>", texto[m.start():], re.I):
+        depth += -1 if t.group(1) else 1
+        if depth == 0:
+            return texto[m.start(): m.start() + t.end()]
+    return None
+
+
+class _CapturaRespuestas:
+    """Retiene las ultimas respuestas HTML/JSON de Radiografia.aspx de una pagina."""
+
+    def __init__(self, max_respuestas: int = 12):
+        self._respuestas: list = []
+        self._max = max_respuestas
+        self._cache: dict[str, list[dict]] = {}
+
+    def on_response(self, resp):
+        try:
+            url = resp.url or ""
+            if "radiografia" not in url.lower():
+                return
+            ctype = (resp.headers or {}).get("content-type", "").lower()
+            if ctype and not any(t in ctype for t in ("html", "text/plain", "json")):
+                return
+        except Exception:
+            return
+        self._respuestas.append(resp)
+        del self._respuestas[:-self._max]
+        self._cache.clear()
+
+    def filas(self, grilla: str) -> list[dict] | None:
+        """Filas parseadas de la grilla desde la respuesta mas reciente que la contenga."""
+        import json
+
+        if grilla in self._cache:
+            return self._cache[grilla]
+        id_parcial = _CAPTURA_GRILLAS.get(grilla, grilla)
+        for resp in reversed(list(self._respuestas)):
+            try:
+                texto = resp.text() or ""
+            except Exception:
+                continue
+            if texto[:1] == "{":
+                try:
+                    # "d" ya trae el HTML tal cual: des-escaparlo romperia los
+                    # &lt;/&amp; legitimos del contenido de las celdas.
+                    texto = str(json.loads(texto).get("d") or "")
+                except Exception:
+                    pass
+            tabla = _extraer_tabla_html(texto, id_parcial)
+            if not tabla:
+                continue
+            parser = _FilasGrillaParser()
+            try:
+                parser.feed(tabla)
+                parser.close()
+            except Exception:
+                continue
+            self._cache[grilla] = parser.filas
+            return parser.filas
+        return None
+
+
+def _instalar_captura_respuestas(page) -> "_CapturaRespuestas | None":
+    cap = getattr(page, "_expe_captura", None)
+    if cap is not None:
+        return cap
+    try:
+        cap = _CapturaRespuestas()
+        page.on("response", cap.on_response)
+        setattr(page, "_expe_captura", cap)
+        return cap
+    except Exception:
+        return None
+
+
+def _filas_capturadas(page, grilla: str, filas_dom=None) -> list[dict] | None:
+    """
+    Filas capturadas de la red para `grilla`, o None si no hay captura util.
+    Con `filas_dom` verifica que la cantidad coincida, porque los downloaders
+    usan `_row` como indice sobre el locator del DOM.
+    """
+    cap = getattr(page, "_expe_captura", None)
+    if cap is None or not _env_true("RADIO_NET_CAPTURE", "1"):
+        return None
+    try:
+        filas = cap.filas(grilla)
+    except Exception:
+        filas = None
+    if not filas:
+        return None
+    if filas_dom is not None:
+        try:
+            n_dom = filas_dom.count()
+        except Exception:
+            return None
+        if n_dom != len(filas):
+            logging.info(f"[NET] {grilla}: captura desalineada (red={len(filas)} dom={n_dom}); uso DOM")
+            return None
+    logging.info(f"[NET] {grilla}: {len(filas)} filas desde respuesta capturada")
+    return filas
+
+
+def _link_captura(fila: dict, patron: str, imgs: bool = False) -> dict | None:
+    for link in fila.get("links") or []:
+        raw = f"{link.get('href') or ''} {link.get('onclick') or ''}"
+        if re.search(patron, raw, re.I):
+            return link
+    if imgs:
+        for link in fila.get("links") or []:
+            if any(re.search(r"pdf|adobe", src or "", re.I) for src in link.get("imgs") or []):
+                return link
+    return None
+
+
 def _texto_celdas_fila(fila) -> list[str]:
     textos: list[str] = []
     try:
@@ -3501,6 +4961,46 @@ def _adjunto_file_link_locator(fila):
     ).first
 
 
+def _item_adjunto_radiografia(
+    i: int,
+    raw_op: str,
+    raw_file: str,
+    textos: list[str],
+    link_txt: str,
+    op_fecha_map: dict[str, str] | None,
+    op_title_map: dict[str, str] | None,
+) -> dict:
+    op_id = None
+    m = re.search(r"VerDecretoHtml\('([^']+)'\)", raw_op or "")
+    if m:
+        op_id = m.group(1)
+
+    file_key = None
+    m = re.search(r"VerAdjuntoFichero\(\s*['\"]([^'\"]+)['\"]\s*\)", raw_file or "", re.I)
+    if not m:
+        m = re.search(r"[?&](?:id|Id|file|archivo)=([^&'\" )]+)", raw_file or "")
+    if m:
+        file_key = m.group(1)
+
+    fecha = (op_fecha_map or {}).get(op_id or "", "")
+    titulo_op = (op_title_map or {}).get(op_id or "", "")
+    resto = [t for t in textos if t and t not in {fecha, titulo_op}]
+    titulo = _titulo_item_radiografia(link_txt, *(resto[:2]), fallback="Adjunto")
+    detalle = _titulo_item_radiografia(titulo_op, fallback=(op_id or "Sin operacion"))
+    return {
+        "uid": f"adj:{file_key or (op_id or 'sin-op')}:{i}",
+        "kind": "adjunto",
+        "kind_label": "Adjunto",
+        "fecha": fecha,
+        "titulo": titulo,
+        "detalle": detalle,
+        "op_id": op_id,
+        "_file_key": file_key or "",
+        "_file_name_hint": link_txt or "",
+        "_row": i,
+    }
+
+
 def _listar_adjuntos_grid_para_radiografia(
     sac,
     op_fecha_map: dict[str, str] | None = None,
@@ -3509,28 +5009,43 @@ def _listar_adjuntos_grid_para_radiografia(
     import re
 
     _asegurar_seccion_adjuntos_visible(sac)
-    filas = None
-    for _ in range(40):
-        filas = _adjuntos_rows_locator(sac)
-        try:
-            total_tmp = filas.count() if filas else 0
-        except Exception:
-            total_tmp = 0
-        try:
-            cand_n = sac.locator(
-                "#divAdjuntos *[onclick*='VerAdjuntoFichero'], "
-                "#divAdjuntos *[href*='VerAdjuntoFichero'], "
-                "#divAdjuntos a[href*='Fichero.aspx'], "
-                "#divAdjuntos a[href*='idFichero=']"
-            ).count()
-        except Exception:
-            cand_n = 0
-        if total_tmp > 1 and cand_n > 0:
-            break
-        try:
-            sac.wait_for_timeout(150)
-        except Exception:
-            pass
+    _esperar_dom(
+        sac,
+        [
+            [
+                {"css": "#cphDetalle_gvAdjuntos tr", "min": 2},
+                {"css": "table[id*='gvAdjuntos'] tr", "min": 2},
+                {"css": "#divAdjuntos table tr", "min": 2},
+            ],
+            [{
+                "css": "#divAdjuntos *[onclick*='VerAdjuntoFichero'], "
+                       "#divAdjuntos *[href*='VerAdjuntoFichero'], "
+                       "#divAdjuntos a[href*='Fichero.aspx'], "
+                       "#divAdjuntos a[href*='idFichero=']"
+            }],
+        ],
+        timeout_ms=6000,
+    )
+    filas = _adjuntos_rows_locator(sac)
+
+    filas_net = _filas_capturadas(sac, "adjuntos", filas)
+    if filas_net:
+        items = []
+        for i in range(1, len(filas_net)):
+            fila = filas_net[i]
+            file_link = _link_captura(fila, r"VerAdjuntoFichero|Fichero\.aspx|idFichero=", imgs=True)
+            if not file_link:
+                continue
+            raw_op = ""
+            op_link = _link_captura(fila, r"VerDecretoHtml")
+            if op_link:
+                raw_op = f"{op_link.get('href') or ''} {op_link.get('onclick') or ''}"
+            raw_file = f"{file_link.get('href') or ''} {file_link.get('onclick') or ''}"
+            link_txt = _norm_ws(file_link.get("text") or "") or _norm_ws(file_link.get("title") or "")
+            items.append(
+                _item_adjunto_radiografia(i, raw_op, raw_file, fila.get("celdas") or [], link_txt, op_fecha_map, op_title_map)
+            )
+        return items
 
     total = filas.count() if filas else 0
     try:
@@ -3545,31 +5060,21 @@ def _listar_adjuntos_grid_para_radiografia(
         if not file_link.count():
             continue
 
-        op_id = None
+        raw_op = ""
         op_link = fila.locator("a[href*='VerDecretoHtml'], a[onclick*='VerDecretoHtml']").first
         if op_link.count():
             try:
-                raw = f"{op_link.get_attribute('href') or ''} {op_link.get_attribute('onclick') or ''}"
-                m = re.search(r"VerDecretoHtml\('([^']+)'\)", raw)
-                if m:
-                    op_id = m.group(1)
+                raw_op = f"{op_link.get_attribute('href') or ''} {op_link.get_attribute('onclick') or ''}"
             except Exception:
                 pass
 
-        file_key = None
+        raw_file = ""
         try:
-            raw = f"{file_link.get_attribute('href') or ''} {file_link.get_attribute('onclick') or ''}"
-            m = re.search(r"VerAdjuntoFichero\(\s*['\"]([^'\"]+)['\"]\s*\)", raw, re.I)
-            if not m:
-                m = re.search(r"[?&](?:id|Id|file|archivo)=([^&'\" )]+)", raw)
-            if m:
-                file_key = m.group(1)
+            raw_file = f"{file_link.get_attribute('href') or ''} {file_link.get_attribute('onclick') or ''}"
         except Exception:
             pass
 
         textos = _texto_celdas_fila(fila)
-        fecha = (op_fecha_map or {}).get(op_id or "", "")
-        titulo_op = (op_title_map or {}).get(op_id or "", "")
         link_txt = ""
         try:
             link_txt = _norm_ws(file_link.inner_text() or "")
@@ -3581,24 +5086,7 @@ def _listar_adjuntos_grid_para_radiografia(
             except Exception:
                 link_txt = ""
 
-        resto = [t for t in textos if t and t not in {fecha, titulo_op}]
-        titulo = _titulo_item_radiografia(link_txt, *(resto[:2]), fallback="Adjunto")
-        detalle = _titulo_item_radiografia(titulo_op, fallback=(op_id or "Sin operacion"))
-        uid = f"adj:{file_key or (op_id or 'sin-op')}:{i}"
-        items.append(
-            {
-                "uid": uid,
-                "kind": "adjunto",
-                "kind_label": "Adjunto",
-                "fecha": fecha,
-                "titulo": titulo,
-                "detalle": detalle,
-                "op_id": op_id,
-                "_file_key": file_key or "",
-                "_file_name_hint": link_txt or "",
-                "_row": i,
-            }
-        )
+        items.append(_item_adjunto_radiografia(i, raw_op, raw_file, textos, link_txt, op_fecha_map, op_title_map))
 
     return items
 
@@ -3612,8 +5100,11 @@ def _descargar_adjuntos_grid_mapeado(
     op_title_map: dict[str, str] | None = None,
 ):
     """
-    Devuelve por defecto {op_id: [PDFs...]} leyendo la grilla de Adjuntos de Radiografia.
+    Devuelve por defecto {op_id: [archivos...]} leyendo la grilla de Adjuntos de Radiografia.
     Si return_items=True, devuelve {uid: {"path", "fecha", "titulo", "detalle", "op_id"}}.
+    Los archivos quedan tal como bajaron (PDF, imagen u oficina): conversion,
+    validacion y permisos los hace push_pdf en el pool de ingesta, una sola vez,
+    y la procedencia sale de la extension original.
     """
     def _filename_hint_for_item(item: dict[str, object]) -> str:
         raw = _norm_ws(
@@ -3717,6 +5208,25 @@ def _descargar_adjuntos_grid_mapeado(
     vistos: set[tuple[str, int]] = set()
     selected_uids = set(selected_uids or [])
 
+    def _registrar(uid: str, item: dict, pdf: Path):
+        try:
+            key = (pdf.name, pdf.stat().st_size)
+        except Exception:
+            key = (pdf.name, 0)
+        if key in vistos:
+            return
+        vistos.add(key)
+
+        op_id = item.get("op_id") or "__SIN_OP__"
+        mapeo.setdefault(op_id, []).append(pdf)
+        out_items[uid] = {
+            "path": pdf,
+            "fecha": item.get("fecha") or "",
+            "titulo": item.get("titulo") or pdf.name,
+            "detalle": item.get("detalle") or "",
+            "op_id": item.get("op_id"),
+        }
+
     items = _listar_adjuntos_grid_para_radiografia(
         sac,
         op_fecha_map=op_fecha_map,
@@ -3806,50 +5316,9 @@ def _descargar_adjuntos_grid_mapeado(
                         pass
                     break
 
-        try:
-            if not pdf or not pdf.exists():
-                continue
-
-            if not _is_real_pdf(pdf):
-                pdf = _ensure_pdf_fast(pdf) if '_ensure_pdf_fast' in globals() else _ensure_pdf(pdf)
-
-            if not pdf.exists() or not _is_real_pdf(pdf):
-                try:
-                    logging.info(f"[ADJ] {uid}: archivo descartado; no es PDF valido tras conversion")
-                except Exception:
-                    pass
-                continue
-
-            if _pdf_contiene_mensaje_permiso(pdf):
-                try:
-                    pdf.unlink()
-                except Exception:
-                    pass
-                continue
-
-            try:
-                key = (pdf.name, pdf.stat().st_size)
-            except Exception:
-                key = (pdf.name, 0)
-            if key in vistos:
-                continue
-            vistos.add(key)
-
-            op_id = item.get("op_id") or "__SIN_OP__"
-            mapeo.setdefault(op_id, []).append(pdf)
-            out_items[uid] = {
-                "path": pdf,
-                "fecha": item.get("fecha") or "",
-                "titulo": item.get("titulo") or pdf.name,
-                "detalle": item.get("detalle") or "",
-                "op_id": item.get("op_id"),
-            }
-        except Exception as e:
-            try:
-                logging.info(f"[ADJ] {uid}: error finalizando adjunto -> {e}")
-            except Exception:
-                pass
+        if not pdf or not pdf.exists():
             continue
+        _registrar(uid, item, pdf)
 
     return out_items if return_items else mapeo
 
@@ -3864,6 +5333,22 @@ def _mapear_fechas_operaciones_radiografia(sac) -> tuple[dict[str, str], list[st
     orden_fechas: list[str] = []
 
     filas = sac.locator("#cphDetalle_gvOperaciones tr, table[id*='gvOperaciones'] tr")
+    # aca no usamos `_row`: la captura sirve aunque el conteo difiera del DOM
+    filas_net = _filas_capturadas(sac, "operaciones")
+    if filas_net:
+        for fila in filas_net[1:]:
+            link = _link_captura(fila, r"VerDecretoHtml")
+            m = re.search(r"VerDecretoHtml\('([^']+)'\)", f"{(link or {}).get('href') or ''} {(link or {}).get('onclick') or ''}")
+            if not m:
+                continue
+            fecha = next((m2.group(0) for m2 in (re.search(r"\b\d{2}/\d{2}/\d{4}\b", t) for t in fila.get("celdas") or []) if m2), "")
+            if fecha:
+                fechas_por_op[m.group(1)] = fecha
+                if not orden_fechas or orden_fechas[-1] != fecha:
+                    orden_fechas.append(fecha)
+        if fechas_por_op:
+            return fechas_por_op, orden_fechas
+
     total = filas.count() if filas else 0
     if total <= 1:
         return fechas_por_op, orden_fechas
@@ -3961,35 +5446,70 @@ def _titulo_informe_tecnico_desde_fila(fila, fecha: str, fallback: str) -> str:
     return _titulo_item_radiografia(*(textos[:3]), fallback=fallback)
 
 
+def _esperar_filas_informes_tecnicos(sac, timeout_ms: int = 6000) -> bool:
+    # El observer corre con querySelectorAll: en vez de a:has(img) miramos el icono directo.
+    return _esperar_dom(
+        sac,
+        [
+            [{"css": "table[id*='gvInformesTecnicos'] tr", "min": 2}],
+            [{
+                "css": "#divInformesTecnicosMPF *[onclick*='VerInforme'], "
+                       "#divInformesTecnicosMPF *[href*='VerInforme'], "
+                       "#divInformesTecnicosMPF a img[src*='pdf'], "
+                       "#divInformesTecnicosMPF a img[src*='adobe'], "
+                       "#divInformesTecnicosMPF a img[src*='Adobe']"
+            }],
+        ],
+        timeout_ms=timeout_ms,
+    )
+
+
+def _guid_informe_mpf(raw: str) -> str | None:
+    m = re.search(r"VerInformeMPF\s*\(([^)]*)\)", raw or "")
+    if not m:
+        return None
+    arg0 = m.group(1).split(",")[0].strip()
+    if (len(arg0) >= 2) and arg0[0] == arg0[-1] and arg0[0] in "'\"":
+        arg0 = arg0[1:-1]
+    return arg0 or None
+
+
+def _item_informe_mpf(i: int, guid: str | None, fecha: str, titulo: str) -> dict:
+    return {
+        "uid": f"infmpf:{guid or i}",
+        "kind": "informe_mpf",
+        "kind_label": "Informe MPF",
+        "fecha": fecha,
+        "titulo": titulo,
+        "detalle": guid or "",
+        "guid": guid,
+        "_row": i,
+    }
+
+
 def _listar_informes_tecnicos_para_radiografia(sac) -> list[dict]:
     import re
 
     _asegurar_seccion_informes_tecnicos_visible(sac)
 
-    filas = None
-    for _ in range(40):
-        filas = sac.locator("table[id*='gvInformesTecnicos'] tr, table[id*='gvInformesTecnicosMPF'] tr")
-        try:
-            total_tmp = filas.count() if filas else 0
-        except Exception:
-            total_tmp = 0
-        try:
-            cand = sac.locator(
-                "#divInformesTecnicosMPF *[onclick*='VerInforme'], "
-                "#divInformesTecnicosMPF *[href*='VerInforme'], "
-                "#divInformesTecnicosMPF a:has(img[src*='pdf']), "
-                "#divInformesTecnicosMPF a:has(img[src*='adobe']), "
-                "#divInformesTecnicosMPF a:has(img[src*='Adobe'])"
-            )
-            cand_n = cand.count()
-        except Exception:
-            cand_n = 0
-        if (total_tmp > 1) and (cand_n > 0):
-            break
-        try:
-            sac.wait_for_timeout(150)
-        except Exception:
-            pass
+    _esperar_filas_informes_tecnicos(sac)
+    filas = sac.locator("table[id*='gvInformesTecnicos'] tr, table[id*='gvInformesTecnicosMPF'] tr")
+
+    filas_net = _filas_capturadas(sac, "informes_mpf", filas)
+    if filas_net:
+        items = []
+        for i in range(1, len(filas_net)):
+            fila = filas_net[i]
+            link = _link_captura(fila, r"VerInformeMPF", imgs=True)
+            if not link:
+                continue
+            celdas = fila.get("celdas") or []
+            fecha = next((m.group(0) for m in (re.search(r"\b\d{2}/\d{2}/\d{4}\b", t) for t in celdas) if m), "")
+            textos = [t for t in celdas if t and t != fecha]
+            titulo = _titulo_item_radiografia(*(textos[:3]), fallback=f"Informe tecnico MPF {i}")
+            guid = _guid_informe_mpf(f"{link.get('href') or ''} {link.get('onclick') or ''}")
+            items.append(_item_informe_mpf(i, guid, fecha, titulo))
+        return items
 
     total = filas.count() if filas else 0
     items: list[dict] = []
@@ -4006,12 +5526,7 @@ def _listar_informes_tecnicos_para_radiografia(sac) -> list[dict]:
         try:
             href = link.get_attribute("href") or ""
             oc = link.get_attribute("onclick") or ""
-            m = re.search(r"VerInformeMPF\s*\(([^)]*)\)", f"{href} {oc}")
-            if m:
-                arg0 = m.group(1).split(",")[0].strip()
-                if (len(arg0) >= 2) and arg0[0] == arg0[-1] and arg0[0] in "'\"":
-                    arg0 = arg0[1:-1]
-                guid = arg0 or None
+            guid = _guid_informe_mpf(f"{href} {oc}")
         except Exception:
             pass
 
@@ -4032,18 +5547,7 @@ def _listar_informes_tecnicos_para_radiografia(sac) -> list[dict]:
             fecha = ""
 
         titulo = _titulo_informe_tecnico_desde_fila(fila, fecha, fallback=f"Informe tecnico MPF {i}")
-        items.append(
-            {
-                "uid": f"infmpf:{guid or i}",
-                "kind": "informe_mpf",
-                "kind_label": "Informe MPF",
-                "fecha": fecha,
-                "titulo": titulo,
-                "detalle": guid or "",
-                "guid": guid,
-                "_row": i,
-            }
-        )
+        items.append(_item_informe_mpf(i, guid, fecha, titulo))
 
     return items
 
@@ -4067,30 +5571,8 @@ def _descargar_informes_tecnicos(
 
     _asegurar_seccion_informes_tecnicos_visible(sac)
 
-    filas = None
-    for _ in range(40):
-        filas = sac.locator("table[id*='gvInformesTecnicos'] tr, table[id*='gvInformesTecnicosMPF'] tr")
-        try:
-            total_tmp = filas.count() if filas else 0
-        except Exception:
-            total_tmp = 0
-        try:
-            cand = sac.locator(
-                "#divInformesTecnicosMPF *[onclick*='VerInforme'], "
-                "#divInformesTecnicosMPF *[href*='VerInforme'], "
-                "#divInformesTecnicosMPF a:has(img[src*='pdf']), "
-                "#divInformesTecnicosMPF a:has(img[src*='adobe']), "
-                "#divInformesTecnicosMPF a:has(img[src*='Adobe'])"
-            )
-            cand_n = cand.count()
-        except Exception:
-            cand_n = 0
-        if (total_tmp > 1) and (cand_n > 0):
-            break
-        try:
-            sac.wait_for_timeout(150)
-        except Exception:
-            pass
+    _esperar_filas_informes_tecnicos(sac)
+    filas = sac.locator("table[id*='gvInformesTecnicos'] tr, table[id*='gvInformesTecnicosMPF'] tr")
 
     total = filas.count() if filas else 0
     try:
@@ -4356,7 +5838,8 @@ def _descargar_informes_tecnicos(
                 pass
             continue
         if destino.suffix.lower() != ".pdf":
-            destino = _ensure_pdf_fast(destino) if '_ensure_pdf_fast' in globals() else _ensure_pdf(destino)
+            with _PERFILES.medir("conversion"):
+                destino = _ensure_pdf_fast(destino) if '_ensure_pdf_fast' in globals() else _ensure_pdf(destino)
         if not destino or not destino.exists() or destino.suffix.lower() != ".pdf" or not _is_real_pdf(destino):
             try:
                 logging.info(f"[INF] Fila {i}: conversion a PDF fallida")
@@ -4403,76 +5886,32 @@ def _fecha_rnr_desde_pdf(pdf_path: Path) -> str | None:
     - Si no hay texto (escaneado), aplica OCR best-effort y reintenta.
     Devuelve "dd/mm/aaaa" o None.
     """
-    import unicodedata, re
-
-    def _extraer_txt(p: Path) -> str:
+    def _fecha(p: Path) -> str | None:
+        analisis = _analizar_pdf(p)
+        if analisis is not None:
+            return analisis["fecha"]
         txt = ""
         try:
-            import fitz  # PyMuPDF
-            doc = fitz.open(str(p))
-            for i in range(min(2, doc.page_count)):
+            for pg in PdfReader(str(p)).pages[:2]:
                 try:
-                    txt += doc[i].get_text("text") or ""
+                    txt += pg.extract_text() or ""
                 except Exception:
                     continue
-            try:
-                doc.close()
-            except Exception:
-                pass
         except Exception:
-            try:
-                for pg in PdfReader(str(p)).pages[:2]:
-                    try:
-                        txt += pg.extract_text() or ""
-                    except Exception:
-                        continue
-            except Exception:
-                pass
-        return txt or ""
-
-    def _parse(txt: str) -> str | None:
-        t = _norm_ws(txt or "")
-        if not t:
-            return None
-        # 1) dd/mm/aaaa
-        m = re.search(r"\b(\d{2})/(\d{2})/(\d{4})\b", t)
-        if m:
-            d, m_, a = m.groups()
-            try:
-                return f"{int(d):02d}/{int(m_):02d}/{int(a):04d}"
-            except Exception:
-                return f"{d}/{m_}/{a}"
-
-        # 2) "20 de septiembre de 2023" (case/acento-insensible)
-        def _deacc(s: str) -> str:
-            return "".join(c for c in unicodedata.normalize("NFD", s) if unicodedata.category(c) != "Mn").lower()
-
-        t2 = _deacc(t)
-        meses = {
-            "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6,
-            "julio": 7, "agosto": 8, "septiembre": 9, "setiembre": 9, "octubre": 10,
-            "noviembre": 11, "diciembre": 12,
-        }
-        m2 = re.search(r"\b(\d{1,2})\s+de\s+([a-z\u00f1]+)\s+de\s+(\d{4})\b", t2)
-        if m2:
-            d = int(m2.group(1))
-            mes_name = m2.group(2)
-            anio = int(m2.group(3))
-            mm = meses.get(mes_name)
-            if mm:
-                return f"{d:02d}/{mm:02d}/{anio:04d}"
-        return None
+            pass
+        return _fecha_desde_texto(txt)
 
     # Primer intento sin OCR
-    fecha = _parse(_extraer_txt(pdf_path))
+    fecha = _fecha(pdf_path)
     if fecha:
         return fecha
 
     # Best-effort: OCR si estÃƒÂ¡ habilitado/posible
     try:
-        pdf_ocr = _maybe_ocr(pdf_path)
+        with _PERFILES.medir("ocr"):
+            pdf_ocr = _maybe_ocr(pdf_path)
         if pdf_ocr and Path(pdf_ocr).exists():
-            fecha = _parse(_extraer_txt(Path(pdf_ocr)))
+            fecha = _fecha(Path(pdf_ocr))
             if fecha:
                 return fecha
     except Exception:
@@ -4967,7 +6406,7 @@ def _descargar_informes_reincidencia(
         try:
             with sac.expect_download(timeout=20000) as dl_info:
                 try:
-                    sac.goto(url_abs, wait_until="commit", timeout=15000)
+                    _navegar(sac, url_abs, wait_until="commit", timeout=15000)
                 except Exception as e:
                     msg = str(e)
                     # Esto NO es fallo real: indica que empezó la descarga
@@ -5028,7 +6467,7 @@ def _descargar_informes_reincidencia(
             try:
                 with page_aux.expect_download(timeout=20000) as dl_info:
                     try:
-                        page_aux.goto(url_abs, wait_until="commit", timeout=15000)
+                        _navegar(page_aux, url_abs, wait_until="commit", timeout=15000)
                     except Exception as e:
                         msg = str(e)
                         if "Download is starting" not in msg:
@@ -5059,7 +6498,7 @@ def _descargar_informes_reincidencia(
 
             # Fallback: por si abrió HTML con error
             try:
-                page_aux.goto(url_abs, wait_until="domcontentloaded", timeout=15000)
+                _navegar(page_aux, url_abs, wait_until="domcontentloaded", timeout=15000)
             except Exception as e:
                 try:
                     logging.info(f"[RNR] Fila {i}: goto auxiliar falló: {e}")
@@ -5301,7 +6740,8 @@ def _descargar_informes_reincidencia(
             continue
 
         if destino.suffix.lower() != ".pdf":
-            destino = _ensure_pdf_fast(destino) if '_ensure_pdf_fast' in globals() else _ensure_pdf(destino)
+            with _PERFILES.medir("conversion"):
+                destino = _ensure_pdf_fast(destino) if '_ensure_pdf_fast' in globals() else _ensure_pdf(destino)
 
         if not destino or not destino.exists() or destino.suffix.lower() != ".pdf" or not _is_real_pdf(destino):
             try:
@@ -5478,19 +6918,20 @@ def _open_portal_aplicaciones_pj(page):
         if href and not href.startswith("javascript:") and href.strip() != "#":
             if href.startswith("/"):
                 href = "https://teletrabajo.justiciacordoba.gob.ar" + href
-            page.goto(href, wait_until="domcontentloaded")
+            _navegar(page, href, wait_until="domcontentloaded")
             return page
 
         real = _extract_url_from_js(onclick)
         if real:
-            page.goto(real, wait_until="domcontentloaded")
+            _navegar(page, real, wait_until="domcontentloaded")
             return page
     except Exception:
         pass
 
     # Fallback duro
     proxy_prefix = _get_proxy_prefix(page)
-    page.goto(
+    _navegar(
+        page,
         proxy_prefix + "https://www.tribunales.gov.ar/PortalWeb/LogIn.aspx",
         wait_until="domcontentloaded",
     )
@@ -5712,7 +7153,8 @@ def _ensure_public_apps(page):
         return _open_portal_aplicaciones_pj(page)
 
     # activa el proxy y vuelve dentro del portal
-    page.goto(
+    _navegar(
+        page,
         proxy_prefix + "https://www.tribunales.gov.ar/PortalWeb/PublicApps.aspx",
         wait_until="domcontentloaded",
     )
@@ -5873,7 +7315,7 @@ def _extraer_url_de_link(link, proxy_prefix: str) -> str | None:
     return None
 
 
-def _descargar_archivo(session: requests.Session, url: str, destino: Path, _depth: int = 0) -> Path | None:
+def _descargar_archivo(session: "requests.Session", url: str, destino: Path, _depth: int = 0) -> Path | None:
     from requests.exceptions import SSLError
     from urllib.parse import urlparse
     import urllib3
@@ -6012,7 +7454,18 @@ def _descargar_archivo(session: requests.Session, url: str, destino: Path, _dept
         return not _payload_parece_respuesta_intermedia(payload)
 
     def _descarga_once(verify_tls: bool = True):
-        return session.get(url, timeout=60, allow_redirects=True, verify=verify_tls)
+        if _HAR.modo == "reproducir":
+            return _HAR.respuesta_http(url)
+        with _PLANIFICADOR.turno(url) as t:
+            r = session.get(url, timeout=60, allow_redirects=True, verify=verify_tls)
+            _HAR.guardar_http(url, r)
+            _METRICAS.inc("descargas_http_total", estado=str(r.status_code // 100) + "xx")
+            _METRICAS.inc("descargas_http_bytes_total", len(r.content or b""))
+            if r.status_code >= 500:
+                t["ok"], t["motivo"] = False, f"HTTP {r.status_code}"
+            elif b"ssl vpn proxy error" in (r.content or b"")[:4096].lower():
+                t["ok"], t["motivo"] = False, "proxy error"
+            return r
 
     payload = b""
     try:
@@ -6099,6 +7552,9 @@ def _imagen_a_pdf_fast(img: Path, margin_mm: float = 10.0) -> Path:
     return pdf
 
 
+_OFFICE_CNV_LOCK = threading.Lock()
+
+
 def _ensure_pdf_fast(path: Path) -> Path:
     ext = path.suffix.lower()
     if ext == ".pdf":
@@ -6108,34 +7564,37 @@ def _ensure_pdf_fast(path: Path) -> Path:
         pdf = _imagen_a_pdf_fast(path)
         return pdf
 
-    soffice = _shutil.which("soffice") or _shutil.which("soffice.exe") or r"C:\Program Files\LibreOffice\program\soffice.exe"
-    if soffice and Path(str(soffice)).exists():
-        outdir = path.parent
-        dst = path.with_suffix(".pdf")
-        logging.info(f"[CNV:OFF] {path.name} -> {dst.name}")
-        try:
-            subprocess.run(
-                [soffice, "--headless", "--convert-to", "pdf", "--outdir", str(outdir), str(path)],
-                check=True,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                **_subprocess_hidden_kwargs(),
-            )
-            pdf = path.with_suffix(".pdf")
-            if pdf.exists():
-                logging.info(f"[CNV:OK ] {pdf.name}")
-                return pdf
-        except Exception as e:
-            logging.info(f"[CNV:ERR] {path.name} Ã‚Â· {e}")
-    else:
-        logging.info(f"[CNV:OFF] LibreOffice no encontrado; no puedo convertir {path.name}")
-    word_pdf = _convert_office_with_word(path)
-    if word_pdf:
-        return word_pdf
-    docx_pdf = _convert_docx_text_to_pdf(path)
-    if docx_pdf:
-        return docx_pdf
-    return path
+    # LibreOffice/Word no toleran instancias concurrentes con el mismo perfil:
+    # desde el pool de ingesta las conversiones de oficina van de a una.
+    with _OFFICE_CNV_LOCK:
+        soffice = _shutil.which("soffice") or _shutil.which("soffice.exe") or r"C:\Program Files\LibreOffice\program\soffice.exe"
+        if soffice and Path(str(soffice)).exists():
+            outdir = path.parent
+            dst = path.with_suffix(".pdf")
+            logging.info(f"[CNV:OFF] {path.name} -> {dst.name}")
+            try:
+                subprocess.run(
+                    [soffice, "--headless", "--convert-to", "pdf", "--outdir", str(outdir), str(path)],
+                    check=True,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    **_subprocess_hidden_kwargs(),
+                )
+                pdf = path.with_suffix(".pdf")
+                if pdf.exists():
+                    logging.info(f"[CNV:OK ] {pdf.name}")
+                    return pdf
+            except Exception as e:
+                logging.info(f"[CNV:ERR] {path.name} Ã‚Â· {e}")
+        else:
+            logging.info(f"[CNV:OFF] LibreOffice no encontrado; no puedo convertir {path.name}")
+        word_pdf = _convert_office_with_word(path)
+        if word_pdf:
+            return word_pdf
+        docx_pdf = _convert_docx_text_to_pdf(path)
+        if docx_pdf:
+            return docx_pdf
+        return path
 
 
 def _open_sac_desde_portal_teletrabajo(page):
@@ -6229,12 +7688,12 @@ def _open_sac_desde_portal_teletrabajo(page):
         if href and href.strip() not in ("#", "javascript:void(0)"):
             if href.startswith("/"):
                 href = "https://teletrabajo.justiciacordoba.gob.ar" + href
-            page.goto(href, wait_until="domcontentloaded")
+            _navegar(page, href, wait_until="domcontentloaded")
             return page
 
         real = _extract_url_from_js(onclick)
         if real:
-            page.goto(real, wait_until="domcontentloaded")
+            _navegar(page, real, wait_until="domcontentloaded")
             return page
     except Exception:
         pass
@@ -6316,11 +7775,11 @@ def _open_sac_desde_portal_intranet(page):
     base_host = _sac_host_base(page).rstrip("/")
     dest = _proxify_abs_url(proxy_prefix, f"{base_host}/SacInterior/Menu/Default.aspx")
     try:
-        page.goto(dest, wait_until="domcontentloaded")
+        _navegar(page, dest, wait_until="domcontentloaded")
     except Exception:
         # fallback estable en SSL-VPN
         alt = _proxify_abs_url(proxy_prefix, "https://aplicaciones.tribunales.gov.ar/SacInterior/Menu/Default.aspx")
-        page.goto(alt, wait_until="domcontentloaded")
+        _navegar(page, alt, wait_until="domcontentloaded")
     return page
 
 
@@ -6379,7 +7838,7 @@ def _ir_a_radiografia(sac):
 
     for dest in _radiografia_candidate_urls(sac):
         try:
-            sac.goto(dest, wait_until="domcontentloaded")
+            _navegar(sac, dest, wait_until="domcontentloaded")
             if _is_proxy_error(sac):
                 continue
             return sac
@@ -6387,7 +7846,7 @@ def _ir_a_radiografia(sac):
             continue
 
     # ultimo fallback directo
-    sac.goto(URL_RADIOGRAFIA, wait_until="domcontentloaded")
+    _navegar(sac, URL_RADIOGRAFIA, wait_until="domcontentloaded")
     return sac
 
 
@@ -6397,7 +7856,7 @@ def abrir_sac_via_teletrabajo(context, tele_user, tele_pass, intra_user, intra_p
     page.set_default_timeout(int(os.getenv("OPEN_TIMEOUT_MS", "45000")))
     page.set_default_navigation_timeout(int(os.getenv("OPEN_NAV_TIMEOUT_MS", "60000")))
 
-    page.goto(TELETRABAJO_URL, wait_until="domcontentloaded")
+    _navegar(page, TELETRABAJO_URL, wait_until="domcontentloaded")
 
     def _is_portal_grid(pg):
         try:
@@ -6487,7 +7946,7 @@ def abrir_sac(context, tele_user, tele_pass, intra_user, intra_pass):
 
             # Si la URL de Intranet no resuelve o estÃƒÂ¡ caÃƒÂ­da, disparamos un error reconocible
             try:
-                pg.goto(INTRANET_LOGIN_URL, wait_until="domcontentloaded")
+                _navegar(pg, INTRANET_LOGIN_URL, wait_until="domcontentloaded")
             except Exception as e:
                 # DNS / conectividad: net::ERR_NAME_NOT_RESOLVED, ERR_CONNECTION_*
                 if "ERR_NAME_NOT_RESOLVED" in str(e) or "ERR_CONNECTION" in str(e):
@@ -6665,8 +8124,10 @@ def _imprimir_libro_a_pdf(libro, context, tmp_dir: Path, p) -> Path | None:
         headless=True, args=["--disable-gpu", "--no-sandbox", "--disable-dev-shm-usage"]
     )
     hctx = hbrowser.new_context(
-        storage_state=str(state_file), viewport={"width": 1366, "height": 900}
+        storage_state=str(state_file), viewport={"width": 1366, "height": 900},
+        **_HAR.opciones_contexto(),
     )
+    _HAR.instalar(hctx)
     hp = hctx.new_page()
     # reinyectar storages ANTES de navegar
     import json
@@ -6683,7 +8144,7 @@ def _imprimir_libro_a_pdf(libro, context, tmp_dir: Path, p) -> Path | None:
             }} catch (e) {{}}
         }})(); """
     )
-    hp.goto(libro.url, wait_until="networkidle")
+    _navegar(hp, libro.url, wait_until="networkidle")
     hp.emulate_media(media="print")
     hp.pdf(path=str(out), format="A4", print_background=True, prefer_css_page_size=True)
 
@@ -6705,10 +8166,12 @@ def _imprimir_libro_a_pdf(libro, context, tmp_dir: Path, p) -> Path | None:
             headless=True, args=["--disable-gpu", "--no-sandbox", "--disable-dev-shm-usage"]
         )
         hctx = hbrowser.new_context(
-            storage_state=str(state_file), viewport={"width": 1366, "height": 900}
+            storage_state=str(state_file), viewport={"width": 1366, "height": 900},
+            **_HAR.opciones_contexto(),
         )
+        _HAR.instalar(hctx)
         hp = hctx.new_page()
-        hp.goto(libro.url, wait_until="networkidle")
+        _navegar(hp, libro.url, wait_until="networkidle")
         # Cargar/expandir como hicimos en la pestaÃƒÂ±a visible
         try:
             _expandir_y_cargar_todo_el_libro(hp)
@@ -6809,8 +8272,10 @@ def _convertir_html_a_pdf(html_path: Path, context, p, tmp_dir: Path) -> Path |
             headless=True, args=["--disable-gpu", "--no-sandbox", "--disable-dev-shm-usage"]
         )
         hctx = hbrowser.new_context(
-            storage_state=str(state_file), viewport={"width": 1366, "height": 900}
+            storage_state=str(state_file), viewport={"width": 1366, "height": 900},
+            **_HAR.opciones_contexto(),
         )
+        _HAR.instalar(hctx)
         hp = hctx.new_page()
 
         # Cargar el archivo local; los recursos relativos se resuelven con el <base> inyectado
@@ -6834,7 +8299,196 @@ def _convertir_html_a_pdf(html_path: Path, context, p, tmp_dir: Path) -> Path |
     return None
 
 
-def _render_operacion_a_pdf_paginas(libro, op_id: str, context, p, tmp_dir: Path, hctx=None, hp=None) -> Path | None:
+class _CacheAssetsImpresion:
+    """
+    Cache de recursos estaticos (CSS, fuentes, imagenes) para los contextos de
+    impresion HTML->PDF. El <head> del Libro apunta todo al proxy SSL-VPN: sin
+    cache, cada operacion vuelve a bajar los mismos archivos. Se instala con
+    `context.route` y sirve desde memoria despues de la primera descarga.
+
+    Con PRINT_ASSET_CACHE_DIR tambien persiste en disco entre corridas; esas
+    entradas (y las de corridas anteriores en memoria) se revalidan una vez
+    por corrida con If-None-Match / If-Modified-Since.
+    """
+
+    TIPOS = {"stylesheet", "image", "font"}
+    # route.fetch ya devuelve el cuerpo decodificado: estas cabeceras
+    # describen el original comprimido y romperian el fulfill.
+    SIN_CACHEAR = {"content-encoding", "content-length", "transfer-encoding"}
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._mem: dict[str, dict] = {}
+        self._validados: set[str] = set()
+        self.hits = 0
+        self.misses = 0
+        self._dir = None
+        d = (os.getenv("PRINT_ASSET_CACHE_DIR") or "").strip()
+        if d:
+            try:
+                self._dir = Path(d)
+                self._dir.mkdir(parents=True, exist_ok=True)
+            except Exception:
+                self._dir = None
+
+    def nueva_corrida(self):
+        with self._lock:
+            if self.hits or self.misses:
+                logging.info(f"[ASSETS] corrida previa · hits={self.hits} misses={self.misses}")
+            self._validados.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _es_estatico(self, request) -> bool:
+        try:
+            return request.method == "GET" and request.resource_type in self.TIPOS
+        except Exception:
+            return False
+
+    def _disk_paths(self, url: str):
+        import hashlib
+
+        h = hashlib.sha1(url.encode("utf-8", "ignore")).hexdigest()
+        return self._dir / f"{h}.bin", self._dir / f"{h}.json"
+
+    def _leer_disco(self, url: str) -> dict | None:
+        import json
+
+        if self._dir is None:
+            return None
+        body_p, meta_p = self._disk_paths(url)
+        try:
+            meta = json.loads(meta_p.read_text(encoding="utf-8"))
+            return {"status": int(meta.get("status") or 200), "headers": self._cacheables(meta.get("headers")),
+                    "body": body_p.read_bytes()}
+        except Exception:
+            return None
+
+    def _guardar(self, url: str, entry: dict):
+        import json
+
+        with self._lock:
+            self._mem[url] = entry
+            self._validados.add(url)
+        if self._dir is None:
+            return
+        body_p, meta_p = self._disk_paths(url)
+        try:
+            body_p.write_bytes(entry["body"])
+            meta_p.write_text(json.dumps({"url": url, "status": entry["status"], "headers": entry["headers"]}), encoding="utf-8")
+        except Exception:
+            pass
+
+    def _buscar(self, url: str) -> tuple[dict | None, bool]:
+        """Devuelve (entrada, validada_en_esta_corrida)."""
+        with self._lock:
+            entry = self._mem.get(url)
+            validada = url in self._validados
+        if entry is None:
+            entry = self._leer_disco(url)
+            if entry is not None:
+                with self._lock:
+                    self._mem[url] = entry
+        return entry, validada
+
+    @classmethod
+    def _cacheables(cls, headers) -> dict:
+        return {k: v for k, v in (headers or {}).items() if str(k).lower() not in cls.SIN_CACHEAR}
+
+    def _contar(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if hit:
+            _METRICAS.inc("cache_hits_total", cache="assets")
+
+    @staticmethod
+    def _headers_condicionales(request, entry: dict) -> dict:
+        headers = dict(request.headers or {})
+        h = {k.lower(): v for k, v in (entry.get("headers") or {}).items()}
+        if h.get("etag"):
+            headers["If-None-Match"] = h["etag"]
+        if h.get("last-modified"):
+            headers["If-Modified-Since"] = h["last-modified"]
+        return headers
+
+    def _resolver(self, url: str, entry: dict | None, status: int, headers: dict, body: bytes | None) -> dict | None:
+        if status == 304 and entry is not None:
+            with self._lock:
+                self._validados.add(url)
+            return entry
+        if 200 <= status < 300 and body is not None:
+            nuevo = {"status": status, "headers": self._cacheables(headers), "body": body}
+            self._guardar(url, nuevo)
+            return nuevo
+        return None
+
+    def handler(self, route, request):
+        if not self._es_estatico(request):
+            return route.continue_()
+        url = request.url
+        entry, validada = self._buscar(url)
+        if entry is not None and validada:
+            self._contar(True)
+            return route.fulfill(status=entry["status"], headers=entry["headers"], body=entry["body"])
+        self._contar(False)
+        try:
+            headers = self._headers_condicionales(request, entry) if entry is not None else None
+            resp = route.fetch(headers=headers) if headers else route.fetch()
+            status = resp.status
+            body = resp.body() if status != 304 else None
+            final = self._resolver(url, entry, status, resp.headers, body)
+        except Exception:
+            return route.continue_()
+        if final is None:
+            return route.fulfill(response=resp)
+        return route.fulfill(status=final["status"], headers=final["headers"], body=final["body"])
+
+    async def handler_async(self, route, request):
+        if not self._es_estatico(request):
+            return await route.continue_()
+        url = request.url
+        entry, validada = self._buscar(url)
+        if entry is not None and validada:
+            self._contar(True)
+            return await route.fulfill(status=entry["status"], headers=entry["headers"], body=entry["body"])
+        self._contar(False)
+        try:
+            headers = self._headers_condicionales(request, entry) if entry is not None else None
+            resp = await (route.fetch(headers=headers) if headers else route.fetch())
+            status = resp.status
+            body = (await resp.body()) if status != 304 else None
+            final = self._resolver(url, entry, status, resp.headers, body)
+        except Exception:
+            return await route.continue_()
+        if final is None:
+            return await route.fulfill(response=resp)
+        return await route.fulfill(status=final["status"], headers=final["headers"], body=final["body"])
+
+    def instalar(self, ctx):
+        if not _env_true("PRINT_ASSET_CACHE", "1"):
+            return
+        try:
+            ctx.route("**/*", self.handler)
+        except Exception as e:
+            logging.info(f"[ASSETS] No pude instalar la cache en el contexto de impresion: {e}")
+
+    async def instalar_async(self, ctx):
+        if not _env_true("PRINT_ASSET_CACHE", "1"):
+            return
+        try:
+            await ctx.route("**/*", self.handler_async)
+        except Exception as e:
+            logging.info(f"[ASSETS] No pude instalar la cache en el contexto async: {e}")
+
+
+_ASSET_CACHE = _CacheAssetsImpresion()
+
+
+def _partes_impresion_operacion(libro, op_id: str) -> dict | None:
+    """Lee del Libro el contenedor de la operacion y el <head> (sin scripts) para imprimirla aparte."""
     cont = _buscar_contenedor_operacion(libro, op_id)
     if not cont:
         return None
@@ -6877,7 +8531,10 @@ def _render_operacion_a_pdf_paginas(libro, op_id: str, context, p, tmp_dir: Path
 
     head_html = re.sub(r"(?is)<script\b[^>]*>.*?</script>", "", head_html or "")
     head_html = re.sub(r"(?is)<base\b[^>]*>", "", head_html or "")
+    return {"head": head_html, "body_class": body_class, "base_href": base_href, "outer": outer}
+
 
+def _componer_html_impresion(partes: dict, cuerpo: str, css_extra: str = "") -> str:
     css = """
         @page { size: A4; margin: 10mm; }
         html, body { -webkit-print-color-adjust: exact; print-color-adjust: exact; }
@@ -6890,20 +8547,105 @@ def _render_operacion_a_pdf_paginas(libro, op_id: str, context, p, tmp_dir: Path
         table { page-break-inside: avoid; break-inside: avoid-page; page-break-after: avoid; }
         #codex-op-print-root { margin: 0 !important; padding: 0 !important; }
     """
-    html = f"""<!doctype html>
+    return f"""<!doctype html>
 <html>
 <head>
 <meta charset="utf-8">
-<base href="{base_href}">
-{head_html}
-<style>{css}</style>
+<base href="{partes['base_href']}">
+{partes['head']}
+<style>{css}{css_extra}</style>
 </head>
-<body class="{body_class}"><div id="codex-op-print-root">{outer}</div></body>
+<body class="{partes['body_class']}"><div id="codex-op-print-root">{cuerpo}</div></body>
 </html>"""
 
+
+def _html_impresion_operacion(libro, op_id: str) -> str | None:
+    """Arma el HTML autocontenido (head sin scripts + contenedor) listo para imprimir una operacion."""
+    partes = _partes_impresion_operacion(libro, op_id)
+    if not partes:
+        return None
+    return _componer_html_impresion(partes, partes["outer"])
+
+
+def _imprimir_html_en_pagina(hp, html: str, out: Path) -> Path | None:
+    """set_content + espera de recursos + page.pdf sobre una pagina de impresion ya abierta."""
+    hp.set_content(html, wait_until="domcontentloaded")
+    try:
+        hp.wait_for_load_state("networkidle", timeout=5000)
+    except Exception:
+        pass
+    hp.wait_for_timeout(250)
+    try:
+        hp.emulate_media(media="print")
+    except Exception:
+        pass
+    hp.pdf(path=str(out), format="A4", print_background=True, prefer_css_page_size=True)
+    return out if out.exists() and out.stat().st_size > 500 else None
+
+
+class _CacheRendersOperacion:
+    """
+    PDFs de operaciones ya impresos en la sesion (p. ej. las vistas previas de
+    Radiografia), indexados por op_id + huella del HTML del contenedor. Si al
+    capturar la operacion el contenedor sigue igual, se reutiliza el PDF en vez
+    de volver a imprimirlo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._renders: dict[str, tuple[str, Path]] = {}
+        self.hits = 0
+
+    @staticmethod
+    def huella(outer_html: str) -> str:
+        import hashlib
+
+        # Los estilos inline cambian al mostrar/ocultar la operacion; el contenido no.
+        txt = re.sub(r"""(?i)\sstyle\s*=\s*("[^"]*"|'[^']*')""", "", outer_html or "")
+        txt = re.sub(r"\s+", " ", txt).strip()
+        return hashlib.sha1(txt.encode("utf-8", "ignore")).hexdigest()
+
+    def buscar(self, op_id: str, huella: str, destino: Path) -> Path | None:
+        with self._lock:
+            entry = self._renders.get(str(op_id))
+        if not entry or entry[0] != huella:
+            return None
+        src_pdf = entry[1]
+        try:
+            if not (src_pdf.exists() and _is_real_pdf(src_pdf)):
+                return None
+            if src_pdf.resolve() != destino.resolve():
+                shutil.copyfile(src_pdf, destino)
+        except Exception as e:
+            logging.info(f"[OP:CACHE] {op_id}: no pude reutilizar {src_pdf.name}: {e}")
+            return None
+        with self._lock:
+            self.hits += 1
+        _METRICAS.inc("cache_hits_total", cache="render_operacion")
+        return destino
+
+    def guardar(self, op_id: str, huella: str, pdf: Path):
+        with self._lock:
+            self._renders[str(op_id)] = (huella, Path(pdf))
+
+
+def _render_operacion_a_pdf_paginas(
+    libro, op_id: str, context, p, tmp_dir: Path, hctx=None, hp=None, cache: _CacheRendersOperacion | None = None
+) -> Path | None:
+    partes = _partes_impresion_operacion(libro, op_id)
+    if not partes:
+        return None
+    out = tmp_dir / f"op_{op_id}.pdf"
+    huella = _CacheRendersOperacion.huella(partes["outer"]) if cache is not None else ""
+    if cache is not None:
+        reusado = cache.buscar(op_id, huella, out)
+        if reusado:
+            logging.info(f"[OP:CACHE] {op_id} -> {out.name} (render reutilizado)")
+            return reusado
+    html = _componer_html_impresion(partes, partes["outer"])
+
     state_file = tmp_dir / f"state_{op_id}.json"
     context.storage_state(path=str(state_file))
-    out = tmp_dir / f"op_{op_id}.pdf"
 
     if hctx is None or hp is None:
         hbrowser = _launch_chromium(
@@ -6912,51 +8654,349 @@ def _render_operacion_a_pdf_paginas(libro, op_id: str, context, p, tmp_dir: Path
         )
         try:
             hctx = hbrowser.new_context(
-                storage_state=str(state_file), viewport={"width": 1366, "height": 900}
+                storage_state=str(state_file), viewport={"width": 1366, "height": 900},
+                **_HAR.opciones_contexto(),
             )
+            _ASSET_CACHE.instalar(hctx)
+            _HAR.instalar(hctx)
             hp = hctx.new_page()
-            hp.set_content(html, wait_until="domcontentloaded")
+            _imprimir_html_en_pagina(hp, html, out)
+        finally:
             try:
-                hp.wait_for_load_state("networkidle", timeout=5000)
+                hctx.close()
             except Exception:
                 pass
-            hp.wait_for_timeout(250)
             try:
-                hp.emulate_media(media="print")
+                hbrowser.close()
             except Exception:
                 pass
-            hp.pdf(path=str(out), format="A4", print_background=True, prefer_css_page_size=True)
+    else:
+        try:
+            _imprimir_html_en_pagina(hp, html, out)
+        except Exception as e:
+            logging.info(f"[HTML->PDF:REUSE-ERR] {e}")
+            return None
+
+    try:
+        logging.info(f"[OP:REALCSS] {op_id} -> {out.name}")
+    except Exception:
+        pass
+    if not (out.exists() and out.stat().st_size > 500):
+        return None
+    if cache is not None:
+        cache.guardar(op_id, huella, out)
+    return out
+
+
+_LOTE_MARCA = "EXPEOPMARK{:05d}"
+
+
+def _dividir_pdf_por_marcadores(pdf_lote: Path, op_ids: list[str], tmp_dir: Path) -> dict[str, Path]:
+    """
+    Corta el PDF de un lote en un PDF por operacion ubicando las marcas
+    invisibles que abren cada una. Las marcas se borran (redaccion) para que
+    no queden en la capa de texto. Si falta alguna marca devuelve {} y el
+    llamador imprime esas operaciones por separado.
+    """
+    import fitz
+
+    out: dict[str, Path] = {}
+    doc = fitz.open(str(pdf_lote))
+    try:
+        inicios: list[tuple[int, int]] = []  # (indice op, pagina)
+        vistos: set[int] = set()
+        for pno in range(doc.page_count):
+            page = doc[pno]
+            txt = page.get_text("text") or ""
+            encontrados = False
+            for m in re.finditer(r"EXPEOPMARK(\d{5})", txt):
+                k = int(m.group(1))
+                if k in vistos or k >= len(op_ids):
+                    continue
+                vistos.add(k)
+                inicios.append((k, pno))
+                encontrados = True
+            if encontrados:
+                for k, pg in inicios:
+                    if pg != pno:
+                        continue
+                    for rect in page.search_for(_LOTE_MARCA.format(k)):
+                        page.add_redact_annot(rect)
+                try:
+                    page.apply_redactions(images=getattr(fitz, "PDF_REDACT_IMAGE_NONE", 0))
+                except Exception:
+                    pass
+        inicios.sort(key=lambda t: t[1])
+        paginas = [pg for _k, pg in inicios]
+        if len(inicios) != len(op_ids) or len(set(paginas)) != len(paginas):
+            # marcas faltantes o dos ops en la misma pagina: los rangos no son confiables
+            logging.info(f"[LOTE] {pdf_lote.name}: marcas {len(inicios)}/{len(op_ids)}; se imprime por separado")
+            return {}
+        for pos, (k, desde) in enumerate(inicios):
+            hasta = (inicios[pos + 1][1] - 1) if pos + 1 < len(inicios) else (doc.page_count - 1)
+            dst = tmp_dir / f"op_{op_ids[k]}.pdf"
+            piece = fitz.open()
+            piece.insert_pdf(doc, from_page=desde, to_page=hasta)
+            piece.save(str(dst), deflate=True, garbage=3)
+            piece.close()
+            out[op_ids[k]] = dst
+    finally:
+        doc.close()
+    return out
+
+
+class _LoteImpresion:
+    """
+    Imprime varias operaciones en un solo trabajo de Chromium.
+    Cada operacion va en su propio bloque con salto de pagina forzado y una
+    marca de texto invisible; despues del `page.pdf` el lote se corta por
+    marcas en un PDF por operacion. Cada `agregar` devuelve un Future que se
+    resuelve con el PDF de esa operacion (o None) cuando se vacia el lote.
+    """
+
+    CSS = """
+        .codex-op-lote + .codex-op-lote { break-before: page; page-break-before: always; }
+        .codex-op-marca { height: 2px; overflow: hidden; color: #fff; font-size: 2px; line-height: 2px; }
+    """
+
+    def __init__(self, tmp_dir: Path, hp=None, engine: "_AsyncPrintEngine | None" = None, tam: int | None = None):
+        try:
+            env_tam = int(os.getenv("PRINT_BATCH_SIZE", "0") or "0")
+        except Exception:
+            env_tam = 0
+        self.tam = max(1, tam or env_tam or 1)
+        self.tmp_dir = tmp_dir
+        self.hp = hp
+        self.engine = engine
+        self._pend: list[tuple[str, dict, object]] = []
+        self._n = 0
+
+    def agregar(self, op_id: str, partes: dict):
+        from concurrent.futures import Future
+
+        fut = Future()
+        self._pend.append((op_id, partes, fut))
+        if len(self._pend) >= self.tam:
+            self.vaciar()
+        return fut
+
+    def vaciar(self):
+        pend, self._pend = self._pend, []
+        if not pend:
+            return
+        self._n += 1
+        cuerpos = [
+            f'<div class="codex-op-lote"><div class="codex-op-marca">{_LOTE_MARCA.format(k)}</div>{partes["outer"]}</div>'
+            for k, (_op, partes, _f) in enumerate(pend)
+        ]
+        html = _componer_html_impresion(pend[0][1], "".join(cuerpos), css_extra=self.CSS)
+        out = self.tmp_dir / f"lote_{self._n:03d}.pdf"
+        if self.engine is not None:
+            fut_lote = self.engine.render(html, out)
+            # el callback corre en el loop del motor: repartimos en otro hilo
+            # para poder reimprimir sueltas con render_sync sin bloquearlo
+            fut_lote.add_done_callback(
+                lambda f, pend=pend: threading.Thread(target=self._repartir, args=(f, pend), daemon=True).start()
+            )
+            return
+        try:
+            pdf = _imprimir_html_en_pagina(self.hp, html, out) if self.hp is not None else None
+        except Exception as e:
+            logging.info(f"[LOTE:ERR] lote {self._n}: {e}")
+            pdf = None
+        self._repartir(pdf, pend)
+
+    def _repartir(self, pdf, pend):
+        if hasattr(pdf, "result"):
+            try:
+                pdf = pdf.result()
+            except Exception as e:
+                logging.info(f"[LOTE:ERR] {e}")
+                pdf = None
+        op_ids = [op_id for op_id, _p, _f in pend]
+        partes_pdf: dict[str, Path] = {}
+        if pdf:
+            try:
+                partes_pdf = _dividir_pdf_por_marcadores(Path(pdf), op_ids, self.tmp_dir)
+            except Exception as e:
+                logging.info(f"[LOTE:ERR] no pude dividir {Path(pdf).name}: {e}")
+        logging.info(f"[LOTE] {len(partes_pdf)}/{len(op_ids)} operaciones en un solo PDF")
+        for op_id, partes, fut in pend:
+            pth = partes_pdf.get(op_id)
+            if pth is None:
+                # sin marca: la imprimimos sola con el mismo HTML ya capturado
+                pth = self._imprimir_sola(op_id, partes)
+            fut.set_result(pth)
+
+    def _imprimir_sola(self, op_id: str, partes: dict) -> Path | None:
+        html = _componer_html_impresion(partes, partes["outer"])
+        out = self.tmp_dir / f"op_{op_id}.pdf"
+        try:
+            if self.engine is not None:
+                return self.engine.render_sync(html, out)
+            if self.hp is not None:
+                return _imprimir_html_en_pagina(self.hp, html, out)
+        except Exception as e:
+            logging.info(f"[LOTE:ERR] {op_id}: {e}")
+        return None
+
+
+async def _launch_chromium_async(chromium, **kwargs):
+    """Variante async de `_launch_chromium` (mismo fallback al Chromium local)."""
+    try:
+        return await chromium.launch(**kwargs)
+    except Exception as exc:
+        if "Executable doesn't exist" not in str(exc):
+            raise
+        candidate = next(iter(_local_chromium_candidates()), None)
+        if candidate is None:
+            raise
+        retry_kwargs = dict(kwargs)
+        retry_kwargs["executable_path"] = str(candidate)
+        logging.warning("[NAV:ASYNC] Chromium revision faltante; reintentando con %s", candidate)
+        return await chromium.launch(**retry_kwargs)
+
+
+class _AsyncPrintEngine:
+    """
+    Motor `async_playwright` para imprimir varias operaciones a la vez.
+
+    Corre su propio event loop en un hilo dedicado con N paginas de impresion:
+    la concurrencia sale del loop, no de mas procesos. El scraping del SAC
+    sigue en el hilo sync; `render` devuelve un Future y `render_sync` es el
+    envoltorio bloqueante.
+    """
+
+    def __init__(self, storage_state: dict | None = None, pages: int | None = None, chromium_args: list[str] | None = None):
+        try:
+            env_pages = int(os.getenv("PW_ASYNC_PAGES", "3") or "3")
+        except Exception:
+            env_pages = 3
+        self.pages = max(1, pages or env_pages)
+        self._state = storage_state
+        self._args = chromium_args or ["--disable-gpu", "--no-sandbox", "--disable-dev-shm-usage"]
+        self._pw = self._browser = self._ctx = None
+        self._free = None
+        self._error = None
+        self._ready = threading.Event()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name="pw-async", daemon=True)
+        self._thread.start()
+        self._ready.wait(60)
+        if self._error is not None or self._free is None:
+            self.close()
+            raise RuntimeError(f"No pude iniciar el motor async de impresion: {self._error}")
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._start())
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        try:
+            self._loop.run_forever()
         finally:
             try:
-                hctx.close()
+                self._loop.run_until_complete(self._stop())
             except Exception:
                 pass
+            self._loop.close()
+
+    async def _start(self):
+        from playwright.async_api import async_playwright
+
+        self._pw = await async_playwright().start()
+        self._browser = await _launch_chromium_async(self._pw.chromium, headless=True, args=self._args)
+        self._ctx = await self._browser.new_context(
+            storage_state=self._state,
+            viewport={"width": 1366, "height": 900},
+            **_HAR.opciones_contexto(),
+        )
+        await _ASSET_CACHE.instalar_async(self._ctx)
+        await _HAR.instalar_async(self._ctx)
+        free = asyncio.Queue()
+        for _ in range(self.pages):
+            pg = await self._ctx.new_page()
             try:
-                hbrowser.close()
+                await pg.emulate_media(media="print")
             except Exception:
                 pass
-    else:
-        try:
-            hp.set_content(html, wait_until="domcontentloaded")
+            free.put_nowait(pg)
+        self._free = free
+        logging.info(f"[PW:ASYNC] Motor de impresion listo · paginas={self.pages}")
+
+    async def _stop(self):
+        for obj in (self._ctx, self._browser):
             try:
-                hp.wait_for_load_state("networkidle", timeout=5000)
+                if obj is not None:
+                    await obj.close()
             except Exception:
                 pass
-            hp.wait_for_timeout(250)
+        try:
+            if self._pw is not None:
+                await self._pw.stop()
+        except Exception:
+            pass
+
+    async def _print(self, html: str, out: Path) -> Path | None:
+        pg = await self._free.get()
+        try:
+            await pg.set_content(html, wait_until="domcontentloaded")
             try:
-                hp.emulate_media(media="print")
+                await pg.wait_for_load_state("networkidle", timeout=5000)
             except Exception:
                 pass
-            hp.pdf(path=str(out), format="A4", print_background=True, prefer_css_page_size=True)
+            await pg.wait_for_timeout(250)
+            await pg.pdf(path=str(out), format="A4", print_background=True, prefer_css_page_size=True)
+        finally:
+            self._free.put_nowait(pg)
+        return out if out.exists() and out.stat().st_size > 500 else None
+
+    def render(self, html: str, out: Path):
+        return asyncio.run_coroutine_threadsafe(self._print(html, Path(out)), self._loop)
+
+    def render_sync(self, html: str, out: Path, timeout: float = 90.0) -> Path | None:
+        return self.render(html, out).result(timeout)
+
+    def close(self):
+        try:
+            if self._loop.is_running():
+                self._loop.call_soon_threadsafe(self._loop.stop)
+        except Exception:
+            pass
+        try:
+            self._thread.join(15)
+        except Exception:
+            pass
+
+
+def _render_operacion_a_pdf_async(libro, op_id: str, tmp_dir: Path, engine: _AsyncPrintEngine):
+    """
+    Captura el HTML en el hilo sync (Libro) y delega la impresion al motor async.
+    Devuelve un Future[Path | None], o None si no hubo contenedor.
+    """
+    html = _html_impresion_operacion(libro, op_id)
+    if not html:
+        return None
+    out = tmp_dir / f"op_{op_id}.pdf"
+    fut = engine.render(html, out)
+
+    def _log(f):
+        try:
+            res = f.result()
+            logging.info(f"[OP:ASYNC] {op_id} -> {res.name if res else 'sin PDF'}")
         except Exception as e:
-            logging.info(f"[HTML->PDF:REUSE-ERR] {e}")
-            return None
+            logging.info(f"[OP:ASYNC:ERR] {op_id}: {e}")
 
-    try:
-        logging.info(f"[OP:REALCSS] {op_id} -> {out.name}")
-    except Exception:
-        pass
-    return out if out.exists() and out.stat().st_size > 500 else None
+    fut.add_done_callback(_log)
+    return fut
+
+
+def _engine_async_habilitado() -> bool:
+    return (os.getenv("PW_ENGINE", "sync") or "sync").strip().lower() == "async"
 
 
 def _render_caratula_a_pdf(libro, context, p, tmp_dir: Path, hctx=None, hp=None) -> Path | None:
@@ -7013,8 +9053,11 @@ def _render_caratula_a_pdf(libro, context, p, tmp_dir: Path, hctx=None, hp=None)
         )
         try:
             hctx = hbrowser.new_context(
-                storage_state=str(state_file), viewport={"width": 900, "height": 1200}
+                storage_state=str(state_file), viewport={"width": 900, "height": 1200},
+                **_HAR.opciones_contexto(),
             )
+            _ASSET_CACHE.instalar(hctx)
+            _HAR.instalar(hctx)
             hp = hctx.new_page()
             hp.set_content(html_doc, wait_until="domcontentloaded")
             try:
@@ -7046,7 +9089,8 @@ def _render_caratula_a_pdf(libro, context, p, tmp_dir: Path, hctx=None, hp=None)
     # 5) Limpieza opcional si hubiera pÃƒÂ¡gina en blanco
     if out.exists() and out.stat().st_size > 1024:
         try:
-            return _pdf_sin_blancos(out)
+            with _PERFILES.medir("blancos"):
+                return _pdf_sin_blancos(out)
         except Exception:
             return out
     return None
@@ -7059,66 +9103,322 @@ def _pdf_sin_blancos(pdf_path: Path, thresh: float = 0.995) -> Path:
         logging.info("[BLANK] PyMuPDF no disponible; omito limpieza de pÃƒÂ¡ginas en blanco.")
         return pdf_path
 
+    analisis = _analizar_pdf(pdf_path)
+    if analisis is None:
+        return pdf_path
+    # blanca = sin texto, sin imagenes, sin dibujos y casi todo el raster blanco
+    conservar = [i for i, reg in enumerate(analisis["paginas"]) if not _pagina_es_blanca(reg, thresh)]
+    if len(conservar) == len(analisis["paginas"]) or not conservar:
+        # nada que limpiar (o todo blanco): el archivo queda como esta
+        return pdf_path
+
     doc = fitz.open(str(pdf_path))
     out = fitz.open()
-    for i in range(doc.page_count):
-        pg = doc[i]
-        txt = (pg.get_text("text") or "").strip()
-        imgs = pg.get_images(full=True)
-        draws = pg.get_drawings()
+    for i in conservar:
+        out.insert_pdf(doc, from_page=i, to_page=i)
+
+    if out.page_count == 0:
+        doc.close()
+        out.close()
+        return pdf_path
+
+    cleaned = pdf_path.with_suffix(".clean.pdf")
+    out.save(str(cleaned), deflate=True, garbage=3)
+    doc.close()
+    out.close()
+    try:
+        pdf_path.unlink(missing_ok=True)
+    except Exception:
+        pass
+    return cleaned
+
+
+class _CacheOcrBloques:
+    """
+    OCR por blob: sha1 del PDF de entrada -> PDF con capa de texto. Un mismo
+    archivo que llega mas de una vez (p. ej. adjunto repetido o reintento) se
+    reconoce una sola vez; si otro hilo ya lo esta procesando, se espera.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hechos: dict[str, Path | None] = {}
+        self._en_curso: dict[str, threading.Event] = {}
+        self.hits = 0
+
+    @staticmethod
+    def huella(pdf: Path) -> str:
+        import hashlib
+
+        h = hashlib.sha1()
+        try:
+            with open(pdf, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+        except Exception:
+            return ""
+        return h.hexdigest()
+
+    def _cacheado(self, clave: str, pdf: Path) -> Path | None:
+        if clave not in self._hechos:
+            return None
+        hecho = self._hechos[clave]
+        if hecho is None:
+            return pdf  # ya se intento y no hubo OCR util
+        return hecho if hecho.exists() else None
+
+    def obtener(self, pdf: Path, fn) -> Path:
+        clave = self.huella(pdf)
+        if not clave:
+            return fn()
+        while True:
+            with self._lock:
+                hecho = self._cacheado(clave, pdf)
+                if hecho is not None:
+                    self.hits += 1
+                    _METRICAS.inc("cache_hits_total", cache="ocr_bloque")
+                    return hecho
+                evento = self._en_curso.get(clave)
+                if evento is None:
+                    evento = self._en_curso[clave] = threading.Event()
+                    break
+            evento.wait()
+        try:
+            res = Path(fn())
+        except Exception as e:
+            logging.info(f"[OCR:BLOQUE] {pdf.name}: {e}")
+            res = pdf
+        with self._lock:
+            self._hechos[clave] = None if res == pdf else res
+            self._en_curso.pop(clave, None)
+        evento.set()
+        return res
+
+
+_OCR_BLOQUES = _CacheOcrBloques()
+
+
+_EXT_IMAGEN = {".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp"}
+
+
+def _origen_por_extension(pth: Path) -> str:
+    """Procedencia de un archivo que hay que convertir a PDF: "imagen" u "oficina"."""
+    return "imagen" if Path(pth).suffix.lower() in _EXT_IMAGEN else "oficina"
+
+
+def _ocr_bloque(pdf: Path, origen: str | None = None) -> Path:
+    """
+    OCR de un bloque durante la ingesta, decidido por procedencia:
+      - "chromium" (operaciones/libro impresos) y "oficina": texto nativo, nunca OCR
+      - "imagen" (convertida con _imagen_a_pdf_fast): siempre OCR
+      - resto (adjuntos e informes descargados): solo si alguna pagina no
+        tiene texto de cuerpo segun el analisis del documento
+    Devuelve el PDF con capa de texto, o el mismo si no hizo falta o fallo.
+    """
+    mode = (os.getenv("OCR_MODE", "auto") or "").lower() or "auto"
+    if mode == "off" or origen in ("chromium", "oficina"):
+        return pdf
+    if origen != "imagen" and mode == "auto":
+        analisis = _analizar_pdf(pdf)
+        if analisis is not None:
+            min_chars = int(os.getenv("PAGE_BODY_MIN_CHARS", "80"))
+            if all(_pagina_tiene_cuerpo(p, min_chars=min_chars) for p in analisis["paginas"]):
+                return pdf
+    # una imagen convertida es escaneo en todas sus paginas: no hace falta detectarlas
+    paginas = set(range(_contar_paginas_pdf(pdf))) if origen == "imagen" else None
+    t0 = time.perf_counter()
+    out = _OCR_BLOQUES.obtener(pdf, lambda: _maybe_ocr(pdf, force=True, paginas=paginas))
+    if out != pdf:
+        logging.info(f"[OCR:BLOQUE] {pdf.name} ({origen or 'descarga'}) -> {out.name} en {time.perf_counter() - t0:.1f}s")
+    return out
+
+
+def _finalizar_artefacto(raw: Path, validar_permiso: bool = True, limpiar_blancos: bool = True,
+                         ocr: bool = False, origen: str | None = None) -> Path | None:
+    """
+    Lleva un archivo crudo (descarga o render) a PDF listo para fusionar:
+    conversion -> validacion -> (permisos) -> limpieza de blancos -> (OCR).
+    No toca el navegador, por eso puede correr en el pool de ingesta.
+    `origen` es la procedencia del bloque ("chromium", "imagen", ...); si no
+    se indica y hay que convertir, se deduce de la extension.
+    Devuelve None si el archivo debe descartarse.
+    """
+    try:
+        pth = Path(raw)
+        if not pth.exists():
+            return None
+        if not _is_real_pdf(pth):
+            tipo = _origen_por_extension(pth)
+            origen = origen or tipo
+            t0 = time.perf_counter()
+            with _PERFILES.medir("conversion"):
+                pth = _ensure_pdf_fast(pth)
+            _METRICAS.inc("conversiones_total", tipo=tipo, ext=Path(raw).suffix.lower().lstrip(".") or "-")
+            _METRICAS.observar("conversion_segundos", time.perf_counter() - t0, tipo=tipo)
+        if not pth or not pth.exists() or not _is_real_pdf(pth):
+            logging.info(f"[PIPE] {Path(raw).name}: descartado; no es PDF valido tras conversion")
+            return None
+        if validar_permiso and _pdf_contiene_mensaje_permiso(pth):
+            logging.info(f"[PIPE] {pth.name}: descartado; contiene mensaje de permisos")
+            try:
+                pth.unlink()
+            except Exception:
+                pass
+            return None
+        if limpiar_blancos:
+            try:
+                with _PERFILES.medir("blancos"):
+                    pth = _pdf_sin_blancos(pth)
+            except Exception:
+                pass
+        if not pth or not Path(pth).exists():
+            return None
+        if ocr:
+            with _PERFILES.medir("ocr"):
+                pth = _ocr_bloque(Path(pth), origen)
+        return Path(pth)
+    except Exception as e:
+        logging.info(f"[PIPE:ERR] {Path(raw).name}: {e}")
+        return None
+
+
+class _PipelineIngesta:
+    """
+    Pool acotado para el trabajo de CPU (conversion, validacion, blancos, OCR).
+    El hilo de Playwright solo produce archivos crudos y encola; si hay
+    demasiados pendientes, `submit` bloquea hasta que se libere un cupo.
+    """
+
+    def __init__(self, max_workers: int | None = None, max_pendientes: int | None = None):
+        try:
+            env_workers = int(os.getenv("PIPELINE_WORKERS", "0") or "0")
+        except Exception:
+            env_workers = 0
+        n = max_workers or env_workers or min(4, max(1, (os.cpu_count() or 2) - 1))
+        self.workers = n
+        self._pool = ThreadPoolExecutor(max_workers=n, thread_name_prefix="ingesta")
+        self._cupos = threading.BoundedSemaphore(max_pendientes or n * 4)
+        # Trabajos encadenados que llegaron sin cupo: los lanza quien libere uno
+        # (nunca se bloquea dentro de un callback de future).
+        self._espera: list[tuple] = []
+        self._espera_lock = threading.Lock()
+
+    def _liberar(self, _f=None):
+        with self._espera_lock:
+            sig = self._espera.pop(0) if self._espera else None
+            if sig is None:
+                self._cupos.release()
+        if sig is not None:
+            self._lanzar(*sig)  # hereda el cupo recien liberado
+
+    @staticmethod
+    def _copiar(g, final):
+        if g.exception() is not None:
+            final.set_exception(g.exception())
+        else:
+            final.set_result(g.result())
+
+    def _lanzar(self, fn, args, kwargs, final):
+        try:
+            fut = self._pool.submit(fn, *args, **kwargs)
+        except Exception as e:
+            self._liberar()
+            final.set_exception(e)
+            return
+        fut.add_done_callback(self._liberar)
+        fut.add_done_callback(lambda g: self._copiar(g, final))
+
+    def submit(self, fn, *args, **kwargs):
+        self._cupos.acquire()
         try:
-            pm = pg.get_pixmap(dpi=36)
-            sample = memoryview(pm.samples)[::8]
-            white_count = sum(1 for b in sample if b == 255)
-            ratio = white_count / len(sample) if len(sample) else 0.0
+            fut = self._pool.submit(fn, *args, **kwargs)
         except Exception:
-            ratio = 0.0
+            self._liberar()
+            raise
+        fut.add_done_callback(self._liberar)
+        return fut
+
+    def _submit_sin_bloquear(self, final, fn, *args, **kwargs):
+        """Como `submit`, pero si no hay cupo deja el trabajo en espera y vuelve; resuelve `final`."""
+        with self._espera_lock:
+            libre = self._cupos.acquire(blocking=False)
+            if not libre:
+                self._espera.append((fn, args, kwargs, final))
+        if libre:
+            self._lanzar(fn, args, kwargs, final)
+        return final
+
+    def encadenar(self, origen, fn, **kwargs):
+        """
+        Future que corre `fn(resultado)` en el pool recien cuando `origen`
+        (p.ej. un render en curso) termina; no ocupa un worker esperando.
+        """
+        from concurrent.futures import Future
+
+        final = Future()
+
+        def _seguir(f):
+            try:
+                res = f.result()
+            except Exception as e:
+                final.set_exception(e)
+                return
+            if not res:
+                final.set_result(None)
+                return
+            # Corre en el hilo que completa `origen` (el loop de Playwright): no bloquear.
+            self._submit_sin_bloquear(final, fn, res, **kwargs)
 
-        is_blank = (not txt) and (len(imgs) == 0) and (len(draws) == 0) and (ratio >= thresh)
-        if not is_blank:
-            out.insert_pdf(doc, from_page=i, to_page=i)
+        origen.add_done_callback(_seguir)
+        return final
 
-    if out.page_count == 0:
-        doc.close()
-        out.close()
-        return pdf_path
+    def close(self, wait: bool = True, cancelar: bool = False):
+        """Apaga el pool; con `cancelar` descarta lo que todavia no arranco (corrida fallida)."""
+        if cancelar:
+            with self._espera_lock:
+                espera, self._espera = self._espera, []
+            for _fn, _args, _kwargs, final in espera:
+                final.cancel()
+        try:
+            self._pool.shutdown(wait=wait, cancel_futures=cancelar)
+        except Exception:
+            pass
 
-    cleaned = pdf_path.with_suffix(".clean.pdf")
-    out.save(str(cleaned), deflate=True, garbage=3)
-    doc.close()
-    out.close()
-    try:
-        pdf_path.unlink(missing_ok=True)
-    except Exception:
-        pass
-    return cleaned
 
 def _agregar_fojas(pdf_in: Path, start_after: int = 1, cada_dos: bool = True,
-                   numero_inicial: int = 1, fijo: str | None = None) -> Path:
+                   numero_inicial: int = 1, fijo: str | None = None, mapa: dict | None = None) -> Path:
     """
     Estampa numeraciÃƒÂ³n de fojas (arriba-derecha) en el PDF:
       - start_after: pÃƒÂ¡ginas iniciales SIN numerar (1 = dejar carÃƒÂ¡tula sin nÃƒÂºmero)
       - cada_dos: si True, numera sÃƒÂ³lo una de cada dos pÃƒÂ¡ginas (recto)
       - numero_inicial: valor inicial (1 por defecto)
       - fijo: texto fijo (si querÃƒÂ©s que siempre diga p.ej. "1")
+      - mapa: roles de pÃƒÂ¡gina de la fusiÃƒÂ³n; las del ÃƒÂ­ndice salen de ahÃƒÂ­
+        en vez de buscar "indice" en el texto de cada pÃƒÂ¡gina
     """
+    indice = _rango_mapa(mapa, "indice")
+
+    def _es_indice(i: int, extraer) -> bool:
+        if mapa is not None:
+            return i in indice
+        try:
+            import unicodedata
+
+            text_norm = unicodedata.normalize("NFKD", extraer() or "")
+            return "indice" in text_norm.encode("ascii", "ignore").decode("ascii").lower()
+        except Exception:
+            return False
+
     try:
         import fitz  # PyMuPDF (rÃƒÂ¡pido)
-        import unicodedata
 
         doc = fitz.open(str(pdf_in))
         folio = numero_inicial
         for i in range(doc.page_count):
             pg = doc[i]
             # Evitar foliar pÃƒÂ¡ginas que correspondan al ÃƒÂ­ndice
-            try:
-                raw_text = pg.get_text("text") or ""
-                text_norm = unicodedata.normalize("NFKD", raw_text)
-                text_norm = text_norm.encode("ascii", "ignore").decode("ascii").lower()
-                if "indice" in text_norm:
-                    continue
-            except Exception:
-                pass
+            if _es_indice(i, lambda: pg.get_text("text")):
+                continue
             if i <= (start_after - 1):
                 continue
             if cada_dos and ((i - start_after) % 2 == 1):
@@ -7153,18 +9453,10 @@ def _agregar_fojas(pdf_in: Path, start_after: int = 1, cada_dos: bool = True,
         folio = numero_inicial
         temps = []
         from reportlab.pdfbase import pdfmetrics
-        import unicodedata
         for i, p in enumerate(r.pages):
             pw = float(p.mediabox.width)
             ph = float(p.mediabox.height)
-            try:
-                raw_text = p.extract_text() or ""
-                text_norm = unicodedata.normalize("NFKD", raw_text)
-                text_norm = text_norm.encode("ascii", "ignore").decode("ascii").lower()
-                is_index = "indice" in text_norm
-            except Exception:
-                is_index = False
-            if is_index:
+            if _es_indice(i, p.extract_text):
                 w.add_page(p)
                 continue
             if i >= start_after and (not cada_dos or ((i - start_after) % 2 == 0)):
@@ -7193,12 +9485,20 @@ def _agregar_fojas(pdf_in: Path, start_after: int = 1, cada_dos: bool = True,
         return pdf_in
 
 
-def _agregar_numeracion_paginas(pdf_in: Path, numero_inicial: int = 1) -> Path:
+def _agregar_numeracion_paginas(pdf_in: Path, numero_inicial: int = 1, mapa: dict | None = None) -> Path:
+    """
+    Estampa el numero de pagina fisico abajo a la derecha. Con el mapa de la
+    fusion la caratula y el indice no se estampan (la numeracion no cambia:
+    sigue coincidiendo con la que muestra el indice).
+    """
+    sin_numero = set(_rango_mapa(mapa, "caratula")) | set(_rango_mapa(mapa, "indice"))
     try:
         import fitz
 
         doc = fitz.open(str(pdf_in))
         for i in range(doc.page_count):
+            if i in sin_numero:
+                continue
             pg = doc[i]
             try:
                 sz = max(10, min(14, pg.rect.height * 0.015))
@@ -7230,6 +9530,9 @@ def _agregar_numeracion_paginas(pdf_in: Path, numero_inicial: int = 1) -> Path:
         temps = []
         from reportlab.pdfbase import pdfmetrics
         for i, p in enumerate(r.pages):
+            if i in sin_numero:
+                w.add_page(p)
+                continue
             pw = float(p.mediabox.width)
             ph = float(p.mediabox.height)
             tmp = Path(tempfile.mkstemp(suffix=".pagina.pdf")[1])
@@ -7347,7 +9650,10 @@ def _cargar_timeline_descarga_completa(
     hp,
     push_pdf,
     mf,
+    engine: "_AsyncPrintEngine | None" = None,
 ):
+    # push_pdf acepta archivos crudos: conversion, validacion y blancos corren
+    # en el pool de ingesta mientras este hilo sigue manejando el navegador.
     if incluir_adjuntos:
         etapa("Descargando adjuntos desde Radiografia")
         try:
@@ -7370,19 +9676,20 @@ def _cargar_timeline_descarga_completa(
         except Exception:
             pass
         pdfs_op.extend(pdfs_grid.get(op_id, []))
-        for ap in pdfs_op:
-            pth = (
-                ap
-                if ap.suffix.lower() == ".pdf"
-                else (_ensure_pdf_fast(ap) if "_ensure_pdf_fast" in globals() else _ensure_pdf(ap))
-            )
-            if not pth or not pth.exists() or pth.suffix.lower() != ".pdf":
+        for pth in pdfs_op:
+            if not pth or not pth.exists():
                 continue
             mf(f"ADJUNTO · {titulo} · {pth.name}")
             hdr = (f"ADJUNTO - {titulo}") if stamp else None
-            push_pdf(pth, hdr, fecha=fecha_op, toc_title=f"ADJUNTO - {titulo}")
+            push_pdf(pth, hdr, fecha=fecha_op, toc_title=f"ADJUNTO - {titulo}", validar_permiso=True)
 
     op_pdfs_capturados = 0
+    renders_async = []
+    lote = _LoteImpresion(temp_dir, hp=hp, engine=engine)
+    if lote.tam <= 1 or (hp is None and engine is None):
+        lote = None
+    else:
+        logging.info(f"[LOTE] Impresion por lotes · {lote.tam} operaciones por PDF")
     etapa("Capturando operaciones visibles del Libro")
     for o in ops:
         op_id = o["id"]
@@ -7400,6 +9707,37 @@ def _cargar_timeline_descarga_completa(
             _agregar_adjuntos_de_op(op_id, titulo, fecha_op)
             continue
 
+        if lote is not None:
+            try:
+                partes = _partes_impresion_operacion(libro, op_id)
+            except Exception as e:
+                logging.info(f"[OP:ERR] {op_id}: {e}")
+                partes = None
+            if partes:
+                fut_op = lote.agregar(op_id, partes)
+                mf(f"OPERACION · {titulo} · op_{op_id}.pdf (lote)")
+                push_pdf(fut_op, None, fecha=fecha_op, toc_title=f"OPERACION - {titulo}")
+                renders_async.append(fut_op)
+            else:
+                logging.info(f"[OP] {op_id}: no se pudo capturar HTML (se continúa con adjuntos).")
+            _agregar_adjuntos_de_op(op_id, titulo, fecha_op)
+            continue
+
+        if engine is not None:
+            try:
+                fut_op = _render_operacion_a_pdf_async(libro, op_id, temp_dir, engine)
+            except Exception as e:
+                logging.info(f"[OP:ASYNC:ERR] {op_id}: {e}")
+                fut_op = None
+            if fut_op is not None:
+                mf(f"OPERACION · {titulo} · op_{op_id}.pdf (async)")
+                push_pdf(fut_op, None, fecha=fecha_op, toc_title=f"OPERACION - {titulo}")
+                renders_async.append(fut_op)
+            else:
+                logging.info(f"[OP] {op_id}: no se pudo capturar HTML (se continúa con adjuntos).")
+            _agregar_adjuntos_de_op(op_id, titulo, fecha_op)
+            continue
+
         try:
             pdf_op = _render_operacion_a_pdf_paginas(libro, op_id, context, p, temp_dir, hctx=hctx, hp=hp)
         except Exception as e:
@@ -7408,7 +9746,7 @@ def _cargar_timeline_descarga_completa(
 
         if pdf_op and pdf_op.exists():
             mf(f"OPERACION · {titulo} · {pdf_op.name}")
-            push_pdf(pdf_op, None, fecha=fecha_op, toc_title=f"OPERACION - {titulo}")
+            push_pdf(pdf_op, None, fecha=fecha_op, toc_title=f"OPERACION - {titulo}", origen="chromium")
             op_pdfs_capturados += 1
             logging.info(f"[OP] {op_id}: agregado (renderer de páginas)")
         else:
@@ -7423,36 +9761,36 @@ def _cargar_timeline_descarga_completa(
         pass
     informes_tecnicos = _descargar_informes_tecnicos(sac, temp_dir)
     logging.info(f"[INF] Informes técnicos descargados: {len(informes_tecnicos)}")
-    for it_path, it_fecha in informes_tecnicos:
-        pth = (
-            it_path
-            if it_path.suffix.lower() == ".pdf"
-            else (_ensure_pdf_fast(it_path) if "_ensure_pdf_fast" in globals() else _ensure_pdf(it_path))
-        )
-        if not pth or not pth.exists() or pth.suffix.lower() != ".pdf":
+    for pth, it_fecha in informes_tecnicos:
+        if not pth or not pth.exists():
             continue
         mf(f"INF_TEC · {it_fecha} · {pth.name}")
         hdr = (f"INFORME TECNICO · {it_fecha}") if stamp else None
         toc_it = f"INFORME TECNICO MPF - {it_fecha}" if it_fecha else "INFORME TECNICO MPF"
         push_pdf(pth, hdr, fecha=it_fecha, toc_title=toc_it)
 
-        if incluir_adjuntos:
+        if incluir_adjuntos and pth.suffix.lower() == ".pdf":
             try:
                 anexos = _extraer_adjuntos_embebidos(pth, temp_dir) if "_extraer_adjuntos_embebidos" in globals() else []
             except Exception:
                 anexos = []
             for an in anexos:
-                an = Path(an)
-                an_pdf = (
-                    an if an.suffix.lower() == ".pdf"
-                    else (_ensure_pdf_fast(an) if "_ensure_pdf_fast" in globals() else _ensure_pdf(an))
-                )
-                if not an_pdf or not Path(an_pdf).exists() or Path(an_pdf).suffix.lower() != ".pdf":
+                an_pdf = Path(an)
+                if not an_pdf.exists():
                     continue
-                mf(f"INF_TEC/ANEXO · {it_fecha} · {Path(an_pdf).name}")
+                mf(f"INF_TEC/ANEXO · {it_fecha} · {an_pdf.name}")
                 hdr_an = (f"INFORME TECNICO - ANEXO - {it_fecha}") if stamp else None
                 toc_an = f"INFORME TECNICO MPF - ANEXO - {it_fecha}" if it_fecha else "INFORME TECNICO MPF - ANEXO"
-                push_pdf(Path(an_pdf), hdr_an, fecha=it_fecha, toc_title=toc_an)
+                push_pdf(an_pdf, hdr_an, fecha=it_fecha, toc_title=toc_an)
+
+    if lote is not None:
+        lote.vaciar()
+    for fut_op in renders_async:
+        try:
+            if fut_op.result(180):
+                op_pdfs_capturados += 1
+        except Exception:
+            pass
 
     if op_pdfs_capturados == 0:
         logging.info("[FALLBACK] Ninguna operación pudo renderizarse; intento PDF del Libro.")
@@ -7462,12 +9800,8 @@ def _cargar_timeline_descarga_completa(
             if html_snap and html_snap.exists():
                 libro_pdf = _convertir_html_a_pdf(html_snap, context, p, temp_dir)
         if libro_pdf and libro_pdf.exists() and libro_pdf.stat().st_size > 1024:
-            try:
-                libro_pdf = _pdf_sin_blancos(libro_pdf)
-            except Exception:
-                pass
             mf(f"LIBRO · {libro_pdf.name}")
-            push_pdf(libro_pdf, None, fecha=None, toc_title="LIBRO")
+            push_pdf(libro_pdf, None, fecha=None, toc_title="LIBRO", origen="chromium")
         else:
             logging.info("[FALLBACK] No se pudo obtener PDF del Libro por ningún método.")
 
@@ -7483,13 +9817,8 @@ def _cargar_timeline_descarga_completa(
         logging.exception("[RNR] Traceback de descarga RNR")
         informes_rnr = []
     logging.info(f"[RNR] Informes RNR descargados: {len(informes_rnr)}")
-    for rnr_path, rnr_fecha in informes_rnr:
-        pth = (
-            rnr_path
-            if rnr_path.suffix.lower() == ".pdf"
-            else (_ensure_pdf_fast(rnr_path) if "_ensure_pdf_fast" in globals() else _ensure_pdf(rnr_path))
-        )
-        if not pth or not pth.exists() or pth.suffix.lower() != ".pdf":
+    for pth, rnr_fecha in informes_rnr:
+        if not pth or not pth.exists():
             continue
         mf(f"RNR - {rnr_fecha or '-'} - {pth.name}")
         hdr = (f"INFORME RNR - {rnr_fecha}") if stamp and rnr_fecha else ("INFORME RNR" if stamp else None)
@@ -7500,13 +9829,8 @@ def _cargar_timeline_descarga_completa(
         adj_sin = pdfs_grid.get("__SIN_OP__", [])
         if adj_sin:
             logging.info(f"[ADJ] SIN_OP · {len(adj_sin)} archivo(s)")
-            for pdf in adj_sin:
-                pth = (
-                    pdf
-                    if pdf.suffix.lower() == ".pdf"
-                    else (_ensure_pdf_fast(pdf) if "_ensure_pdf_fast" in globals() else _ensure_pdf(pdf))
-                )
-                if not pth or not pth.exists() or pth.suffix.lower() != ".pdf":
+            for pth in adj_sin:
+                if not pth or not pth.exists():
                     continue
                 mf(f"ADJUNTO · (sin operación) · {pth.name}")
                 hdr = ("ADJUNTO · (sin operación)") if stamp else None
@@ -7564,6 +9888,69 @@ def _render_pdf_preview_png(pdf_path: Path, png_path: Path) -> tuple[Path | None
             pass
 
 
+# Prioridades de la cola de previews: el click del usuario siempre pasa adelante
+# de la precarga (vecinos de la fila elegida y filas visibles de la grilla).
+_PREVIEW_PRIO_CLICK = 0
+_PREVIEW_PRIO_VECINO = 1
+_PREVIEW_PRIO_VISIBLE = 2
+_PREVIEW_PRIO_FIN = 9
+
+
+def _nueva_sesion_preview() -> dict:
+    return {
+        "done": threading.Event(),
+        "result": None,
+        "preview_request_q": queue.PriorityQueue(),
+        "preview_response_q": queue.Queue(),
+        "preview_cache": {},
+        "prefetch_gen": 0,
+        "on_preview": None,
+        "_seq": itertools.count(),
+    }
+
+
+def _pedir_preview(session: dict, uid: str, prioridad: int = _PREVIEW_PRIO_CLICK, force: bool = False) -> bool:
+    req = {
+        "action": "preview",
+        "uid": uid,
+        "force": bool(force),
+        "prio": int(prioridad),
+        "gen": session.get("prefetch_gen", 0),
+    }
+    q = session.get("preview_request_q")
+    if q is None:
+        return False
+    if isinstance(q, queue.PriorityQueue):
+        seq = session.setdefault("_seq", itertools.count())
+        q.put_nowait((int(prioridad), next(seq), req))
+    else:
+        q.put_nowait(req)
+    return True
+
+
+def _entregar_preview(session: dict, resp: dict):
+    session["preview_response_q"].put(resp)
+    cb = session.get("on_preview")
+    if cb:
+        try:
+            cb(resp)
+        except Exception:
+            pass
+
+
+def _cerrar_sesion_preview(session: dict):
+    session["on_preview"] = None
+    try:
+        session["done"].set()
+    except Exception:
+        pass
+    # Despierta al worker si está bloqueado esperando pedidos.
+    try:
+        _pedir_preview(session, "", _PREVIEW_PRIO_FIN)
+    except Exception:
+        pass
+
+
 def _generar_preview_real_radiografia(
     item: dict,
     sac,
@@ -7576,6 +9963,7 @@ def _generar_preview_real_radiografia(
     p,
     hctx=None,
     hp=None,
+    render_cache: _CacheRendersOperacion | None = None,
 ) -> dict[str, object]:
     uid = str(item.get("uid") or "")
     kind = str(item.get("kind") or "")
@@ -7607,7 +9995,9 @@ def _generar_preview_real_radiografia(
                 cont = None
             if not cont:
                 return _resp_error("No pude abrir la operación para generar su vista previa real.")
-            pdf_path = _render_operacion_a_pdf_paginas(libro, op_id, context, p, preview_dir, hctx=hctx, hp=hp)
+            pdf_path = _render_operacion_a_pdf_paginas(
+                libro, op_id, context, p, preview_dir, hctx=hctx, hp=hp, cache=render_cache
+            )
         else:
             return _resp_error("La vista previa real sólo está disponible para operaciones.")
 
@@ -7654,7 +10044,10 @@ def _crear_contexto_headless_reutilizable(context, p, temp_dir: Path, chromium_a
         hctx = hbrowser.new_context(
             storage_state=str(state_print),
             viewport={"width": 900, "height": 1200},
+            **_HAR.opciones_contexto(),
         )
+        _ASSET_CACHE.instalar(hctx)
+        _HAR.instalar(hctx)
         hp = hctx.new_page()
         try:
             hp.emulate_media(media="print")
@@ -7695,6 +10088,7 @@ def _cargar_timeline_radiografia_custom(
     hp,
     push_pdf,
     mf,
+    render_cache: _CacheRendersOperacion | None = None,
 ):
     seleccionados_por_tipo = {
         "operacion": sum(1 for item in plan_items if item.get("kind") == "operacion"),
@@ -7754,6 +10148,7 @@ def _cargar_timeline_radiografia_custom(
             logging.info(f"[RADIOPLAN] {tipo_label}: faltan {len(faltan)} item(s); reintento selectivo")
         except Exception:
             pass
+        _METRICAS.inc("reintentos_total", len(faltan), tipo=tipo_label)
         try:
             sac.bring_to_front()
         except Exception:
@@ -7850,10 +10245,11 @@ def _cargar_timeline_radiografia_custom(
 
     orden_idx = 0
 
-    def _push_ordenado(pth: Path, hdr: str | None, toc_title: str | None):
+    def _push_ordenado(pth: Path, hdr: str | None, toc_title: str | None, origen: str | None = None,
+                       validar_permiso: bool = False):
         nonlocal orden_idx
         fecha_orden = (datetime.date(1900, 1, 1) + datetime.timedelta(days=orden_idx)).strftime("%d/%m/%Y")
-        if push_pdf(pth, hdr, fecha=fecha_orden, toc_title=toc_title):
+        if push_pdf(pth, hdr, fecha=fecha_orden, toc_title=toc_title, origen=origen, validar_permiso=validar_permiso):
             orden_idx += 1
             return True
         return False
@@ -7863,6 +10259,7 @@ def _cargar_timeline_radiografia_custom(
         _rehidratar_libro()
 
     etapa("Capturando contenido seleccionado en Radiografia del expediente")
+    hits_previos = render_cache.hits if render_cache is not None else 0
     for item in plan_items:
         kind = item.get("kind")
         titulo = (item.get("titulo") or "").strip()
@@ -7894,7 +10291,9 @@ def _cargar_timeline_radiografia_custom(
                 logging.info(f"[RADIOPLAN] Operación {op_id}: contenedor no encontrado")
                 continue
             try:
-                pdf_op = _render_operacion_a_pdf_paginas(libro, op_id, context, p, temp_dir, hctx=hctx, hp=hp)
+                pdf_op = _render_operacion_a_pdf_paginas(
+                    libro, op_id, context, p, temp_dir, hctx=hctx, hp=hp, cache=render_cache
+                )
             except Exception as e:
                 logging.info(f"[RADIOPLAN] Operación {op_id}: error renderizando: {e}")
                 pdf_op = None
@@ -7912,7 +10311,7 @@ def _cargar_timeline_radiografia_custom(
                     logging.info(f"[RADIOPLAN] Operación {op_id}: reintento final fallido: {e}")
             if pdf_op and pdf_op.exists():
                 mf(f"OPERACION · {titulo} · {pdf_op.name}")
-                if _push_ordenado(pdf_op, None, _indice_toc_title_for_item(item)):
+                if _push_ordenado(pdf_op, None, _indice_toc_title_for_item(item), origen="chromium"):
                     agregados_por_tipo["operacion"] += 1
                     agregados_uids["operacion"].add(str(item.get("uid") or ""))
             continue
@@ -7925,7 +10324,7 @@ def _cargar_timeline_radiografia_custom(
             pth = Path(meta["path"])
             mf(f"ADJUNTO · {titulo} · {pth.name}")
             hdr = (f"ADJUNTO - {titulo}") if stamp else None
-            if _push_ordenado(pth, hdr, _indice_toc_title_for_item(item)):
+            if _push_ordenado(pth, hdr, _indice_toc_title_for_item(item), validar_permiso=True):
                 agregados_por_tipo["adjunto"] += 1
                 agregados_uids["adjunto"].add(str(item.get("uid") or ""))
             continue
@@ -7964,6 +10363,8 @@ def _cargar_timeline_radiografia_custom(
             f"rnr={agregados_por_tipo['informe_rnr']}/{seleccionados_por_tipo['informe_rnr']} · "
             f"bloques={orden_idx}"
         )
+        if render_cache is not None and render_cache.hits > hits_previos:
+            logging.info(f"[RADIOPLAN] Operaciones reutilizadas desde la vista previa: {render_cache.hits - hits_previos}")
     except Exception:
         pass
 
@@ -7991,6 +10392,184 @@ def _cargar_timeline_radiografia_custom(
         )
 
 
+# ----------------------- INDICE DE TEXTO (FTS5) --------------------------
+def _ruta_indice_fts() -> Path:
+    raw = (os.getenv("FTS_INDEX_DB") or "").strip()
+    if raw:
+        return Path(raw)
+    base = Path(os.getenv("LOCALAPPDATA") or Path.home())
+    return base / "expe" / "indice_fts.sqlite"
+
+
+def _abrir_indice_fts(db: Path | None = None):
+    import sqlite3
+
+    db = Path(db) if db else _ruta_indice_fts()
+    db.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(str(db), timeout=30)
+    try:
+        con.execute("PRAGMA journal_mode=WAL")
+    except Exception:
+        pass
+    con.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS documentos(
+            id INTEGER PRIMARY KEY,
+            expediente TEXT NOT NULL,
+            ruta TEXT NOT NULL UNIQUE,
+            mtime REAL,
+            n_paginas INTEGER,
+            indexado TEXT
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS paginas USING fts5(
+            texto,
+            doc_id UNINDEXED,
+            bloque UNINDEXED,
+            pagina UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2'
+        );
+        -- doc_id en paginas es UNINDEXED: borrar por ahi recorre todo el indice.
+        -- Esta tabla guarda los rowid de cada documento para reindexar por rowid.
+        CREATE TABLE IF NOT EXISTS paginas_doc(
+            fila INTEGER PRIMARY KEY,
+            doc_id INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS paginas_doc_por_doc ON paginas_doc(doc_id);
+        """
+    )
+    if con.execute("PRAGMA user_version").fetchone()[0] < 1:
+        # indices previos a paginas_doc: un unico recorrido para completarla
+        with con:
+            con.execute("INSERT OR IGNORE INTO paginas_doc(fila, doc_id) SELECT rowid, doc_id FROM paginas")
+            con.execute("PRAGMA user_version = 1")
+    return con
+
+
+def _bloques_por_pagina(toc_items: list[dict] | None, n_paginas: int, mapa: dict | None = None) -> list[str]:
+    """Titulo del bloque al que pertenece cada pagina (1-based en toc_items['target'], o rangos del mapa)."""
+    if mapa:
+        out = ["CARÁTULA / ÍNDICE"] * n_paginas
+        for b in mapa.get("bloques") or []:
+            for pno in range(int(b["desde"]), min(int(b["hasta"]), n_paginas)):
+                out[pno] = b["titulo"]
+        return out
+    inicios = sorted(
+        (int(it.get("target") or 0), str(it.get("title") or ""))
+        for it in (toc_items or [])
+        if int(it.get("target") or 0) > 0
+    )
+    out: list[str] = []
+    k = -1
+    for pno in range(1, n_paginas + 1):
+        while k + 1 < len(inicios) and inicios[k + 1][0] <= pno:
+            k += 1
+        out.append(inicios[k][1] if k >= 0 else "CARÁTULA / ÍNDICE")
+    return out
+
+
+def indexar_expediente_pdf(pdf: Path, expediente: str, toc_items: list[dict] | None = None, db: Path | None = None,
+                           mapa: dict | None = None) -> int:
+    """
+    Vuelca el texto de cada pagina del PDF final (incluida la capa OCR) al
+    indice FTS5 local, con el bloque del indice al que pertenece (del mapa
+    de la fusion o de toc_items). Si no se pasan se lee el sidecar
+    <pdf>.toc.json (KEEP_TOC=1). Reindexar el mismo archivo reemplaza sus
+    filas. Devuelve las paginas indexadas.
+    """
+    import fitz
+    import json
+
+    pdf = Path(pdf)
+    if toc_items is None and mapa is None:
+        sidecar = pdf.with_suffix(".toc.json")
+        if sidecar.exists():
+            try:
+                datos = json.loads(sidecar.read_text(encoding="utf-8")) or {}
+                toc_items, mapa = datos.get("items") or [], datos.get("mapa")
+            except Exception as e:
+                logging.info(f"[FTS] No pude leer {sidecar.name}: {e}")
+    doc = fitz.open(str(pdf))
+    try:
+        bloques = _bloques_por_pagina(toc_items, doc.page_count, mapa)
+        filas = []
+        for pno in range(doc.page_count):
+            try:
+                txt = doc.load_page(pno).get_text("text") or ""
+            except Exception:
+                txt = ""
+            txt = _norm_ws(txt)
+            if txt:
+                filas.append((txt, bloques[pno], pno + 1))
+        n_paginas = doc.page_count
+    finally:
+        doc.close()
+
+    con = _abrir_indice_fts(db)
+    try:
+        with con:
+            ruta = str(pdf.resolve())
+            fila = con.execute("SELECT id FROM documentos WHERE ruta = ?", (ruta,)).fetchone()
+            if fila:
+                doc_id = fila[0]
+                con.execute("DELETE FROM paginas WHERE rowid IN (SELECT fila FROM paginas_doc WHERE doc_id = ?)", (doc_id,))
+                con.execute("DELETE FROM paginas_doc WHERE doc_id = ?", (doc_id,))
+                con.execute(
+                    "UPDATE documentos SET expediente = ?, mtime = ?, n_paginas = ?, indexado = ? WHERE id = ?",
+                    (str(expediente), pdf.stat().st_mtime, n_paginas, datetime.datetime.now().isoformat(timespec="seconds"), doc_id),
+                )
+            else:
+                doc_id = con.execute(
+                    "INSERT INTO documentos(expediente, ruta, mtime, n_paginas, indexado) VALUES (?, ?, ?, ?, ?)",
+                    (str(expediente), ruta, pdf.stat().st_mtime, n_paginas, datetime.datetime.now().isoformat(timespec="seconds")),
+                ).lastrowid
+            for txt, bloque, pno in filas:
+                fila_id = con.execute(
+                    "INSERT INTO paginas(texto, doc_id, bloque, pagina) VALUES (?, ?, ?, ?)",
+                    (txt, doc_id, bloque, pno),
+                ).lastrowid
+                con.execute("INSERT INTO paginas_doc(fila, doc_id) VALUES (?, ?)", (fila_id, doc_id))
+    finally:
+        con.close()
+    return len(filas)
+
+
+def _consulta_fts(texto: str) -> str:
+    # Cada palabra como frase literal: evita que comillas, guiones o ':' se
+    # interpreten como sintaxis FTS5. Todas las palabras deben aparecer.
+    palabras = re.findall(r"\w+", texto or "", flags=re.UNICODE)
+    return " ".join('"' + p.replace('"', '""') + '"' for p in palabras)
+
+
+def buscar_en_indice(consulta: str, limite: int = 50, db: Path | None = None, crudo: bool = False) -> list[dict]:
+    """
+    Busca en el indice de texto. Devuelve [{'expediente', 'bloque', 'pagina',
+    'ruta', 'fragmento'}] ordenado por relevancia (bm25). Con crudo=True la
+    consulta se pasa tal cual a FTS5 (OR, NEAR, prefijos*).
+    """
+    q = consulta if crudo else _consulta_fts(consulta)
+    if not q.strip():
+        return []
+    con = _abrir_indice_fts(db)
+    try:
+        rows = con.execute(
+            """
+            SELECT d.expediente, paginas.bloque, paginas.pagina, d.ruta,
+                   snippet(paginas, 0, '[', ']', ' … ', 12)
+            FROM paginas JOIN documentos d ON d.id = paginas.doc_id
+            WHERE paginas MATCH ?
+            ORDER BY bm25(paginas)
+            LIMIT ?
+            """,
+            (q, int(limite)),
+        ).fetchall()
+    finally:
+        con.close()
+    return [
+        {"expediente": r[0], "bloque": r[1], "pagina": int(r[2]), "ruta": r[3], "fragmento": r[4]}
+        for r in rows
+    ]
+
+
 # ----------------------- DESCARGA PRINCIPAL ----------------------------
 def descargar_expediente(
     tele_user,
@@ -8006,11 +10585,25 @@ def descargar_expediente(
     SHOW_BROWSER = _env_true("SHOW_BROWSER", "0")
     CHROMIUM_ARGS = ["--disable-gpu", "--no-sandbox", "--disable-dev-shm-usage"]
     KEEP_WORK = _env_true("KEEP_WORK", "0")
+    _ASSET_CACHE.nueva_corrida()
+    _METRICAS.nueva_corrida()
+    t_corrida = time.perf_counter()
+    exito = False
+    ingesta: "_PipelineIngesta | None" = None
     STAMP = _env_true("STAMP_HEADERS", "1")
     INCLUIR_ADJUNTOS = bool(incluir_adjuntos)
     APLICAR_OCR = bool(aplicar_ocr)
 
+    cred = _HAR.nueva_corrida(
+        nro_exp,
+        carpeta_salida,
+        {"tele_user": tele_user, "tele_pass": tele_pass, "intra_user": intra_user, "intra_pass": intra_pass},
+    )
+    # al reproducir no hay servidor que proteger: sin pausas del planificador al medir
+    _PLANIFICADOR.nueva_corrida(sin_limite=_HAR.modo == "reproducir")
+    tele_user, tele_pass, intra_user, intra_pass = (cred[k] for k in ("tele_user", "tele_pass", "intra_user", "intra_pass"))
     work_dir = Path(carpeta_salida) / f"Exp_{nro_exp}_work"
+    _PERFILES.nueva_corrida(work_dir / "perfil")
     temp_ctx = TemporaryDirectory() if not KEEP_WORK else contextlib.nullcontext(work_dir)
     with temp_ctx as tmp_name:
         temp_dir = Path(tmp_name)
@@ -8039,6 +10632,7 @@ def descargar_expediente(
                 context = browser.new_context(
                     accept_downloads=True,
                     viewport={"width": 1366, "height": 900},
+                    **_HAR.opciones_contexto(),
                 )
                 logging.info("[NAV] Contexto de navegador creado")
             else:
@@ -8051,12 +10645,15 @@ def descargar_expediente(
                         accept_downloads=True,
                         viewport={"width": 1366, "height": 900},
                         record_video_dir=str(vid_dir),
+                        **_HAR.opciones_contexto(),
                     )
                 else:
                     context = browser.new_context(
                         accept_downloads=True,
                         viewport={"width": 1366, "height": 900},
+                        **_HAR.opciones_contexto(),
                     )
+            _HAR.instalar(context)
 
             try:
                 etapa("Ingresando a Teletrabajo/Intranet y abriendo SAC")
@@ -8070,7 +10667,7 @@ def descargar_expediente(
                     sac = _ir_a_radiografia(sac)
 
                 if _page_requires_portal_login(sac):
-                    messagebox.showerror("Error de sesion", "El SAC pidio re-login y no pude recuperar la sesion. Proba nuevamente.")
+                    _avisar_usuario("error", "Error de sesion", "El SAC pidio re-login y no pude recuperar la sesion. Proba nuevamente.")
                     return
 
                 # 2) Buscar expediente
@@ -8078,6 +10675,7 @@ def descargar_expediente(
                 for intento_busqueda in range(2):
                     etapa(f"Buscando expediente Nro {nro_exp} en Radiografia")
                     try:
+                        _instalar_captura_respuestas(sac)
                         _fill_radiografia_y_buscar(sac, nro_exp)
                         logging.info(f"[RADIO] Buscado expediente Nro {nro_exp}")
                         buscado_ok = True
@@ -8089,7 +10687,7 @@ def descargar_expediente(
                             _login_intranet(sac, intra_user, intra_pass)
                             sac = _ir_a_radiografia(sac)
                             if _page_requires_portal_login(sac):
-                                messagebox.showerror("Error de sesion", "El SAC volvio a pedir login al buscar el expediente. Proba nuevamente.")
+                                _avisar_usuario("error", "Error de sesion", "El SAC volvio a pedir login al buscar el expediente. Proba nuevamente.")
                                 return
                             continue
                         if motivo == "RADIO_PAGE_CLOSED" and intento_busqueda == 0:
@@ -8127,7 +10725,7 @@ def descargar_expediente(
                     # 1) Si alguna operaciÃƒÂ³n probada estÃƒÂ¡ denegada ? abortar
                     if any(_op_denegada_en_radiografia(sac, _id) for _id in ids_a_probar):
                         logging.info("[SEC] RadiografÃƒÂ­a mostrÃƒÂ³ 'sin permisos' en al menos una operaciÃƒÂ³n. Abortando.")
-                        messagebox.showwarning(
+                        _avisar_usuario("warning", 
                             "Sin acceso",
                             "No tenÃƒÂ©s permisos para visualizar el contenido de este expediente "
                             "(al menos una operaciÃƒÂ³n estÃƒÂ¡ bloqueada). No se descargarÃƒÂ¡ nada.",
@@ -8140,7 +10738,7 @@ def descargar_expediente(
     
                 if not acceso_ok:
                     logging.info("[SEC] No hay acceso real al contenido de las operaciones (bloqueando descarga).")
-                    messagebox.showwarning(
+                    _avisar_usuario("warning", 
                         "Sin acceso",
                         "No tenÃƒÂ©s permisos para visualizar el contenido del expediente (operaciones bloqueadas). "
                         "No se descargarÃƒÂ¡ nada.",
@@ -8155,12 +10753,25 @@ def descargar_expediente(
                 ya_agregados: set[tuple[str, int]] = set()
                 caratula_block: tuple[Path, str | None] | None = None
     
-                def _push_pdf(pth: Path, hdr: str | None, fecha: str | None, toc_title: str | None = None):
-                    if not pth or not pth.exists() or pth.suffix.lower() != ".pdf":
+                ingesta = _PipelineIngesta()
+                logging.info(f"[PIPE] Pool de ingesta · workers={ingesta.workers}")
+
+                def _push_pdf(pth: Path, hdr: str | None, fecha: str | None, toc_title: str | None = None,
+                              origen: str | None = None, validar_permiso: bool = False):
+                    if hasattr(pth, "result"):
+                        # Render en curso (motor async o lote): se finaliza cuando termine.
+                        # Lo imprime Chromium, asi que no necesita OCR.
+                        fut = ingesta.encadenar(pth, _finalizar_artefacto, validar_permiso=False, origen="chromium")
+                        timeline[(fecha or "__NOFECHA__")].append((fut, hdr, toc_title, "chromium"))
+                        if fecha and fecha not in orden_fechas:
+                            orden_fechas.append(fecha)
+                        return True
+                    if not pth or not Path(pth).exists():
                         return False
-                    if not _is_real_pdf(Path(pth)):
+                    pth = Path(pth)
+                    if pth.suffix.lower() == ".pdf" and not _is_real_pdf(pth):
                         try:
-                            logging.info(f"[MERGE:SKIP] {Path(pth).name} no es un PDF valido")
+                            logging.info(f"[MERGE:SKIP] {pth.name} no es un PDF valido")
                         except Exception:
                             pass
                         return False
@@ -8171,20 +10782,40 @@ def descargar_expediente(
                     if key in ya_agregados:
                         return False
                     ya_agregados.add(key)
-    
-                    # Limpieza de pÃƒÂ¡ginas en blanco (best-effort)
-                    try:
-                        pth = _pdf_sin_blancos(pth)
-                    except Exception:
-                        pass
-                    if not pth or not Path(pth).exists():
-                        return False
-     
-                    timeline[(fecha or "__NOFECHA__")].append((pth, hdr, toc_title))
+
+                    # Conversion + limpieza de blancos (+ OCR segun procedencia) en el pool
+                    # de ingesta; el lugar en el timeline queda reservado ya para conservar el orden.
+                    fut = ingesta.submit(_finalizar_artefacto, pth, validar_permiso=validar_permiso,
+                                         ocr=APLICAR_OCR, origen=origen)
+                    # procedencia para el mapa de paginas de la fusion
+                    if not origen:
+                        origen = "descarga" if _is_real_pdf(pth) else _origen_por_extension(pth)
+                    timeline[(fecha or "__NOFECHA__")].append((fut, hdr, toc_title, origen))
                     if fecha and fecha not in orden_fechas:
                         orden_fechas.append(fecha)
                     return True
-    
+
+                def _resolver_timeline():
+                    descartados = 0
+                    for k in list(timeline.keys()):
+                        resueltos = []
+                        for blk, hdr, toc_title, origen in timeline[k]:
+                            try:
+                                pth = blk.result() if hasattr(blk, "result") else blk
+                            except Exception as e:
+                                logging.info(f"[PIPE:ERR] {toc_title or '-'}: {e}")
+                                pth = None
+                            if pth and Path(pth).exists():
+                                # Un bloque se cuenta una sola vez, al entrar al timeline de la fusion.
+                                _METRICAS.inc("bloques_ingeridos_total", origen=origen)
+                                _METRICAS.inc("bloques_ingeridos_bytes_total", Path(pth).stat().st_size, origen=origen)
+                                resueltos.append((Path(pth), hdr, toc_title, None if k == "__NOFECHA__" else k, origen))
+                            else:
+                                descartados += 1
+                        timeline[k] = resueltos
+                    ingesta.close()
+                    logging.info(f"[PIPE] Timeline resuelto · descartados={descartados}")
+
                 # 3) Abrir Libro y listar operaciones VISIBLES (sin forzar)
                 etapa("Abriendo vista 'Expediente como Libro'")
                 libro = _abrir_libro(sac, intra_user, intra_pass, nro_exp)
@@ -8224,6 +10855,7 @@ def descargar_expediente(
                     ops = []
                 logging.info(f"[OPS] Encontradas {len(ops)} operaciones visibles en el ÃƒÂ­ndice.")
                 radiografia_plan = None
+                render_cache = _CacheRendersOperacion()
                 if radiografia_selector:
                     etapa("Preparando radiografia del expediente")
                     op_title_map = {
@@ -8261,13 +10893,7 @@ def descargar_expediente(
                         informes_rnr_meta,
                     )
                     etapa("Radiografia del expediente: seleccionando contenido y orden")
-                    preview_state = {
-                        "done": threading.Event(),
-                        "result": None,
-                        "preview_request_q": queue.Queue(),
-                        "preview_response_q": queue.Queue(),
-                        "preview_cache": {},
-                    }
+                    preview_state = _nueva_sesion_preview()
                     selector_state = radiografia_selector(radiografia_items, preview_state)
                     if isinstance(selector_state, dict) and hasattr(selector_state.get("done"), "is_set"):
                         preview_state = selector_state
@@ -8281,46 +10907,58 @@ def descargar_expediente(
                                 preview_dir,
                                 CHROMIUM_ARGS,
                             )
-                            while not preview_state["done"].wait(0.12):
+                            items_by_uid = {str(it.get("uid") or ""): it for it in radiografia_items}
+                            req_q = preview_state["preview_request_q"]
+                            n_prefetch = 0
+                            while not preview_state["done"].is_set():
                                 try:
-                                    while True:
-                                        req = preview_state["preview_request_q"].get_nowait()
-                                        if (req or {}).get("action") != "preview":
-                                            continue
-                                        uid_req = str(req.get("uid") or "")
-                                        force_req = bool(req.get("force"))
-                                        if not uid_req:
-                                            continue
-                                        cached = preview_state["preview_cache"].get(uid_req)
-                                        if force_req:
-                                            preview_state["preview_cache"].pop(uid_req, None)
-                                            cached = None
-                                        if not cached:
-                                            item_req = next((it for it in radiografia_items if str(it.get("uid") or "") == uid_req), None)
-                                            if item_req:
-                                                cached = _generar_preview_real_radiografia(
-                                                    item_req,
-                                                    sac,
-                                                    libro,
-                                                    preview_dir,
-                                                    ops_by_id,
-                                                    op_fecha_map,
-                                                    op_title_map,
-                                                    context,
-                                                    p,
-                                                    hctx=preview_hctx,
-                                                    hp=preview_hp,
-                                                )
-                                            else:
-                                                cached = {
-                                                    "uid": uid_req,
-                                                    "ok": False,
-                                                    "message": "El item ya no está disponible para generar preview.",
-                                                }
-                                            preview_state["preview_cache"][uid_req] = cached
-                                        preview_state["preview_response_q"].put(cached)
+                                    entrada = req_q.get(timeout=1.0)
                                 except queue.Empty:
-                                    pass
+                                    continue
+                                req = entrada[-1] if isinstance(entrada, tuple) else entrada
+                                if (req or {}).get("action") != "preview":
+                                    continue
+                                uid_req = str(req.get("uid") or "")
+                                force_req = bool(req.get("force"))
+                                if not uid_req:
+                                    continue
+                                prio_req = int(req.get("prio") or _PREVIEW_PRIO_CLICK)
+                                # Una precarga pedida para una selección anterior ya no interesa.
+                                if prio_req > _PREVIEW_PRIO_CLICK and req.get("gen") != preview_state.get("prefetch_gen"):
+                                    continue
+                                cached = preview_state["preview_cache"].get(uid_req)
+                                if force_req:
+                                    preview_state["preview_cache"].pop(uid_req, None)
+                                    cached = None
+                                if not cached:
+                                    item_req = items_by_uid.get(uid_req)
+                                    if item_req:
+                                        cached = _generar_preview_real_radiografia(
+                                            item_req,
+                                            sac,
+                                            libro,
+                                            preview_dir,
+                                            ops_by_id,
+                                            op_fecha_map,
+                                            op_title_map,
+                                            context,
+                                            p,
+                                            hctx=preview_hctx,
+                                            hp=preview_hp,
+                                            render_cache=render_cache,
+                                        )
+                                    else:
+                                        cached = {
+                                            "uid": uid_req,
+                                            "ok": False,
+                                            "message": "El item ya no está disponible para generar preview.",
+                                        }
+                                    preview_state["preview_cache"][uid_req] = cached
+                                    if prio_req > _PREVIEW_PRIO_CLICK:
+                                        n_prefetch += 1
+                                _entregar_preview(preview_state, cached)
+                            if n_prefetch:
+                                logging.info(f"[RADIOPREVIEW] Previews precargadas en segundo plano: {n_prefetch}")
                         finally:
                             try:
                                 if preview_hp:
@@ -8374,8 +11012,11 @@ def descargar_expediente(
                         pass
                     hbrowser = _launch_chromium(p.chromium, headless=True, args=CHROMIUM_ARGS)
                     hctx = hbrowser.new_context(
-                        storage_state=str(state_print), viewport={"width": 900, "height": 1200}
+                        storage_state=str(state_print), viewport={"width": 900, "height": 1200},
+                        **_HAR.opciones_contexto(),
                     )
+                    _ASSET_CACHE.instalar(hctx)
+                    _HAR.instalar(hctx)
                     hp = hctx.new_page()
                     try:
                         hp.emulate_media(media="print")
@@ -8383,6 +11024,17 @@ def descargar_expediente(
                         pass
                 except Exception:
                     hbrowser = hctx = hp = None
+                # Motor async opcional (PW_ENGINE=async): imprime varias operaciones a la vez
+                print_engine = None
+                if _engine_async_habilitado() and radiografia_plan is None:
+                    try:
+                        print_engine = _AsyncPrintEngine(
+                            storage_state=context.storage_state(),
+                            chromium_args=CHROMIUM_ARGS,
+                        )
+                    except Exception as e:
+                        logging.info(f"[PW:ASYNC] No disponible; sigo con el motor sync: {e}")
+                        print_engine = None
                 # 4) CarÃƒÂ¡tula (guardada aparte para que quede primera)
                 etapa("Renderizando carÃƒÂ¡tula del expediente en PDF")
                 try:
@@ -8397,40 +11049,48 @@ def descargar_expediente(
                     logging.info(f"[CARATULA:ERR] {e}")
     
                 try:
-                    if radiografia_plan is not None:
-                        _cargar_timeline_radiografia_custom(
-                            sac,
-                            libro,
-                            temp_dir,
-                            ops,
-                            radiografia_plan,
-                            op_fecha_map,
-                            INCLUIR_ADJUNTOS,
-                            STAMP,
-                            context,
-                            p,
-                            hctx,
-                            hp,
-                            _push_pdf,
-                            _mf,
-                        )
-                    else:
-                        _cargar_timeline_descarga_completa(
-                            sac,
-                            libro,
-                            temp_dir,
-                            ops,
-                            op_fecha_map,
-                            INCLUIR_ADJUNTOS,
-                            STAMP,
-                            context,
-                            p,
-                            hctx,
-                            hp,
-                            _push_pdf,
-                            _mf,
-                        )
+                    with _PERFILES.medir("libro"):
+                        if radiografia_plan is not None:
+                            _cargar_timeline_radiografia_custom(
+                                sac,
+                                libro,
+                                temp_dir,
+                                ops,
+                                radiografia_plan,
+                                op_fecha_map,
+                                INCLUIR_ADJUNTOS,
+                                STAMP,
+                                context,
+                                p,
+                                hctx,
+                                hp,
+                                _push_pdf,
+                                _mf,
+                                render_cache=render_cache,
+                            )
+                        else:
+                            _cargar_timeline_descarga_completa(
+                                sac,
+                                libro,
+                                temp_dir,
+                                ops,
+                                op_fecha_map,
+                                INCLUIR_ADJUNTOS,
+                                STAMP,
+                                context,
+                                p,
+                                hctx,
+                                hp,
+                                _push_pdf,
+                                _mf,
+                                engine=print_engine,
+                            )
                 finally:
+                    try:
+                        if print_engine:
+                            print_engine.close()
+                    except Exception:
+                        pass
                     try:
                         if hp:
                             hp.close()
@@ -8447,6 +11107,10 @@ def descargar_expediente(
                     except Exception:
                         pass
     
+                logging.info(f"[ASSETS] Cache de impresion · hits={_ASSET_CACHE.hits} misses={_ASSET_CACHE.misses}")
+                etapa("Terminando conversiones pendientes")
+                _resolver_timeline()
+
                 # === 3.e) ConstrucciÃƒÂ³n final en orden cronolÃƒÂ³gico ===
                 hay_algo = any(timeline.values()) or bool(caratula_block)
                 if not hay_algo:
@@ -8464,7 +11128,7 @@ def descargar_expediente(
                         return (9999, 99, 99)
                 orden_fechas = sorted(orden_fechas, key=_key_fecha)
     
-                bloques_final = []  # list of (Path, header, toc_title?)
+                bloques_final = []  # list of (Path, header, toc_title?, fecha?, origen?)
                 if caratula_block:
                     bloques_final.append(caratula_block)
     
@@ -8500,123 +11164,607 @@ def descargar_expediente(
                     pass
     
                 out = Path(carpeta_salida) / f"Exp_{nro_exp}.pdf"
-                out_sin_links = out
                 front_matter_pages = _contar_paginas_pdf(caratula_block[0]) if caratula_block else 0
-                idx_pages, idx_map = fusionar_bloques_con_indice(
-                    bloques_final,
-                    out,
-                    index_title="INDICE",
-                    keep_sidecar=_env_true("KEEP_TOC", "0"),
-                    front_matter_pages=front_matter_pages,
-                    skip_first_block_in_index=bool(caratula_block),
-                )
-                first_index_page = max(1, front_matter_pages + 1) if idx_pages else 1
+                with _PERFILES.medir("fusion"):
+                    idx_pages, idx_map, mapa_paginas = fusionar_bloques_con_indice(
+                        bloques_final,
+                        out,
+                        index_title="INDICE",
+                        keep_sidecar=_env_true("KEEP_TOC", "0"),
+                        front_matter_pages=front_matter_pages,
+                        skip_first_block_in_index=bool(caratula_block),
+                    )
+
+                # El OCR ya se hizo por bloque en la ingesta; aca solo queda el forzado final.
+                if APLICAR_OCR:
+                    if _env_true("OCR_FINAL_FORCE"):
+                        try:
+                            # carÃƒÂ¡tula e ÃƒÂ­ndice nunca son escaneos
+                            paginas_ocr = _paginas_para_ocr_final(
+                                out, saltear=front_matter_pages + idx_pages, mapa=mapa_paginas
+                            )
+                            with _PERFILES.medir("ocr"):
+                                _ocrmypdf_paginas(out, paginas_ocr)
+                        except Exception:
+                            logging.exception("[OCR] FallÃƒÂ³ OCR final")
+                else:
+                    logging.info("[OCR] Omitido por opciÃƒÂ³n de usuario (sin OCR).")
     
-                # DiagnÃƒÂ³stico inicial: links presentes justo tras fusionar
+                # === NUMERACIÓN DE PÁGINAS ===
+                try:
+                    _agregar_numeracion_paginas(out, numero_inicial=1, mapa=mapa_paginas)
+                    logging.info("[PAGINAS] Numeración por página aplicada")
+                except Exception as e:
+                    logging.info(f"[PAGINAS] No se pudo estampar numeración de páginas: {e}")
+    
+                if _env_true("FTS_INDEX", "1"):
+                    etapa("Indexando el texto del expediente para búsquedas")
+                    try:
+                        n_fts = indexar_expediente_pdf(out, nro_exp, toc_items=idx_map, mapa=mapa_paginas)
+                        logging.info(f"[FTS] {out.name}: {n_fts} página(s) con texto indexadas en {_ruta_indice_fts()}")
+                    except Exception as e:
+                        logging.info(f"[FTS:ERR] No se pudo indexar {out.name}: {e}")
+
+                _mf(f"==> PDF FINAL: {out.name} (total bloques={len(bloques_final)})")
+                logging.info(f"[OK] PDF final creado: {out} | bloques={len(bloques_final)}")
+                exito = True
                 try:
-                    _log_links_en_pagina(out, first_index_page, "INDICE/ANTES_POST")
+                    _METRICAS.inc("paginas_finales_total", mapa_paginas["paginas"] if mapa_paginas else _contar_paginas_pdf(out))
                 except Exception:
                     pass
+                etapa("Listo: PDF final creado")
+                _avisar_usuario("info", "Éxito", f"PDF creado en:\n{out}")
     
-                # Intentar aplicar OCR al PDF final
-                if APLICAR_OCR:
-                    ocr_out = _maybe_ocr(out)
-                    if ocr_out != out:
-                        shutil.move(ocr_out, out)
+            finally:
+                # En el camino feliz _resolver_timeline ya lo cerro; si la corrida
+                # se corto antes, no dejar workers convirtiendo/OCR en segundo plano.
+                if ingesta is not None:
+                    ingesta.close(wait=exito, cancelar=not exito)
+                _PLANIFICADOR.reportar()
+                _cerrar_etapa()
+                _METRICAS.inc("expedientes_total", resultado="ok" if exito else "fallido")
+                _METRICAS.observar("expediente_segundos", time.perf_counter() - t_corrida)
+                try:
+                    ruta_m = _METRICAS.exportar()
+                    if ruta_m:
+                        logging.info(f"[METRICAS] exportadas en {ruta_m.parent}")
+                except Exception as e:
+                    logging.info(f"[METRICAS] No se pudieron exportar: {e}")
+                try:
+                    ruta_p = _PERFILES.volcar()
+                    if ruta_p:
+                        logging.info(f"[PERFIL] Perfiles por etapa en {ruta_p.parent}")
+                except Exception as e:
+                    logging.info(f"[PERFIL] No se pudieron escribir los perfiles: {e}")
+                try:
+                    context.close()
+                except Exception:
+                    pass
+                try:
+                    browser.close()
+                except Exception:
+                    pass
+                try:
+                    _HAR.cerrar()
+                except Exception as e:
+                    logging.info(f"[HAR] No se pudo cerrar la grabacion: {e}")
+
+
+# ---------------------------- LOGGING ----------------------------------
+# LOG_FILE lo fija el orquestador de lotes para que cada proceso tenga su propio log.
+LOG = Path(os.getenv("LOG_FILE") or (BASE_PATH / "debug.log"))
+
+
+class _LimiteLogsRepetitivos(logging.Filter):
+    """
+    Limita en la bitacora de la UI los mensajes con el mismo prefijo [TAG] a
+    LOG_RATE_LIMIT por segundo (p. ej. [WINOCR:DBG] por pagina o [DL:START]
+    por archivo). Lo omitido se resume en el siguiente mensaje que pasa con
+    ese prefijo. Va en el handler de la UI: debug.log recibe todo.
+    Etapas, configuracion, errores ([..:ERR]) y warnings nunca se limitan.
+    """
+
+    _SIEMPRE = ("[ETAPA]", "[CONFIG]")
+
+    def __init__(self, por_segundo: int | None = None):
+        super().__init__()
+        if por_segundo is None:
+            try:
+                por_segundo = int(os.getenv("LOG_RATE_LIMIT", "20"))
+            except Exception:
+                por_segundo = 20
+        self.por_segundo = max(0, int(por_segundo))
+        self._lock = threading.Lock()
+        self._ventanas: dict[str, list] = {}  # prefijo -> [inicio, emitidos, omitidos]
+
+    def filter(self, record):
+        if not self.por_segundo or record.levelno >= logging.WARNING:
+            return True
+        try:
+            msg = record.getMessage() or ""
+        except Exception:
+            return True
+        if not msg.startswith("[") or msg.startswith(self._SIEMPRE):
+            return True
+        fin = msg.find("]")
+        if fin <= 0:
+            return True
+        prefijo = msg[: fin + 1]
+        if prefijo.endswith(":ERR]"):
+            return True
+        ahora = time.monotonic()
+        with self._lock:
+            ventana = self._ventanas.get(prefijo)
+            if ventana is None or ahora - ventana[0] >= 1.0:
+                omitidos = ventana[2] if ventana else 0
+                self._ventanas[prefijo] = [ahora, 1, 0]
+                if omitidos:
+                    record.msg = f"{msg} (+{omitidos} mensaje(s) {prefijo} omitidos)"
+                    record.args = None
+                return True
+            if ventana[1] < self.por_segundo:
+                ventana[1] += 1
+                return True
+            ventana[2] += 1
+            return False
+
+
+def _configurar_logging(log_path: Path):
+    """
+    debug.log rotativo escrito por un QueueListener: los hilos de trabajo sólo
+    encolan el record y la escritura a disco ocurre en el hilo del listener.
+    """
+    import atexit
+    from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+    try:
+        max_mb = float(os.getenv("LOG_MAX_MB", "10"))
+    except Exception:
+        max_mb = 10.0
+    try:
+        backups = int(os.getenv("LOG_BACKUPS", "3"))
+    except Exception:
+        backups = 3
+    file_handler = RotatingFileHandler(
+        str(log_path),
+        maxBytes=max(1, int(max_mb * 1024 * 1024)),
+        backupCount=max(0, backups),
+        encoding="utf-8",
+        delay=True,
+    )
+    file_handler.setFormatter(logging.Formatter("%(asctime)s %(message)s", datefmt="%H:%M:%S"))
+
+    log_q: queue.Queue = queue.Queue(-1)
+    listener = QueueListener(log_q, file_handler, respect_handler_level=True)
+    listener.start()
+
+    def _detener_listener():
+        try:
+            listener.stop()
+        except Exception:
+            pass
+
+    atexit.register(_detener_listener)
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    root_logger.addHandler(QueueHandler(log_q))
+    return listener
+
+
+_LOG_LISTENER = _configurar_logging(LOG)
+
+# Filtro para silenciar logs de diagnÃƒÂ³stico detallado de Informes TÃƒÂ©cnicos.
+# Se puede reactivar seteando EXPEDIENTE_DIAG_INFORMES=1 en el entorno.
+class _InfDiagFilter(logging.Filter):
+    def filter(self, record):
+        try:
+            msg = record.getMessage() or ""
+        except Exception:
+            return True
+        if os.getenv("EXPEDIENTE_DIAG_INFORMES", "").strip().lower() in {"1", "true", "yes", "on"}:
+            return True
+        prefixes = (
+            "[INF] Fila ",
+            "[INF] Abriendo secciÃƒÂ³n",
+            "[INF] Filas InformesTecnicosMPF:",
+            "[INF] Contenedor InformesTecnicosMPF",
+        )
+        return not any(msg.startswith(p) for p in prefixes)
 
-                    # DiagnÃƒÂ³stico despuÃƒÂ©s del OCR Ã¯Â¿Â½?oligeroÃ¯Â¿Â½?Ã¯Â¿Â½
-                    try:
-                        _log_links_en_pagina(out, first_index_page, "INDICE/DESPUES_OCR")
-                    except Exception:
-                        pass
+logging.getLogger().addFilter(_InfDiagFilter())
 
-                    if _env_true("OCR_FINAL_FORCE"):
-                        try:
-                            tmp_out = out.with_name(out.stem + "_ocr.pdf")
-                            subprocess.run(
-                                [
-                                    "ocrmypdf",
-                                    "--force-ocr",
-                                    "--language", "spa",
-                                    "--image-dpi", "300",
-                                    "--deskew",
-                                    "--rotate-pages",
-                                    "--optimize", "3",
-                                    str(out),
-                                    str(tmp_out),
-                                ],
-                                check=True,
-                                **_subprocess_hidden_kwargs(),
-                            )
-                            shutil.move(tmp_out, out)
-                        except Exception:
-                            logging.exception("[OCR] FallÃƒÂ³ OCR final")
 
-                        # DiagnÃƒÂ³stico despuÃƒÂ©s del OCR forzado
-                        try:
-                            _log_links_en_pagina(out, first_index_page, "INDICE/DESPUES_OCR_FORCE")
-                        except Exception:
-                            pass
-                else:
-                    logging.info("[OCR] Omitido por opciÃƒÂ³n de usuario (sin OCR).")
-    
-                # === NUMERACIÓN DE PÁGINAS ===
-                try:
-                    _agregar_numeracion_paginas(out, numero_inicial=1)
-                    logging.info("[PAGINAS] Numeración por página aplicada")
-                except Exception as e:
-                    logging.info(f"[PAGINAS] No se pudo estampar numeración de páginas: {e}")
-    
-                # DiagnÃƒÂ³stico tras fojas (antes de reinyectar)
-                try:
-                    _log_links_en_pagina(out, first_index_page, "INDICE/ANTES_RELINK")
-                except Exception:
-                    pass
-    
-                # Reinyectar links (por si OCR/fojas los borraron)
+# ---------------------------- CLI SIN VENTANA ----------------------------
+# Los comandos sin UI se despachan antes de importar tkinter: una corrida
+# headless no carga Tk en absoluto.
+_COMANDOS_SIN_UI = ("--headless", "--buscar", "--indexar", "--lote")
+
+
+def _parser_cli():
+    import argparse
+
+    ap = argparse.ArgumentParser(prog="expediente", description="Descarga de expedientes del SAC.")
+    ap.add_argument("--profile-startup", action="store_true",
+                    help="Informa el tiempo hasta la primera ventana y el costo de cada import pesado.")
+    ap.add_argument("--profile-stages", action="store_true",
+                    help="Perfila con cProfile las etapas pesadas y deja los resultados en <out>/Exp_<n>_work/perfil.")
+    ap.add_argument("--headless", action="store_true",
+                    help="Descarga sin ventana (credenciales desde el entorno o .env).")
+    ap.add_argument("--exp", help="Número de expediente (con --headless).")
+    ap.add_argument("--out", help="Carpeta destino (con --headless o --lote).")
+    ap.add_argument("--sin-adjuntos", action="store_true", help="No descarga adjuntos.")
+    ap.add_argument("--ocr", action="store_true", help="Aplica OCR a los adjuntos.")
+    ap.add_argument("--buscar", metavar="TEXTO", help="Busca en el índice de texto de los expedientes descargados.")
+    ap.add_argument("--limite", type=int, default=50, help="Máximo de resultados de --buscar.")
+    ap.add_argument("--fts-crudo", action="store_true", help="Pasa la consulta de --buscar tal cual a FTS5.")
+    ap.add_argument("--indexar", nargs="+", metavar="PDF", help="Indexa PDFs ya generados (usa <pdf>.toc.json si existe).")
+    ap.add_argument("--lote", metavar="ARCHIVO",
+                    help="Descarga los expedientes listados (uno por línea; '-' = stdin) en procesos paralelos.")
+    ap.add_argument("--procesos", type=int, default=0, help="Expedientes simultáneos con --lote.")
+    ap.add_argument("--har-grabar", metavar="CARPETA",
+                    help="Graba el tráfico (HAR + descargas, sin credenciales) en CARPETA/Exp_<n>.")
+    ap.add_argument("--har-reproducir", metavar="CARPETA",
+                    help="Reproduce una grabación de --har-grabar sin conectarse al SAC.")
+    return ap
+
+
+def _es_invocacion_cli(argv: list[str]) -> bool:
+    return any(a in _COMANDOS_SIN_UI for a in argv)
+
+
+def _main_headless(args) -> int:
+    load_dotenv()
+    if not args.exp or not args.out:
+        sys.stderr.write("--headless requiere --exp y --out\n")
+        return 2
+    carpeta = Path(args.out)
+    carpeta.mkdir(parents=True, exist_ok=True)
+    try:
+        descargar_expediente(
+            os.getenv("TELE_USER", ""),
+            os.getenv("TELE_PASS", ""),
+            os.getenv("INTRA_USER", os.getenv("SAC_USER", "")),
+            os.getenv("INTRA_PASS", os.getenv("SAC_PASS", "")),
+            args.exp.strip(),
+            carpeta,
+            incluir_adjuntos=not args.sin_adjuntos,
+            aplicar_ocr=bool(args.ocr),
+        )
+    except Exception as e:
+        logging.exception(f"[HEADLESS] Error descargando {args.exp}: {e}")
+        sys.stderr.write(f"Error: {e}\n")
+        return 1
+    return 0
+
+
+def _main_buscar(args) -> int:
+    t0 = time.perf_counter()
+    try:
+        res = buscar_en_indice(args.buscar, limite=args.limite, crudo=args.fts_crudo)
+    except Exception as e:
+        sys.stderr.write(f"Error consultando {_ruta_indice_fts()}: {e}\n")
+        return 1
+    for r in res:
+        sys.stdout.write(f"Exp {r['expediente']} · pág. {r['pagina']} · {r['bloque']}\n    {r['fragmento']}\n")
+    sys.stdout.write(f"{len(res)} resultado(s) en {(time.perf_counter() - t0) * 1000:.0f} ms\n")
+    return 0
+
+
+def _main_indexar(args) -> int:
+    rc = 0
+    for raw in args.indexar:
+        pdf = Path(raw)
+        m = re.search(r"Exp_(.+)$", pdf.stem)
+        expediente = (args.exp or (m.group(1) if m else pdf.stem)).strip()
+        try:
+            n = indexar_expediente_pdf(pdf, expediente)
+            sys.stdout.write(f"{pdf.name}: {n} página(s) indexadas (exp {expediente})\n")
+        except Exception as e:
+            sys.stderr.write(f"{pdf.name}: error indexando: {e}\n")
+            rc = 1
+    return rc
+
+
+def _leer_lote(origen: str) -> list[str]:
+    texto = sys.stdin.read() if origen == "-" else Path(origen).read_text(encoding="utf-8-sig")
+    vistos, exps = set(), []
+    for ln in texto.splitlines():
+        exp = ln.split("#", 1)[0].strip().strip(";,")
+        if exp and exp not in vistos:
+            vistos.add(exp)
+            exps.append(exp)
+    return exps
+
+
+class _TrabajoLote:
+    """Un expediente del lote corriendo en su propio proceso `--headless`."""
+
+    def __init__(self, exp: str, base: Path):
+        self.exp = exp
+        self.dir = base / re.sub(r"[^\w.-]+", "_", exp)
+        self.log = self.dir / "debug.log"
+        self.proc = None
+        self.t0 = self.t1 = None
+        self.rc = None
+        self.etapa = "en cola"
+        self.interrumpido = False
+        self._offset = 0
+
+    def iniciar(self, args):
+        tmp = self.dir / "tmp"
+        tmp.mkdir(parents=True, exist_ok=True)
+        env = dict(os.environ)
+        # TMP/TEMP/TMPDIR y log propios: descargar_expediente toca ambos a nivel proceso.
+        env.update({"LOG_FILE": str(self.log), "TMP": str(tmp), "TEMP": str(tmp), "TMPDIR": str(tmp)})
+        cmd = [sys.executable] if getattr(sys, "frozen", False) else [sys.executable, str(Path(__file__).resolve())]
+        cmd += ["--headless", "--exp", self.exp, "--out", str(Path(args.out).resolve())]
+        if args.sin_adjuntos:
+            cmd.append("--sin-adjuntos")
+        if args.ocr:
+            cmd.append("--ocr")
+        salida = open(self.dir / "salida.txt", "wb")
+        try:
+            self.proc = subprocess.Popen(cmd, env=env, stdout=salida, stderr=subprocess.STDOUT,
+                                         cwd=str(self.dir), **_subprocess_hidden_kwargs())
+        finally:
+            salida.close()
+        self.t0 = time.perf_counter()
+        self.etapa = "iniciando"
+
+    def leer_etapa(self) -> bool:
+        """Lee lo nuevo del log del proceso; True si cambio la etapa."""
+        try:
+            tam = self.log.stat().st_size
+        except OSError:
+            return False
+        if tam < self._offset:  # rotado
+            self._offset = 0
+        if tam == self._offset:
+            return False
+        with open(self.log, "rb") as f:
+            f.seek(self._offset)
+            nuevo = f.read()
+        corte = nuevo.rfind(b"\n") + 1
+        self._offset += corte
+        previa = self.etapa
+        for ln in nuevo[:corte].decode("utf-8", "replace").splitlines():
+            if "[ETAPA] " in ln:
+                self.etapa = ln.split("[ETAPA] ", 1)[1].strip()
+        return self.etapa != previa
+
+    def terminado(self) -> bool:
+        if self.proc is None or self.rc is not None:
+            return self.rc is not None
+        rc = self.proc.poll()
+        if rc is None:
+            return False
+        self.rc, self.t1 = rc, time.perf_counter()
+        return True
+
+    def detener(self, timeout: float = 10.0):
+        """Corta el proceso (terminate, y kill si no sale en `timeout`) y lo espera."""
+        if self.proc is None or self.rc is not None:
+            return
+        self.interrumpido = True
+        try:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait(timeout=timeout)
+        except Exception:
+            pass
+        self.leer_etapa()
+        self.rc, self.t1 = self.proc.returncode, time.perf_counter()
+
+    @property
+    def segundos(self) -> float:
+        if self.t0 is None:
+            return 0.0
+        return (self.t1 or time.perf_counter()) - self.t0
+
+
+def _main_lote(args) -> int:
+    """
+    Orquestador: K expedientes a la vez, cada uno en un proceso `--headless`
+    aislado (su navegador, su carpeta de trabajo y su debug.log bajo
+    <out>/_lote/<exp>/). La consola muestra el avance de todos.
+    """
+    import json
+
+    # Los hijos corren con cwd=<out>/_lote/<exp>: su load_dotenv() no ve el .env
+    # del usuario, asi que se carga aca y lo heredan por el entorno.
+    load_dotenv()
+    if not args.out:
+        sys.stderr.write("--lote requiere --out\n")
+        return 2
+    try:
+        exps = _leer_lote(args.lote)
+    except Exception as e:
+        sys.stderr.write(f"No pude leer el lote {args.lote}: {e}\n")
+        return 2
+    if not exps:
+        sys.stderr.write("El lote esta vacio\n")
+        return 2
+    k = args.procesos or int(os.getenv("LOTE_PROCESOS", "0") or 0) or max(1, (os.cpu_count() or 4) // 4)
+    k = max(1, min(k, len(exps)))
+    base = Path(args.out) / "_lote"
+    trabajos = [_TrabajoLote(e, base) for e in exps]
+    cola, activos, hechos = list(trabajos), [], 0
+    t0 = time.perf_counter()
+
+    def _mostrar(t: "_TrabajoLote", texto: str):
+        linea = f"[{hechos}/{len(trabajos)}] {t.exp:<14} {t.segundos:6.0f}s  {texto}"
+        logging.info(f"[LOTE] {linea}")
+        sys.stdout.write(linea + "\n")
+        sys.stdout.flush()
+
+    sys.stdout.write(f"Lote: {len(trabajos)} expediente(s) · {k} en paralelo · logs en {base}\n")
+    try:
+        while cola or activos:
+            while cola and len(activos) < k:
+                t = cola.pop(0)
                 try:
-                    ok, out_final = _relink_indice_con_fitz(out, idx_map)
-                    logging.info(f"[INDICE/LINK] reinyectado={ok} items={len(idx_map)}")
-                    if out_final != out_sin_links:
-                        try:
-                            out_sin_links.unlink(missing_ok=True)
-                            logging.info(
-                                f"[INDICE/LINK] duplicado sin links eliminado: {out_sin_links.name}"
-                            )
-                        except Exception as e_del:
-                            logging.info(
-                                f"[INDICE/LINK] no se pudo eliminar duplicado: {e_del}"
-                            )
-                    out = out_final
+                    t.iniciar(args)
                 except Exception as e:
-                    logging.info(f"[INDICE/LINK:ERR] {e}")
-    
-                # DiagnÃƒÂ³stico final
-                try:
-                    _log_links_en_pagina(out, first_index_page, "INDICE/FINAL")
-                except Exception:
-                    pass
-    
-                _mf(f"==> PDF FINAL: {out.name} (total bloques={len(bloques_final)})")
-                logging.info(f"[OK] PDF final creado: {out} | bloques={len(bloques_final)}")
-                etapa("Listo: PDF final creado")
-                messagebox.showinfo("Éxito", f"PDF creado en:\n{out}")
-    
-            finally:
-                try:
-                    context.close()
-                except Exception:
-                    pass
-                try:
-                    browser.close()
-                except Exception:
-                    pass
+                    t.rc, t.etapa = -1, f"no arranco: {e}"
+                    hechos += 1
+                    _mostrar(t, f"ERROR · {t.etapa}")
+                    continue
+                activos.append(t)
+                _mostrar(t, "iniciado")
+            for t in list(activos):
+                if t.leer_etapa():
+                    _mostrar(t, t.etapa)
+                if t.terminado():
+                    t.leer_etapa()
+                    activos.remove(t)
+                    hechos += 1
+                    _mostrar(t, "OK" if t.rc == 0 else f"ERROR (rc={t.rc}) · ultima etapa: {t.etapa}")
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        interrumpido = True
+        sys.stdout.write("Interrumpido: cerrando procesos...\n")
+        for t in activos:
+            try:
+                t.proc.terminate()
+            except Exception:
+                pass
+        for t in activos:
+            t.detener()
+    else:
+        interrumpido = False
+
+    def _estado(t: "_TrabajoLote") -> str:
+        if t.interrumpido:
+            return "interrumpido"
+        if t.rc is None:
+            return "sin iniciar"
+        return "ok" if t.rc == 0 else "error"
+
+    total = time.perf_counter() - t0
+    fallidos = [t for t in trabajos if t.rc is not None and t.rc != 0 and not t.interrumpido]
+    resumen = {
+        "segundos": round(total, 1),
+        "procesos": k,
+        "interrumpido": interrumpido,
+        "trabajos": [
+            {"expediente": t.exp, "estado": _estado(t), "rc": t.rc, "segundos": round(t.segundos, 1),
+             "ultima_etapa": t.etapa, "log": str(t.log)}
+            for t in trabajos
+        ],
+    }
+    try:
+        (base / "resumen.json").write_text(json.dumps(resumen, ensure_ascii=False, indent=2), encoding="utf-8")
+    except Exception:
+        pass
+    if interrumpido:
+        ok = sum(1 for t in trabajos if _estado(t) == "ok")
+        sys.stdout.write(f"Lote interrumpido tras {total:.0f}s · ok={ok} · detalle en {base / 'resumen.json'}\n")
+        return 130
+    suma = sum(t.segundos for t in trabajos)
+    sys.stdout.write(
+        f"Lote terminado en {total:.0f}s (secuencial habria sido ~{suma:.0f}s) · "
+        f"ok={len(trabajos) - len(fallidos)} · errores={len(fallidos)}\n"
+    )
+    for t in fallidos:
+        sys.stdout.write(f"  {t.exp}: rc={t.rc} · {t.log}\n")
+    return 0 if not fallidos else 1
+
+
+def _main_cli(argv: list[str]) -> int:
+    args, _resto = _parser_cli().parse_known_args(argv)
+    if args.profile_stages:
+        os.environ["PROFILE_STAGES"] = "1"  # tambien lo heredan los procesos de --lote
+    for modo, carpeta in (("grabar", args.har_grabar), ("reproducir", args.har_reproducir)):
+        if carpeta:
+            os.environ["HAR_MODE"], os.environ["HAR_DIR"] = modo, str(Path(carpeta).resolve())
+    try:
+        if args.headless:
+            return _main_headless(args)
+        if args.buscar:
+            return _main_buscar(args)
+        if args.indexar:
+            return _main_indexar(args)
+        if args.lote:
+            return _main_lote(args)
+        return 2
+    finally:
+        if _PERFIL_ARRANQUE:
+            _reportar_arranque()
+
+
+# Dependencias que se precalientan en segundo plano una vez visible la ventana.
+_PRECARGA = (
+    sync_playwright,
+    PdfReader,
+    canvas,
+    Image,
+    requests,
+    fitz,
+)
+
+
+def _precalentar_dependencias(al_terminar=None):
+    """Importa las dependencias pesadas en un hilo aparte para que el primer uso no espere."""
+    def _worker():
+        for dep in _PRECARGA:
+            try:
+                dep._cargar(origen="precarga")
+            except Exception as e:
+                logging.info(f"[STARTUP] No pude precargar {dep!r}: {e}")
+        if al_terminar:
+            try:
+                al_terminar()
+            except Exception:
+                pass
+
+    if not _env_true("PREWARM_IMPORTS", "1"):
+        if al_terminar:
+            al_terminar()
+        return
+    threading.Thread(target=_worker, name="precarga-imports", daemon=True).start()
 
 
+_T_PRIMERA_VENTANA: float | None = None
+
+
+def _reportar_arranque():
+    lineas = ["[STARTUP] Perfil de arranque"]
+    if _T_PRIMERA_VENTANA is not None:
+        lineas.append(f"[STARTUP] Primera ventana: {_T_PRIMERA_VENTANA:.3f}s")
+    for mod, (seg, origen) in sorted(_TIEMPOS_IMPORT.items(), key=lambda kv: -kv[1][0]):
+        lineas.append(f"[STARTUP]   {mod:<28} {seg:7.3f}s  ({origen})")
+    for ln in lineas:
+        logging.info(ln)
+    try:
+        sys.stderr.write("\n".join(lineas) + "\n")
+    except Exception:
+        pass
+
+
+if __name__ == "__main__" and _es_invocacion_cli(sys.argv[1:]):
+    sys.exit(_main_cli(sys.argv[1:]))
+
+
+# ---------------------------- UI ----------------------------------------
+from tkinter import Tk, StringVar, BooleanVar, filedialog, messagebox, Canvas, Frame, Label, Menu
+from tkinter import Toplevel, ttk
+from tkinter.scrolledtext import ScrolledText
 
 
 def _create_root():
     """Crea la ventana principal con ttkbootstrap cuando esta disponible."""
+    global tb, _TTKBOOTSTRAP_OK, _UI_ACTIVA
+    _UI_ACTIVA = True
+    try:
+        import ttkbootstrap as tb
+        _TTKBOOTSTRAP_OK = True
+    except Exception:
+        tb = None
+        _TTKBOOTSTRAP_OK = False
     if _TTKBOOTSTRAP_OK and tb is not None:
         try:
             return tb.Window(themename=UI_THEME)
@@ -8746,21 +11894,17 @@ class ProgressWin(Toplevel):
         return "Procesando. Mira la bitacora de abajo para detalle tecnico en vivo."
 
     def _poll(self):
-        try:
-            while True:
-                msg = _repair_mojibake_text(self.q.get_nowait())
-                if "[ETAPA] " in msg:
-                    etapa_txt = _repair_mojibake_text(msg.split("[ETAPA] ", 1)[1].strip())
-                    self.lbl.config(text=f"Estado actual: {etapa_txt}")
-                    self.sub.config(text=self._detalle_etapa(etapa_txt))
-                if "[CONFIG]" in msg:
-                    conf = _repair_mojibake_text(msg.split("[CONFIG]", 1)[1].strip())
-                    self.sub.config(text=f"Opciones activas: {conf}")
-                self.text.insert("end", msg + "\n")
-                self.text.see("end")
-        except queue.Empty:
-            pass
-        self.after(100, self._poll)
+        msgs = _drenar_mensajes_log(self.q)
+        for msg in msgs:
+            if "[ETAPA] " in msg:
+                etapa_txt = msg.split("[ETAPA] ", 1)[1].strip()
+                self.lbl.config(text=f"Estado actual: {etapa_txt}")
+                self.sub.config(text=self._detalle_etapa(etapa_txt))
+            if "[CONFIG]" in msg:
+                conf = msg.split("[CONFIG]", 1)[1].strip()
+                self.sub.config(text=f"Opciones activas: {conf}")
+        _agregar_lineas_log(self.text, msgs)
+        self.after(50, self._poll)
 
     def _on_close(self):
         # Solo oculta la ventana. La descarga sigue en segundo plano.
@@ -8782,6 +11926,21 @@ class RadiografiaDialog(Toplevel):
         self.items = [dict(item) for item in items]
         self._items_by_uid = {str(item.get("uid") or ""): item for item in self.items}
         self._default_uid_order = [str(item.get("uid") or "") for item in self.items]
+        # Modelo indexado: posiciones por uid, contadores por categoría y lo que
+        # hoy muestra la grilla, para que cada interacción toque sólo lo que cambió.
+        self._pos_by_uid: dict[str, int] = {}
+        self._category_cache: dict[str, str] = {}
+        self._search_cache: dict[str, str] = {}
+        self._cat_stats: dict[str, dict] = {}
+        self._cat_order: list[str] = []
+        self._cat_uids: dict[str, list[str]] = {}
+        self._kind_selected: dict[str, int] = {}
+        self._tree_rows: dict[str, tuple] = {}
+        self._filter_text = ""
+        self._filter_matches: set[str] | None = None
+        self.filter_var = StringVar(value="")
+        self._reindex()
+        self._recount_categories()
         self._drag_state = None
         self._drag_ghost = None
         self._drop_indicator = None
@@ -8797,14 +11956,21 @@ class RadiografiaDialog(Toplevel):
         self._preview_model = None
         self._preview_photo = None
         self._preview_local_cache: dict[str, dict] = {}
-        self._preview_poll_job = None
+        self._preview_timeout_job = None
         self._preview_debounce_job = None
+        self._preview_waiting_uid = ""
+        if self._preview_session is not None:
+            self._preview_session["on_preview"] = self._on_preview_entregada
         self._type_filter_buttons: dict[str, str] = {}
         self._syncing_index_name = False
         try:
             self.index_name_var.trace_add("write", self._on_index_name_var_changed)
         except Exception:
             pass
+        try:
+            self.filter_var.trace_add("write", lambda *_a: self._apply_text_filter())
+        except Exception:
+            pass
 
         _apply_ui_theme(self)
 
@@ -8861,6 +12027,10 @@ class RadiografiaDialog(Toplevel):
             wraplength=500,
             justify="left",
         ).grid(row=0, column=5, sticky="w", padx=(4, 0))
+        search_box = ttk.Frame(toolbar)
+        search_box.grid(row=0, column=6, sticky="e")
+        ttk.Label(search_box, text="Buscar:", style="Hint.TLabel").pack(side="left", padx=(12, 6))
+        ttk.Entry(search_box, textvariable=self.filter_var, width=32).pack(side="left")
 
         type_filters = ttk.Frame(head)
         type_filters.grid(row=4, column=0, sticky="ew", pady=(3, 0))
@@ -9009,10 +12179,97 @@ class RadiografiaDialog(Toplevel):
         self._refresh()
 
     def _item_by_uid(self, uid: str) -> dict | None:
+        if uid not in self._pos_by_uid:
+            return None
+        return self._items_by_uid.get(uid)
+
+    def _order_idx(self, uid: str) -> int:
+        return self._pos_by_uid.get(str(uid or ""), 0)
+
+    def _reindex(self):
+        self._pos_by_uid = {str(item.get("uid") or ""): idx for idx, item in enumerate(self.items)}
+
+    def _recount_categories(self):
+        """Recalcula los contadores por categoría/tipo. Sólo hace falta cuando cambia el conjunto de items."""
+        self._cat_stats = {}
+        self._cat_order = []
+        self._cat_uids = {}
+        self._kind_selected = {}
         for item in self.items:
-            if item.get("uid") == uid:
-                return item
-        return None
+            uid = str(item.get("uid") or "")
+            label = self._category_of(item)
+            key = label.casefold()
+            if key not in self._cat_stats:
+                self._cat_stats[key] = {"label": label, "total": 0, "selected": 0}
+                self._cat_order.append(key)
+                self._cat_uids[key] = []
+            self._cat_stats[key]["total"] += 1
+            self._cat_uids[key].append(uid)
+            if item.get("selected", True):
+                self._cat_stats[key]["selected"] += 1
+                kind = item.get("kind") or "?"
+                self._kind_selected[kind] = self._kind_selected.get(kind, 0) + 1
+
+    def _set_item_selected(self, item: dict, value: bool):
+        value = bool(value)
+        if bool(item.get("selected", True)) == value:
+            return
+        item["selected"] = value
+        delta = 1 if value else -1
+        stat = self._cat_stats.get(self._category_of(item).casefold())
+        if stat is not None:
+            stat["selected"] += delta
+        kind = item.get("kind") or "?"
+        self._kind_selected[kind] = self._kind_selected.get(kind, 0) + delta
+
+    def _category_of(self, item: dict) -> str:
+        uid = str(item.get("uid") or "")
+        label = self._category_cache.get(uid)
+        if label is None:
+            label = self._category_for_item(item)
+            self._category_cache[uid] = label
+        return label
+
+    def _search_key(self, uid: str) -> str:
+        key = self._search_cache.get(uid)
+        if key is None:
+            item = self._items_by_uid.get(uid) or {}
+            key = " ".join(
+                str(item.get(k) or "")
+                for k in ("kind_label", "fecha", "titulo", "detalle", "index_name")
+            ).casefold()
+            self._search_cache[uid] = key
+        return key
+
+    def _apply_text_filter(self):
+        query = _norm_ws(self.filter_var.get() or "").casefold()
+        prev = self._filter_text
+        if not query:
+            matches = None
+        else:
+            # Filtro incremental: si la búsqueda sólo se extendió, alcanza con
+            # revisar lo que ya coincidía.
+            if prev and query.startswith(prev) and self._filter_matches is not None:
+                candidates = self._filter_matches
+            else:
+                candidates = self._pos_by_uid.keys()
+            terms = query.split()
+            matches = {uid for uid in candidates if all(t in self._search_key(uid) for t in terms)}
+        self._filter_text = query
+        self._filter_matches = matches
+        self._refresh()
+
+    def _visible_uids(self) -> list[str]:
+        uids = [str(item.get("uid") or "") for item in self.items]
+        if self._filter_matches is None:
+            return uids
+        return [uid for uid in uids if uid in self._filter_matches]
+
+    def _visible_indices(self) -> list[int]:
+        """Posiciones en self.items de las filas que deja ver la búsqueda."""
+        if self._filter_matches is None:
+            return list(range(len(self.items)))
+        return [i for i, item in enumerate(self.items) if str(item.get("uid") or "") in self._filter_matches]
 
     def _selected_uids(self) -> list[str]:
         return [str(uid) for uid in self.tree.selection()]
@@ -9028,16 +12285,17 @@ class RadiografiaDialog(Toplevel):
             pass
 
     def _update_summary(self):
-        from collections import Counter
-
-        selected_items = [item for item in self.items if item.get("selected", True)]
-        by_kind = Counter((item.get("kind") or "?") for item in selected_items)
+        by_kind = self._kind_selected
+        filtro = ""
+        if self._filter_matches is not None:
+            visibles = sum(1 for uid in self._filter_matches if uid in self._pos_by_uid)
+            filtro = f" · Mostrando {visibles} por búsqueda"
         self.summary_var.set(
-            f"Incluidos {len(selected_items)}/{len(self.items)} · "
+            f"Incluidos {sum(by_kind.values())}/{len(self.items)} · "
             f"Operaciones {by_kind.get('operacion', 0)} · "
             f"Adjuntos {by_kind.get('adjunto', 0)} · "
             f"Informes MPF {by_kind.get('informe_mpf', 0)} · "
-            f"Informes RNR {by_kind.get('informe_rnr', 0)}"
+            f"Informes RNR {by_kind.get('informe_rnr', 0)}{filtro}"
         )
 
     def _category_for_item(self, item: dict) -> str:
@@ -9083,18 +12341,7 @@ class RadiografiaDialog(Toplevel):
         return "Operaciones"
 
     def _category_stats(self) -> list[dict]:
-        buckets: dict[str, dict] = {}
-        order: list[str] = []
-        for item in self.items:
-            label = self._category_for_item(item)
-            key = label.casefold()
-            if key not in buckets:
-                buckets[key] = {"label": label, "total": 0, "selected": 0}
-                order.append(key)
-            buckets[key]["total"] += 1
-            if item.get("selected", True):
-                buckets[key]["selected"] += 1
-        return [buckets[key] for key in order]
+        return [self._cat_stats[key] for key in self._cat_order]
 
     def _refresh_type_filter_buttons(self):
         host = getattr(self, "type_filters", None)
@@ -9597,7 +12844,8 @@ class RadiografiaDialog(Toplevel):
         return model
 
     def _cancel_preview_jobs(self):
-        for attr in ("_preview_poll_job", "_preview_debounce_job"):
+        self._preview_waiting_uid = ""
+        for attr in ("_preview_timeout_job", "_preview_debounce_job"):
             job = getattr(self, attr, None)
             if job:
                 try:
@@ -9634,7 +12882,7 @@ class RadiografiaDialog(Toplevel):
         uid = str((item or {}).get("uid") or "")
         if not uid:
             return
-        order_idx = next((idx for idx, cur in enumerate(self.items) if cur.get("uid") == uid), 0)
+        order_idx = self._order_idx(uid)
         cached = self._preview_local_cache.get(uid)
         if cached and cached.get("ok"):
             self._set_preview_model(self._build_real_item_preview_model(item, order_idx, cached))
@@ -9655,6 +12903,17 @@ class RadiografiaDialog(Toplevel):
         if not item:
             return
         item["index_name"] = _norm_ws(self.index_name_var.get() or "")
+        uid = str(item.get("uid") or "")
+        self._search_cache.pop(uid, None)
+        if self._filter_matches is not None:
+            # El nombre nuevo puede entrar o salir de la búsqueda activa.
+            coincide = all(t in self._search_key(uid) for t in self._filter_text.split())
+            if coincide != (uid in self._filter_matches):
+                if coincide:
+                    self._filter_matches.add(uid)
+                else:
+                    self._filter_matches.discard(uid)
+                self._refresh([uid], refresh_preview=False)
         self._refresh_preview_for_current_item(item)
 
     def _drain_preview_queue(self):
@@ -9675,7 +12934,7 @@ class RadiografiaDialog(Toplevel):
 
     def _apply_preview_response(self, item: dict, preview_resp: dict):
         self._set_busy_cursor(False)
-        order_idx = next((idx for idx, cur in enumerate(self.items) if cur.get("uid") == item.get("uid")), 0)
+        order_idx = self._order_idx(item.get("uid"))
         if preview_resp.get("ok"):
             self.preview_status_var.set("")
             self._set_preview_model(self._build_real_item_preview_model(item, order_idx, preview_resp))
@@ -9713,8 +12972,39 @@ class RadiografiaDialog(Toplevel):
             pass
         return "break"
 
-    def _poll_preview_for_uid(self, uid: str, deadline: datetime.datetime):
-        self._preview_poll_job = None
+    def _on_preview_entregada(self, _resp: dict):
+        # Llega desde el hilo de descarga: sólo agenda el procesamiento en Tk.
+        try:
+            self.after(0, self._procesar_previews_entregadas)
+        except Exception:
+            pass
+
+    def _procesar_previews_entregadas(self):
+        self._drain_preview_queue()
+        uid = self._preview_waiting_uid
+        if not uid:
+            return
+        item = self._current_single_selected_item()
+        if not item or str(item.get("uid") or "") != uid:
+            return
+        cached = self._preview_local_cache.get(uid)
+        if not cached:
+            return
+        self._preview_waiting_uid = ""
+        job = self._preview_timeout_job
+        if job:
+            try:
+                self.after_cancel(job)
+            except Exception:
+                pass
+            self._preview_timeout_job = None
+        self._apply_preview_response(item, cached)
+
+    def _preview_timeout(self, uid: str):
+        self._preview_timeout_job = None
+        if self._preview_waiting_uid != uid:
+            return
+        self._preview_waiting_uid = ""
         item = self._current_single_selected_item()
         if not item or str(item.get("uid") or "") != uid:
             return
@@ -9723,37 +13013,84 @@ class RadiografiaDialog(Toplevel):
         if cached:
             self._apply_preview_response(item, cached)
             return
-        if datetime.datetime.now() >= deadline:
-            msg = "La vista previa de la operación tardó demasiado y no se pudo mostrar."
-            self._set_busy_cursor(False)
-            self.preview_status_var.set(msg)
-            order_idx = next((idx for idx, cur in enumerate(self.items) if cur.get("uid") == uid), 0)
-            self._set_preview_model(self._build_preview_error_model(item, order_idx, msg))
-            return
-        self._preview_poll_job = self.after(120, lambda: self._poll_preview_for_uid(uid, deadline))
+        msg = "La vista previa de la operación tardó demasiado y no se pudo mostrar."
+        self._set_busy_cursor(False)
+        self.preview_status_var.set(msg)
+        order_idx = self._order_idx(uid)
+        self._set_preview_model(self._build_preview_error_model(item, order_idx, msg))
 
     def _request_real_preview_async(self, uid: str, force: bool = False, timeout_ms: int = 25000):
         item = self._current_single_selected_item()
         if not item or item.get("uid") != uid or not self._can_generate_real_preview(item):
             return
 
+        self._drain_preview_queue()
         cached = self._preview_local_cache.get(uid)
         if cached and not force:
             self._apply_preview_response(item, cached)
+            self._programar_prefetch_preview(uid)
             return
         if force:
             self._preview_local_cache.pop(uid, None)
 
         try:
-            self._preview_session["preview_request_q"].put_nowait({"action": "preview", "uid": uid, "force": bool(force)})
+            _pedir_preview(self._preview_session, uid, _PREVIEW_PRIO_CLICK, force=force)
         except Exception:
             self.preview_status_var.set("No pude solicitar la vista previa real.")
             return
 
         self.preview_status_var.set("Generando vista previa de la operación...")
         self._set_busy_cursor(True)
-        deadline = datetime.datetime.now() + datetime.timedelta(milliseconds=max(1000, int(timeout_ms)))
-        self._preview_poll_job = self.after(120, lambda: self._poll_preview_for_uid(uid, deadline))
+        self._preview_waiting_uid = uid
+        self._preview_timeout_job = self.after(max(1000, int(timeout_ms)), lambda: self._preview_timeout(uid))
+        self._programar_prefetch_preview(uid)
+
+    def _programar_prefetch_preview(self, uid: str):
+        session = self._preview_session
+        if not session:
+            return
+        try:
+            vecinos = max(0, int(os.getenv("RADIO_PREVIEW_PREFETCH", "2")))
+        except Exception:
+            vecinos = 2
+        if not vecinos:
+            return
+        # Nueva generación: el worker descarta la precarga pedida para la selección anterior.
+        session["prefetch_gen"] = int(session.get("prefetch_gen", 0)) + 1
+        try:
+            filas = list(self.tree.get_children())
+        except Exception:
+            return
+        try:
+            pos = filas.index(uid)
+        except ValueError:
+            return
+
+        pedidos: list[tuple[int, str]] = []
+        for dist in range(1, vecinos + 1):
+            for j in (pos + dist, pos - dist):
+                if 0 <= j < len(filas):
+                    pedidos.append((_PREVIEW_PRIO_VECINO, filas[j]))
+        try:
+            top, bottom = self.tree.yview()
+            ini = int(top * len(filas))
+            fin = min(len(filas), int(round(bottom * len(filas))) + 1)
+            for j in range(ini, fin):
+                pedidos.append((_PREVIEW_PRIO_VISIBLE, filas[j]))
+        except Exception:
+            pass
+
+        vistos = {uid}
+        for prio, cand in pedidos:
+            if cand in vistos or cand in self._preview_local_cache:
+                continue
+            vistos.add(cand)
+            if not self._can_generate_real_preview(self._item_by_uid(cand)):
+                continue
+            try:
+                _pedir_preview(session, cand, prio)
+            except Exception:
+                break
 
     def _load_real_preview(self, force: bool = False):
         self._cancel_preview_jobs()
@@ -9794,7 +13131,7 @@ class RadiografiaDialog(Toplevel):
         self._update_index_name_editor()
         self._update_preview_button_state()
         self._cancel_preview_jobs()
-        order_idx = next((idx for idx, cur in enumerate(self.items) if cur.get("uid") == uid), 0)
+        order_idx = self._order_idx(uid)
         if self._can_generate_real_preview(item):
             self.preview_status_var.set("Generando vista previa de la operación...")
             self._set_preview_model(self._build_item_preview_model(item, order_idx))
@@ -9804,48 +13141,73 @@ class RadiografiaDialog(Toplevel):
             self.preview_status_var.set(msg)
             self._set_preview_model(self._build_preview_unavailable_model(item, order_idx, msg))
 
+    def _row_for_item(self, item: dict, order_idx: int, row_idx: int, dragging: bool) -> tuple:
+        enabled = bool(item.get("selected", True))
+        if dragging:
+            row_tag = "drag_even" if row_idx % 2 == 0 else "drag_odd"
+        else:
+            row_tag = (
+                "selected_even" if enabled and row_idx % 2 == 0 else
+                "selected_odd" if enabled else
+                "muted_even" if row_idx % 2 == 0 else
+                "muted_odd"
+            )
+        return (
+            (row_tag,),
+            (
+                order_idx,
+                "●" if enabled else "○",
+                item.get("kind_label") or "",
+                item.get("fecha") or "",
+                item.get("titulo") or "",
+                item.get("detalle") or "",
+            ),
+        )
+
     def _refresh(self, preserve_selection: list[str] | None = None, refresh_preview: bool = True):
         preserve_selection = preserve_selection or self._selected_uids()
         yview = self.tree.yview()
         dragging_selected = set()
         if self._drag_state and self._drag_state.get("dragging"):
             dragging_selected = set(self._selected_uids())
-        self.tree.delete(*self.tree.get_children())
-        for idx, item in enumerate(self.items, start=1):
-            uid = item["uid"]
-            enabled = bool(item.get("selected", True))
-            if uid in dragging_selected:
-                row_tag = "drag_even" if idx % 2 == 0 else "drag_odd"
-            else:
-                row_tag = (
-                    "selected_even" if enabled and idx % 2 == 0 else
-                    "selected_odd" if enabled else
-                    "muted_even" if idx % 2 == 0 else
-                    "muted_odd"
-                )
-            self.tree.insert(
-                "",
-                "end",
-                iid=uid,
-                tags=(row_tag,),
-                values=(
-                    idx,
-                    "●" if enabled else "○",
-                    item.get("kind_label") or "",
-                    item.get("fecha") or "",
-                    item.get("titulo") or "",
-                    item.get("detalle") or "",
-                ),
+        self._reindex()
+        visibles = self._visible_uids()
+
+        # Diff contra lo que ya está en la grilla: se borran las filas que
+        # salieron del modelo, se insertan las nuevas y sólo se reconfiguran las
+        # filas cuyo contenido cambió. Las filtradas quedan desvinculadas.
+        gone = [uid for uid in self._tree_rows if uid not in self._pos_by_uid]
+        if gone:
+            self.tree.delete(*gone)
+            for uid in gone:
+                self._tree_rows.pop(uid, None)
+        for row_idx, uid in enumerate(visibles, start=1):
+            row = self._row_for_item(
+                self._items_by_uid[uid],
+                self._pos_by_uid[uid] + 1,
+                row_idx,
+                uid in dragging_selected,
             )
-        valid = [uid for uid in preserve_selection if self.tree.exists(uid)]
+            actual = self._tree_rows.get(uid)
+            if actual is None:
+                self.tree.insert("", "end", iid=uid, tags=row[0], values=row[1])
+            elif actual != row:
+                self.tree.item(uid, tags=row[0], values=row[1])
+            self._tree_rows[uid] = row
+        if list(self.tree.get_children()) != visibles:
+            self.tree.set_children("", *visibles)
+
+        visible_set = set(visibles)
+        preserve_selection = [uid for uid in preserve_selection if uid in visible_set]
+        valid = preserve_selection
         if valid:
             self.tree.selection_set(valid)
             try:
                 self.tree.focus(valid[0])
             except Exception:
                 pass
-        elif self.items:
-            first_uid = self.items[0]["uid"]
+        elif visibles:
+            first_uid = visibles[0]
             self.tree.selection_set(first_uid)
             try:
                 self.tree.focus(first_uid)
@@ -9865,52 +13227,50 @@ class RadiografiaDialog(Toplevel):
         uid_set = {str(uid) for uid in (uids or []) if uid}
         if not uid_set:
             return
-        for item in self.items:
-            if str(item.get("uid") or "") in uid_set:
-                item["selected"] = not bool(item.get("selected", True))
+        for uid in uid_set:
+            item = self._item_by_uid(uid)
+            if item:
+                self._set_item_selected(item, not bool(item.get("selected", True)))
         self._refresh(list(uid_set))
 
     def _set_selected(self, selected: bool):
         selected_uids = set(self._selected_uids())
         if not selected_uids:
             return
-        for item in self.items:
-            if item["uid"] in selected_uids:
-                item["selected"] = selected
+        for uid in selected_uids:
+            item = self._item_by_uid(uid)
+            if item:
+                self._set_item_selected(item, selected)
         self._refresh(list(selected_uids))
 
     def _toggle_category_selection(self, category: str):
         category = _norm_ws(category or "")
         if not category:
             return
-        touched = []
-        matching = [item for item in self.items if self._category_for_item(item) == category]
-        if not matching:
+        key = category.casefold()
+        stat = self._cat_stats.get(key)
+        touched = list(self._cat_uids.get(key) or [])
+        if not stat or not touched:
             return
-        target_value = not all(item.get("selected", True) for item in matching)
-        for item in self.items:
-            if self._category_for_item(item) == category:
-                item["selected"] = target_value
-                touched.append(str(item.get("uid") or ""))
+        target_value = int(stat["selected"]) < int(stat["total"])
+        for uid in touched:
+            item = self._item_by_uid(uid)
+            if item:
+                self._set_item_selected(item, target_value)
         self._refresh(touched or None)
 
     def _toggle_selected(self):
-        selected_uids = set(self._selected_uids())
-        if not selected_uids:
-            return
-        for item in self.items:
-            if item["uid"] in selected_uids:
-                item["selected"] = not bool(item.get("selected", True))
-        self._refresh(list(selected_uids))
+        self._toggle_selected_uids(self._selected_uids())
 
     def _mark_all(self):
-        for item in self.items:
-            item["selected"] = True
+        # Con una búsqueda activa sólo afecta a las filas visibles.
+        for idx in self._visible_indices():
+            self._set_item_selected(self.items[idx], True)
         self._refresh()
 
     def _clear_all(self):
-        for item in self.items:
-            item["selected"] = False
+        for idx in self._visible_indices():
+            self._set_item_selected(self.items[idx], False)
         self._refresh()
 
     def _remove_unselected(self):
@@ -9919,7 +13279,9 @@ class RadiografiaDialog(Toplevel):
         self.items = [item for item in self.items if item.get("selected", True)]
         if len(self.items) == before:
             return
-        keep = [uid for uid in selected if any(str(item.get("uid") or "") == uid for item in self.items)]
+        self._reindex()
+        self._recount_categories()
+        keep = [uid for uid in selected if uid in self._pos_by_uid]
         self._refresh(keep or None)
 
     def _move(self, delta: int):
@@ -9927,19 +13289,26 @@ class RadiografiaDialog(Toplevel):
         if not selected:
             return
         selected_set = set(selected)
+        # Se intercambia con la fila visible vecina: las ocultas por la
+        # búsqueda quedan en su lugar.
+        pos = self._visible_indices()
         if delta < 0:
-            for idx in range(1, len(self.items)):
-                if self.items[idx]["uid"] in selected_set and self.items[idx - 1]["uid"] not in selected_set:
-                    self.items[idx - 1], self.items[idx] = self.items[idx], self.items[idx - 1]
+            for k in range(1, len(pos)):
+                a, b = pos[k - 1], pos[k]
+                if self.items[b]["uid"] in selected_set and self.items[a]["uid"] not in selected_set:
+                    self.items[a], self.items[b] = self.items[b], self.items[a]
         else:
-            for idx in range(len(self.items) - 2, -1, -1):
-                if self.items[idx]["uid"] in selected_set and self.items[idx + 1]["uid"] not in selected_set:
-                    self.items[idx + 1], self.items[idx] = self.items[idx], self.items[idx + 1]
+            for k in range(len(pos) - 2, -1, -1):
+                a, b = pos[k], pos[k + 1]
+                if self.items[a]["uid"] in selected_set and self.items[b]["uid"] not in selected_set:
+                    self.items[b], self.items[a] = self.items[a], self.items[b]
         self._refresh(selected)
 
     def _restore_order(self):
         preserve = self._selected_uids()
         self.items = [self._items_by_uid[uid] for uid in self._default_uid_order if uid in self._items_by_uid]
+        self._reindex()
+        self._recount_categories()
         self._refresh(preserve)
 
     def _on_tree_double_click(self, event):
@@ -10080,11 +13449,21 @@ class RadiografiaDialog(Toplevel):
         if not selected:
             return None
         selected_set = set(selected)
-        dragged = [item for item in self.items if item["uid"] in selected_set]
-        remaining = [item for item in self.items if item["uid"] not in selected_set]
-        if not dragged:
+        # El orden sin las filas arrastradas se calcula una vez por arrastre, no en cada movimiento.
+        state = self._drag_state if isinstance(self._drag_state, dict) else {}
+        cache = state.get("orden_restante")
+        if not cache or cache[0] != selected_set:
+            remaining = [str(item.get("uid") or "") for item in self.items if item["uid"] not in selected_set]
+            cache = (
+                selected_set,
+                any(uid in self._pos_by_uid for uid in selected_set),
+                {uid: idx for idx, uid in enumerate(remaining)},
+            )
+            state["orden_restante"] = cache
+        _sel, any_dragged, remaining_pos = cache
+        if not any_dragged:
             return None
-        if not remaining:
+        if not remaining_pos:
             return {"kind": "all", "insert_at": 0, "line_y": 1}
 
         target_uid = self.tree.identify_row(y_pos)
@@ -10093,7 +13472,7 @@ class RadiografiaDialog(Toplevel):
                 return {"kind": "top", "insert_at": 0, "line_y": 1}
             return {
                 "kind": "bottom",
-                "insert_at": len(remaining),
+                "insert_at": len(remaining_pos),
                 "line_y": max(int(self.tree.winfo_height() or 0) - 2, 1),
             }
         if target_uid in selected_set:
@@ -10106,7 +13485,7 @@ class RadiografiaDialog(Toplevel):
             after = y_pos > (bbox[1] + (bbox[3] / 2.0))
             line_y = int(bbox[1] + (bbox[3] if after else 0))
 
-        target_idx = next((idx for idx, item in enumerate(remaining) if item["uid"] == target_uid), None)
+        target_idx = remaining_pos.get(target_uid)
         if target_idx is None:
             return None
         insert_at = target_idx + (1 if after else 0)
@@ -10388,34 +13767,38 @@ class App:
         except Exception:
             pass
 
-    def _append_progress_log(self, msg: str):
-        msg = _repair_mojibake_text(msg)
+    def _append_progress_log(self, msgs: list[str]):
+        if not msgs:
+            return
         try:
             self.progress_text.configure(state="normal")
-            self.progress_text.insert("end", msg + "\n")
-            self.progress_text.see("end")
+            _agregar_lineas_log(self.progress_text, msgs)
             self.progress_text.configure(state="disabled")
         except Exception:
             pass
 
+    def _consumir_lote_log(self, max_items: int | None = 400):
+        msgs = _drenar_mensajes_log(self._log_queue, max_items)
+        # Del lote sólo importa la última etapa/config para los rótulos.
+        etapa_txt = conf = None
+        for msg in msgs:
+            if "[ETAPA] " in msg:
+                etapa_txt = msg.split("[ETAPA] ", 1)[1].strip()
+                conf = None
+            elif "[CONFIG]" in msg:
+                conf = msg.split("[CONFIG]", 1)[1].strip()
+        if etapa_txt is not None:
+            self.progress_lbl.config(text=f"Estado actual: {etapa_txt}")
+            self.progress_sub.config(text=self._detalle_etapa_ui(etapa_txt))
+        if conf is not None:
+            self.progress_sub.config(text=f"Opciones activas: {conf}")
+        self._append_progress_log(msgs)
+
     def _poll_progress_queue(self):
         self._progress_poll_job = None
-        q = self._log_queue
-        try:
-            while q is not None:
-                msg = _repair_mojibake_text(q.get_nowait())
-                if "[ETAPA] " in msg:
-                    etapa_txt = _repair_mojibake_text(msg.split("[ETAPA] ", 1)[1].strip())
-                    self.progress_lbl.config(text=f"Estado actual: {etapa_txt}")
-                    self.progress_sub.config(text=self._detalle_etapa_ui(etapa_txt))
-                elif "[CONFIG]" in msg:
-                    conf = _repair_mojibake_text(msg.split("[CONFIG]", 1)[1].strip())
-                    self.progress_sub.config(text=f"Opciones activas: {conf}")
-                self._append_progress_log(msg)
-        except queue.Empty:
-            pass
+        self._consumir_lote_log()
         if self._progress_active or (self._log_queue is not None):
-            self._progress_poll_job = self.btn.master.after(100, self._poll_progress_queue)
+            self._progress_poll_job = self.btn.master.after(50, self._poll_progress_queue)
 
     def _reset_progress_panel(self):
         self.progress_lbl.config(text="Estado actual: iniciando...")
@@ -10428,22 +13811,10 @@ class App:
             pass
         self._set_progress_active(True)
         if not self._progress_poll_job:
-            self._progress_poll_job = self.btn.master.after(100, self._poll_progress_queue)
+            self._progress_poll_job = self.btn.master.after(50, self._poll_progress_queue)
 
     def _finish_run_ui(self):
-        try:
-            while self._log_queue is not None:
-                msg = _repair_mojibake_text(self._log_queue.get_nowait())
-                if "[ETAPA] " in msg:
-                    etapa_txt = _repair_mojibake_text(msg.split("[ETAPA] ", 1)[1].strip())
-                    self.progress_lbl.config(text=f"Estado actual: {etapa_txt}")
-                    self.progress_sub.config(text=self._detalle_etapa_ui(etapa_txt))
-                elif "[CONFIG]" in msg:
-                    conf = _repair_mojibake_text(msg.split("[CONFIG]", 1)[1].strip())
-                    self.progress_sub.config(text=f"Opciones activas: {conf}")
-                self._append_progress_log(msg)
-        except queue.Empty:
-            pass
+        self._consumir_lote_log(max_items=None)
         self.btn.config(state="normal")
         self.btn_radiografia.config(state="normal")
         self._set_progress_active(False)
@@ -10484,7 +13855,7 @@ class App:
         self.btn.config(state="disabled")
         self.btn_radiografia.config(state="disabled")
 
-        self._log_queue = queue.Queue()
+        self._log_queue = _BufferLogUI()
         self._reset_progress_panel()
 
         if self._ui_handler:
@@ -10502,13 +13873,7 @@ class App:
         ).start()
 
     def _pedir_radiografia(self, items: list[dict], preview_state: dict | None = None):
-        session = preview_state or {
-            "done": threading.Event(),
-            "result": None,
-            "preview_request_q": queue.Queue(),
-            "preview_response_q": queue.Queue(),
-            "preview_cache": {},
-        }
+        session = preview_state or _nueva_sesion_preview()
 
         def _open():
             try:
@@ -10520,10 +13885,7 @@ class App:
                 )
                 session["result"] = dlg.show()
             finally:
-                try:
-                    session["done"].set()
-                except Exception:
-                    pass
+                _cerrar_sesion_preview(session)
 
         self.btn.master.after(0, _open)
         return session
@@ -10547,42 +13909,6 @@ class App:
             self.btn.master.after(0, self._finish_run_ui)
 
 
-# ---------------------------- MAIN -------------------------------------
-LOG = BASE_PATH / "debug.log"
-logging.basicConfig(
-    filename=str(LOG),
-    level=logging.INFO,
-    format="%(asctime)s %(message)s",
-    datefmt="%H:%M:%S",
-)
-
-# Filtro para silenciar logs de diagnÃƒÂ³stico detallado de Informes TÃƒÂ©cnicos.
-# Se puede reactivar seteando EXPEDIENTE_DIAG_INFORMES=1 en el entorno.
-class _InfDiagFilter(logging.Filter):
-    def filter(self, record):
-        try:
-            msg = record.getMessage() or ""
-        except Exception:
-            return True
-        if os.getenv("EXPEDIENTE_DIAG_INFORMES", "").strip().lower() in {"1", "true", "yes", "on"}:
-            return True
-        prefixes = (
-            "[INF] Fila ",
-            "[INF] Abriendo secciÃƒÂ³n",
-            "[INF] Filas InformesTecnicosMPF:",
-            "[INF] Contenedor InformesTecnicosMPF",
-        )
-        return not any(msg.startswith(p) for p in prefixes)
-
-logging.getLogger().addFilter(_InfDiagFilter())
-
-import builtins as _bi
-def _print_to_log(*args, **kwargs):
-    try:
-        logging.info(" ".join(str(a) for a in args))
-    except Exception:
-        pass
-_bi.print = _print_to_log
 
 
 def _set_win_appusermodelid(appid="SACDownloader.CBA"):
@@ -10620,6 +13946,13 @@ if __name__ == "__main__":
     root = _create_root()
     _set_tk_icon(root)  # usa icono3.ico desde BASE_PATH si estÃƒÂ¡ disponible
     App(root)
+
+    def _ventana_visible():
+        global _T_PRIMERA_VENTANA
+        _T_PRIMERA_VENTANA = time.perf_counter() - _T0_ARRANQUE
+        _precalentar_dependencias(_reportar_arranque if _PERFIL_ARRANQUE else None)
+
+    root.after_idle(_ventana_visible)
     root.mainloop()
 # Nota: Al ejecutar con OCR_MODE=force, los adjuntos siempre salen con capa de texto.
 